@@ -0,0 +1,215 @@
+"""
+Response cache for read-heavy GET endpoints.
+
+A cache key combines the view's ``cache_name``, the caller's role, the
+normalized query string (pagination cursor included), the URL kwargs and the
+current version of every namespace the view reads. Services bump namespace
+versions once their transaction commits, which orphans every dependent entry
+at once instead of deleting keys one by one.
+
+Concurrent misses for one key are coalesced: threads of a process queue on a
+per-key lock, and processes sharing the cache backend race for a
+``cache.add`` lock, so a cold key is computed once rather than once per
+request.
+"""
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+from common.constants import RESPONSE_CACHE_EVENTS, RESPONSE_CACHE_KEY_PREFIX, RESPONSE_CACHE_POLL_INTERVAL
+
+_cache_names = set()
+
+
+def _key(*parts):
+    return ':'.join((RESPONSE_CACHE_KEY_PREFIX, *map(str, parts)))
+
+
+def _incr(key, initial):
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, initial, timeout=None):
+            cache.incr(key)
+
+
+def namespace_versions(namespaces) -> list:
+    keys = [_key('ns', namespace) for namespace in namespaces]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Seed from the clock so an evicted version never restarts at a
+            # number that still-live entries were stored under.
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def increment_namespace(namespace) -> int:
+    """Bump ``namespace`` right away and return its new version."""
+    key = _key('ns', namespace)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+        return cache.incr(key)
+
+
+def bump_namespaces(*namespaces) -> None:
+    """Invalidate cached responses that read ``namespaces`` once the current transaction commits."""
+    def bump():
+        for namespace in namespaces:
+            increment_namespace(namespace)
+
+    transaction.on_commit(bump)
+
+
+def record_event(cache_name, event) -> None:
+    _incr(_key('stats', cache_name, event), 1)
+
+
+def cache_stats() -> dict:
+    """Hit/miss counts per cached view, shared by every process using the cache backend."""
+    stats = {}
+    for cache_name in sorted(_cache_names):
+        keys = [_key('stats', cache_name, event) for event in RESPONSE_CACHE_EVENTS]
+        values = cache.get_many(keys)
+        counts = {event: values.get(key, 0) for event, key in zip(RESPONSE_CACHE_EVENTS, keys)}
+        lookups = sum(counts.values())
+        counts['hit_ratio'] = round((lookups - counts['misses']) / lookups, 4) if lookups else None
+        stats[cache_name] = counts
+    return stats
+
+
+def reset_cache_stats() -> None:
+    cache.delete_many([
+        _key('stats', cache_name, event)
+        for cache_name in _cache_names
+        for event in RESPONSE_CACHE_EVENTS
+    ])
+
+
+class _KeyLocks:
+    """Per-key locks that are dropped once nobody holds or waits for them."""
+
+    def __init__(self):
+        self._guard = threading.Lock()
+        self._locks = {}
+
+    @contextmanager
+    def hold(self, key):
+        with self._guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._guard:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[key]
+
+
+_key_locks = _KeyLocks()
+
+
+class CachedResponseMixin:
+    """
+    Cache successful GET responses of a DRF view.
+
+    Subclasses set ``cache_name`` and the ``cache_namespaces`` their data
+    comes from. Views that would define ``get`` themselves implement
+    ``build_response`` instead. Authentication and permissions run before
+    ``get``, so a cached response is only served to callers allowed to see it.
+    """
+    cache_name = None
+    cache_namespaces = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.cache_name:
+            _cache_names.add(cls.cache_name)
+
+    def build_response(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def get_cache_key_parts(self) -> tuple:
+        """Extra inputs the response depends on besides the request."""
+        return ()
+
+    def get_cache_timeout(self) -> int:
+        return settings.RESPONSE_CACHE_TIMEOUT
+
+    def get_cache_key(self, request, **kwargs) -> str:
+        params = sorted(
+            (name, value)
+            for name, values in request.query_params.lists()
+            for value in values
+            if value != ''
+        )
+        raw = '|'.join((
+            request.get_host(),
+            urlencode(params),
+            urlencode(sorted(kwargs.items())),
+            *map(str, self.get_cache_key_parts()),
+        ))
+        role = getattr(request.user, 'role', None) or 'anonymous'
+        versions = '.'.join(map(str, namespace_versions(self.cache_namespaces)))
+        return _key('view', self.cache_name, role, versions, hashlib.sha256(raw.encode()).hexdigest())
+
+    def get(self, request, *args, **kwargs):
+        key = self.get_cache_key(request, **kwargs)
+
+        entry = cache.get(key)
+        if entry is not None:
+            return self._cached_response(entry, 'hits')
+
+        with _key_locks.hold(key):
+            # Another thread may have filled the key while this one queued.
+            entry = cache.get(key)
+            fill_lock = _key('lock', key)
+            owns_lock = entry is None and cache.add(fill_lock, 1, settings.RESPONSE_CACHE_LOCK_TIMEOUT)
+            if entry is None and not owns_lock:
+                entry = self._wait_for_fill(key, fill_lock)
+            if entry is not None:
+                return self._cached_response(entry, 'coalesced')
+
+            record_event(self.cache_name, 'misses')
+            try:
+                response = self.build_response(request, *args, **kwargs)
+                if response.status_code == status.HTTP_200_OK:
+                    cache.set(key, {'data': response.data, 'status': response.status_code},
+                              self.get_cache_timeout())
+            finally:
+                if owns_lock:
+                    cache.delete(fill_lock)
+
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def _wait_for_fill(self, key, fill_lock):
+        deadline = time.monotonic() + settings.RESPONSE_CACHE_LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(RESPONSE_CACHE_POLL_INTERVAL)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry
+            if cache.get(fill_lock) is None:
+                # The filling request finished without caching, e.g. on an error.
+                return None
+        return None
+
+    def _cached_response(self, entry, event):
+        record_event(self.cache_name, event)
+        response = Response(entry['data'], status=entry['status'])
+        response['X-Cache'] = 'HIT'
+        return response
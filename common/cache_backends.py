@@ -0,0 +1,30 @@
+"""
+Cache backends.
+
+``SharedFileCache`` is the default backend: a ``FileBasedCache`` that every
+worker process on the host shares, so a namespace bump in one worker
+invalidates cached responses in all of them, and the ``cache.add`` fill lock
+coalesces misses across workers. Stock ``FileBasedCache`` lists the whole
+cache directory on every ``set`` to decide whether to cull, which costs over
+a millisecond at 300 entries and grows with the directory; this one checks
+at most every ``CACHE_CULL_INTERVAL`` seconds per process.
+"""
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+
+from common.constants import CACHE_CULL_INTERVAL
+
+
+class SharedFileCache(FileBasedCache):
+
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        self._culled_at = float('-inf')
+
+    def _cull(self):
+        now = time.monotonic()
+        if now - self._culled_at < CACHE_CULL_INTERVAL:
+            return
+        self._culled_at = now
+        super()._cull()
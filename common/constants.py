@@ -0,0 +1,66 @@
+DASHBOARD_COUNTERS_ID = 1
+DASHBOARD_LOW_STOCK_LIMIT = 20
+
+COUNTER_FIELDS = ('total_customers', 'low_stock_count', 'out_of_stock_count')
+
+CACHE_NAMESPACE_PRODUCTS = 'products'
+CACHE_NAMESPACE_ORDERS = 'orders'
+CACHE_NAMESPACE_CUSTOMERS = 'customers'
+# Product identity (sku, name, category, price), unaffected by stock movements.
+CACHE_NAMESPACE_CATALOG = 'catalog'
+# Bumped when a refresh token is blacklisted, see users.blacklist.
+CACHE_NAMESPACE_TOKEN_BLACKLIST = 'token-blacklist'
+
+# Seconds between checks of the file cache's size, see common.cache_backends.
+CACHE_CULL_INTERVAL = 10
+
+RESPONSE_CACHE_KEY_PREFIX = 'response-cache'
+RESPONSE_CACHE_EVENTS = ('hits', 'misses', 'coalesced')
+# Poll interval, in seconds, while waiting for another process to fill the cache.
+RESPONSE_CACHE_POLL_INTERVAL = 0.05
+
+METRICS_PREFIX = 'minierp'
+# Histogram bucket upper bounds; every histogram also has a +Inf bucket.
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+METRICS_RESPONSE_SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+# Label for requests that did not resolve to a named URL, e.g. 404s.
+METRICS_UNMATCHED_ENDPOINT = 'unmatched'
+
+# An admin asks for a profile of one request with this header or query parameter.
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_QUERY_PARAM = 'profile'
+PROFILE_FILE_SUFFIX = '.prof'
+# Functions listed in a profile's text summary.
+PROFILE_SUMMARY_LIMIT = 50
+
+# Cache key prefix of users pinned to the primary database after a write.
+REPLICA_PIN_KEY_PREFIX = 'replica-pin'
+
+# Cache key prefix of each user's current token version, see users.tokens.
+TOKEN_VERSION_KEY_PREFIX = 'token-version'
+
+# Throttle priorities, see common.throttling. Under load, the lowest is shed first.
+THROTTLE_PRIORITY_CRITICAL = 'critical'
+THROTTLE_PRIORITY_NORMAL = 'normal'
+THROTTLE_PRIORITY_LOW = 'low'
+# Share of the admission bucket each priority must leave for the ones above it.
+THROTTLE_PRIORITY_RESERVES = {
+    THROTTLE_PRIORITY_CRITICAL: 0.0,
+    THROTTLE_PRIORITY_NORMAL: 0.25,
+    THROTTLE_PRIORITY_LOW: 0.5,
+}
+# Per-user, per-endpoint token buckets: (requests per second, burst).
+THROTTLE_DEFAULT_RATE = (20.0, 100)
+THROTTLE_EXPENSIVE_RATE = (5.0, 50)
+THROTTLE_ADMISSION_KEY = 'admission'
+# Buckets idle this long have refilled, so they are forgotten.
+THROTTLE_IDLE_SECONDS = 3600
+# Bucket keys per query when a process syncs with the shared store.
+THROTTLE_SYNC_BATCH_SIZE = 500
+
+# run_benchmarks --writes: prefix of the SKUs, emails, codes and order refs it
+# creates, and the orders per imported file and per bulk status change.
+BENCHMARK_PREFIX = 'BENCH'
+BENCHMARK_IMPORT_ORDERS = 10
+BENCHMARK_BULK_STATUS_ORDERS = 10
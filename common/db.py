@@ -0,0 +1,81 @@
+"""
+Writer lane for SQLite.
+
+SQLite allows one writer at a time. A writer that finds the database locked
+sleeps in SQLite's busy handler and retries, so under a burst the lock sits
+idle while waiters sleep, and waiters are served in no particular order.
+Service writes therefore queue in a lane first: a per-process lock for the
+threads of a process, then an exclusive ``flock`` on a file next to the
+database, which the kernel hands to the next waiting process as soon as it is
+released. Only the lane holder opens a write transaction, so it never waits
+for the database lock. Readers take neither lock and, in WAL mode, never wait
+for the writer.
+
+Enter the lane at the outermost write of a service call; nested entries only
+open a savepoint.
+"""
+import fcntl
+import os
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+class _WriterLane:
+
+    def __init__(self):
+        self._reset()
+        # A forked child shares its parent's open lock files, and with them
+        # the parent's flock, so it must open its own.
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.RLock()
+        # Nesting depth per lock file, so a write to the audit database inside
+        # an order write takes and releases that database's lane too.
+        self._depth = Counter()
+        self._files = {}
+
+    @contextmanager
+    def hold(self, path):
+        with self._lock:
+            if not self._depth[path]:
+                lock_file = self._files.get(path)
+                if lock_file is None:
+                    lock_file = self._files[path] = open(path, 'a')
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._depth[path] += 1
+            try:
+                yield
+            finally:
+                self._depth[path] -= 1
+                if not self._depth[path]:
+                    del self._depth[path]
+                    fcntl.flock(self._files[path], fcntl.LOCK_UN)
+
+
+_lane = _WriterLane()
+
+
+def _lane_path(using):
+    """The lock file of ``using``'s lane, or ``None`` when writes need no lane."""
+    connection = connections[using]
+    if not settings.DATABASE_WRITER_LANE or connection.vendor != 'sqlite' or connection.is_in_memory_db():
+        return None
+    return f"{connection.settings_dict['NAME']}-writer.lock"
+
+
+@contextmanager
+def writer_lane(using=DEFAULT_DB_ALIAS):
+    """``transaction.atomic`` that first queues behind every other SQLite writer."""
+    path = _lane_path(using)
+    if path is None:
+        with transaction.atomic(using=using):
+            yield
+        return
+
+    with _lane.hold(path), transaction.atomic(using=using):
+        yield
@@ -0,0 +1,42 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database into every replica in DATABASE_REPLICAS "
+        "with SQLite's online backup, every --lag seconds. A local stand-in for "
+        "replication that makes replica reads lag behind writes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lag', type=float, default=2.0, help="Seconds between copies.")
+        parser.add_argument('--once', action='store_true', help="Copy once and exit.")
+
+    def handle(self, *args, lag, once, **options):
+        if not settings.DATABASE_REPLICA_ALIASES:
+            raise CommandError("Set DATABASE_REPLICAS to the replica files first.")
+
+        primary = connections['default'].settings_dict['NAME']
+        replicas = [connections[alias].settings_dict['NAME'] for alias in settings.DATABASE_REPLICA_ALIASES]
+        while True:
+            started = time.monotonic()
+            for replica in replicas:
+                self._copy(primary, replica)
+            self.stdout.write(f"Copied to {len(replicas)} replica(s) in {time.monotonic() - started:.2f}s")
+            if once:
+                return
+            time.sleep(lag)
+
+    def _copy(self, primary, replica):
+        source = sqlite3.connect(primary)
+        target = sqlite3.connect(replica, timeout=settings.SQLITE_BUSY_TIMEOUT_MS / 1000)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
@@ -0,0 +1,284 @@
+import json
+import platform
+import subprocess
+import time
+import uuid
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from common.cache import increment_namespace
+from common.constants import (
+    BENCHMARK_BULK_STATUS_ORDERS,
+    BENCHMARK_IMPORT_ORDERS,
+    BENCHMARK_PREFIX,
+    CACHE_NAMESPACE_CUSTOMERS,
+    CACHE_NAMESPACE_ORDERS,
+    CACHE_NAMESPACE_PRODUCTS,
+)
+from common.metrics import percentile
+from common.profiling import list_profiles
+from orders.constants import ORDER_STATUS_CONFIRMED
+from orders.models import Order
+from products.models import Product, StockAlert
+from users.models import User
+from users.tokens import UserClaimsRefreshToken
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive every API endpoint through the Django test client against the current "
+        "database and report p50/p95/p99 latency, throughput and queries per request "
+        "as JSON. Pass --compare with an earlier report to see the change per endpoint. "
+        "Read-only unless --writes is given; run it against a seeded benchmark database. "
+        "Profiles one request first if PROFILE_DIR holds no profile to download."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help="Measured requests per endpoint.")
+        parser.add_argument('--warmup', type=int, default=5, help="Unmeasured requests per endpoint first.")
+        parser.add_argument('--endpoint', action='append', dest='endpoints', help="Only run these endpoints.")
+        parser.add_argument('--warm-cache', action='store_true',
+                            help="Keep cached responses between requests instead of invalidating them.")
+        parser.add_argument('--writes', action='store_true',
+                            help="Also run the endpoints that write, such as creating and confirming "
+                                 "orders or logging out. Changes the database.")
+        parser.add_argument('--password', help="The admin's password, to include the login endpoint.")
+        parser.add_argument('--output', help="Write the report as JSON to this path.")
+        parser.add_argument('--compare', help="Earlier report to compare against.")
+
+    def handle(self, *args, requests, warmup, endpoints, warm_cache, writes, password, output,
+               compare, **options):
+        admin = User.objects.admins().order_by('id').first()
+        product = Product.objects.order_by('id').first()
+        order = Order.objects.order_by('id').first()
+        customer = User.objects.customers().order_by('id').first()
+        if None in (admin, product, order, customer):
+            raise CommandError("Seed data first, e.g. with `python manage.py seed_data`.")
+
+        try:
+            # Lets the test client's host through ALLOWED_HOSTS.
+            setup_test_environment(debug=settings.DEBUG)
+        except RuntimeError:
+            pass  # Already set up, e.g. under the test runner.
+
+        cases = self._cases(admin, product, order, customer, writes, password)
+        if endpoints:
+            unknown = set(endpoints) - {name for name, *_ in cases}
+            if unknown:
+                raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+            cases = [case for case in cases if case[0] in endpoints]
+
+        results = {}
+        for name, method, url, payload in cases:
+            # A fresh token per endpoint, so long runs outlive the access token lifetime.
+            client = Client(HTTP_AUTHORIZATION=f'Bearer {UserClaimsRefreshToken.for_user(admin).access_token}')
+            # One client hammering an endpoint is exactly what the throttle refuses.
+            with override_settings(THROTTLE_ENABLED=False):
+                results[name] = self._measure(client, method, url, payload, requests, warmup, warm_cache)
+            result = results[name]
+            self.stdout.write(
+                f"{name:<22} p50={result['p50_ms']:>8}ms p95={result['p95_ms']:>8}ms "
+                f"p99={result['p99_ms']:>8}ms {result['requests_per_second']:>8} req/s "
+                f"queries={result['queries']}"
+            )
+
+        report = {
+            'meta': {
+                'commit': self._commit(),
+                'created_at': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'requests': requests,
+                'warm_cache': warm_cache,
+                'rows': {
+                    'products': Product.objects.count(),
+                    'orders': Order.objects.count(),
+                    'customers': User.objects.customers().count(),
+                },
+            },
+            'endpoints': results,
+        }
+
+        if compare:
+            self._compare(compare, results)
+        if output:
+            with open(output, 'w') as output_file:
+                json.dump(report, output_file, indent=2)
+
+    def _cases(self, admin, product, order, customer, writes, password):
+        cases = [
+            ('list-products', 'get', reverse('list-create-products'), None),
+            ('search-products', 'get', reverse('list-create-products'), {'search': product.name.split()[0]}),
+            ('filter-products', 'get', reverse('list-create-products'),
+             {'stock_status': 'LOW_STOCK', 'ordering': '-profit_margin'}),
+            ('retrieve-product', 'get', reverse('retrieve-update-destroy-product', args=[product.id]), None),
+            ('stock-history', 'get', reverse('product-stock-history'), {'product_id': product.id}),
+            ('categories', 'get', reverse('list-categories'), None),
+            ('facets', 'get', reverse('product-facets'), None),
+            ('autocomplete', 'get', reverse('product-autocomplete'), {'q': product.sku[:4]}),
+            ('stock-alerts', 'get', reverse('list-stock-alerts'), {'is_open': 'true'}),
+            ('list-orders', 'get', reverse('orders:list-create-orders'), None),
+            ('retrieve-order', 'get', reverse('orders:retrieve-update-destroy-order', args=[order.id]), None),
+            ('order-items', 'get', reverse('orders:order-items', args=[order.id]), None),
+            ('export-orders', 'get', reverse('orders:export-orders'), {'customer_id': customer.id}),
+            ('sales-time-series', 'get', reverse('orders:sales-time-series'), None),
+            ('list-customers', 'get', reverse('list-create-customer'), None),
+            ('retrieve-customer', 'get', reverse('retrieve-update-destroy-customer', args=[customer.id]), None),
+            ('dashboard', 'get', reverse('common:dashboard-insights'), None),
+            ('cache-stats', 'get', reverse('common:response-cache-stats'), None),
+            ('metrics', 'get', reverse('common:metrics'), None),
+            ('profiles', 'get', reverse('common:profiles'), None),
+            ('profile-download', 'get', lambda: self._stored_profile(admin), None),
+            ('refresh', 'post', reverse('refresh'), lambda: {'refresh': str(UserClaimsRefreshToken.for_user(admin))}),
+        ]
+        if password:
+            cases.append(('login', 'post', reverse('login'), {'email': admin.email, 'password': password}))
+        if writes:
+            cases += [
+                ('create-order', 'post', reverse('orders:list-create-orders'), {
+                    'customer_id': customer.id,
+                    'items': [{'product_id': product.id, 'quantity': 1}],
+                }),
+                # Each request confirms a different pending order.
+                ('confirm-order', 'patch', self._next_pending_order, {'status': ORDER_STATUS_CONFIRMED}),
+                ('bulk-status', 'post', reverse('orders:bulk-update-order-status'), lambda: {
+                    'order_ids': self._pending_order_ids(BENCHMARK_BULK_STATUS_ORDERS),
+                    'status': ORDER_STATUS_CONFIRMED,
+                }),
+                ('import-orders', 'upload', reverse('orders:import-orders'),
+                 lambda: self._import_file(customer, product)),
+                ('create-product', 'post', reverse('list-create-products'), lambda: {
+                    'sku': f'{BENCHMARK_PREFIX}-{uuid.uuid4().hex[:12]}',
+                    'name': 'Benchmark Product',
+                    'category': product.category,
+                    'cost_price': '5.00',
+                    'selling_price': '10.00',
+                    'stock_qty': 10,
+                    'image': None,
+                }),
+                # Deletes the products the previous case created.
+                ('delete-product', 'delete', self._next_benchmark_product, None),
+                ('create-customer', 'post', reverse('list-create-customer'), lambda: {
+                    'email': f'{BENCHMARK_PREFIX.lower()}-{uuid.uuid4().hex[:12]}@example.com',
+                    'customer_code': f'{BENCHMARK_PREFIX}-{uuid.uuid4().hex[:12]}',
+                    'phone': None,
+                    'first_name': 'Benchmark',
+                    'last_name': 'Customer',
+                    'address': 'Benchmark Street 1',
+                }),
+                ('acknowledge-alerts', 'post', reverse('acknowledge-stock-alerts'),
+                 lambda: {'ids': self._stock_alert_ids()}),
+                ('logout', 'post', reverse('logout'), lambda: {'refresh': str(UserClaimsRefreshToken.for_user(admin))}),
+            ]
+        return cases
+
+    def _next_pending_order(self):
+        return reverse('orders:retrieve-update-destroy-order', args=self._pending_order_ids(1))
+
+    def _pending_order_ids(self, count):
+        order_ids = list(Order.objects.pending().order_by('-id').values_list('id', flat=True)[:count])
+        if not order_ids:
+            raise CommandError("No pending order left to confirm.")
+        return order_ids
+
+    def _import_file(self, customer, product):
+        rows = ''.join(f"{BENCHMARK_PREFIX}-{index},{customer.id},{product.id},1\n"
+                       for index in range(BENCHMARK_IMPORT_ORDERS))
+        content = f"order_ref,customer_id,product_id,quantity\n{rows}"
+        return {'file': SimpleUploadedFile('orders.csv', content.encode())}
+
+    def _next_benchmark_product(self):
+        product = Product.objects.filter(sku__startswith=f'{BENCHMARK_PREFIX}-').order_by('-id').first()
+        if product is None:
+            raise CommandError("No benchmark product left to delete.")
+        return reverse('retrieve-update-destroy-product', args=[product.id])
+
+    def _stock_alert_ids(self):
+        # Pending alerts first; once none are left the same lookup matches nothing.
+        alert_ids = (list(StockAlert.objects.pending().order_by('id').values_list('id', flat=True)[:1])
+                     or list(StockAlert.objects.order_by('id').values_list('id', flat=True)[:1]))
+        if not alert_ids:
+            raise CommandError("No stock alert to acknowledge.")
+        return alert_ids
+
+    def _stored_profile(self, admin):
+        if not list_profiles():
+            client = Client(HTTP_AUTHORIZATION=f'Bearer {UserClaimsRefreshToken.for_user(admin).access_token}')
+            client.get(reverse('common:metrics'), {'profile': '1'})
+        profiles = list_profiles()
+        if not profiles:
+            raise CommandError("Could not store a profile in PROFILE_DIR.")
+        return reverse('common:profile-download', args=[profiles[0]['name']])
+
+    def _measure(self, client, method, url, payload, requests, warmup, warm_cache):
+        timings, queries = [], []
+        for number in range(warmup + requests):
+            if not warm_cache:
+                # Orphan cached responses but keep the autocomplete index, which
+                # follows the catalog namespace and would otherwise rebuild.
+                for namespace in (CACHE_NAMESPACE_PRODUCTS, CACHE_NAMESPACE_ORDERS, CACHE_NAMESPACE_CUSTOMERS):
+                    increment_namespace(namespace)
+            # Callables prepare per-request input outside the measured time.
+            path = url() if callable(url) else url
+            data = payload() if callable(payload) else payload
+            # Replicas and the audit database serve requests too.
+            with ExitStack() as stack:
+                captured = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in connections]
+                started = time.perf_counter()
+                if method == 'get':
+                    response = client.get(path, data)
+                elif method == 'upload':
+                    response = client.post(path, data)
+                else:
+                    response = getattr(client, method)(path, data, content_type='application/json')
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                elapsed = time.perf_counter() - started
+            if response.status_code >= 400:
+                raise CommandError(f"{method.upper()} {path} returned {response.status_code}.")
+            if number >= warmup:
+                timings.append(elapsed * 1000)
+                queries.append(sum(len(alias_queries) for alias_queries in captured))
+
+        timings.sort()
+        return {
+            'p50_ms': round(percentile(timings, 0.50), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+            'mean_ms': round(sum(timings) / len(timings), 3),
+            'requests_per_second': round(len(timings) / (sum(timings) / 1000), 1),
+            'queries': max(queries),
+        }
+
+    def _compare(self, path, results):
+        with open(path) as baseline_file:
+            baseline = json.load(baseline_file)['endpoints']
+
+        self.stdout.write(f"\nChange against {path}:")
+        for name, result in results.items():
+            before = baseline.get(name)
+            if before is None:
+                self.stdout.write(f"{name:<22} new")
+                continue
+            change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0
+            line = (f"{name:<22} p50 {before['p50_ms']}ms -> {result['p50_ms']}ms ({change:+.1f}%), "
+                    f"queries {before['queries']} -> {result['queries']}")
+            regressed = change > 10 or result['queries'] > before['queries']
+            self.stdout.write(self.style.WARNING(line) if regressed else line)
+
+    def _commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
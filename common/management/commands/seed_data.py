@@ -0,0 +1,268 @@
+import random
+from datetime import datetime, time as day_time, timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from common.cache import increment_namespace
+from common.constants import (
+    CACHE_NAMESPACE_CATALOG,
+    CACHE_NAMESPACE_CUSTOMERS,
+    CACHE_NAMESPACE_ORDERS,
+    CACHE_NAMESPACE_PRODUCTS,
+)
+from common.services import DashboardCounterService
+from orders.constants import ORDER_STATUS_CANCELLED, ORDER_STATUS_CONFIRMED, ORDER_STATUS_PENDING
+from orders.models import Order, OrderItem, OrderNumberSequence
+from orders.services import OrderService
+from products import search
+from products.autocomplete import product_autocomplete
+from products.models import Product, StockChangeLog
+from products.services import CategoryService, StockAlertService
+from users.constants import ROLE_CUSTOMER
+from users.models import User
+
+CATEGORIES = (
+    'Electronics', 'Computers', 'Office Supplies', 'Furniture', 'Kitchen', 'Garden', 'Tools', 'Toys',
+    'Sports', 'Outdoor', 'Books', 'Stationery', 'Lighting', 'Storage', 'Cleaning', 'Pet Supplies',
+    'Automotive', 'Health', 'Beauty', 'Clothing',
+)
+ADJECTIVES = (
+    'Compact', 'Wireless', 'Heavy Duty', 'Portable', 'Ergonomic', 'Premium', 'Classic', 'Smart',
+    'Foldable', 'Stainless', 'Rechargeable', 'Eco', 'Deluxe', 'Mini', 'Pro', 'Adjustable',
+)
+NOUNS = (
+    'Laptop', 'Mouse', 'Keyboard', 'Monitor', 'Chair', 'Desk', 'Lamp', 'Kettle', 'Drill', 'Hose',
+    'Backpack', 'Notebook', 'Speaker', 'Headphones', 'Shelf', 'Bottle', 'Charger', 'Cable', 'Router',
+    'Printer', 'Blender', 'Toaster', 'Tent', 'Bicycle', 'Helmet', 'Brush', 'Jacket', 'Organizer',
+)
+FIRST_NAMES = ('Amina', 'Ben', 'Carla', 'David', 'Elif', 'Farid', 'Grace', 'Hiro', 'Ines', 'Jonas',
+               'Karim', 'Lena', 'Mateo', 'Nadia', 'Omar', 'Priya', 'Quinn', 'Rosa', 'Sami', 'Tara')
+LAST_NAMES = ('Ahmed', 'Becker', 'Costa', 'Dubois', 'Evans', 'Fischer', 'Garcia', 'Hassan', 'Ito',
+              'Jensen', 'Khan', 'Lopez', 'Meyer', 'Novak', 'Okafor', 'Petrov', 'Rossi', 'Silva')
+
+# Share of seeded orders in each status.
+STATUS_WEIGHTS = ((ORDER_STATUS_CONFIRMED, 70), (ORDER_STATUS_PENDING, 20), (ORDER_STATUS_CANCELLED, 10))
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed customers, products, orders and their stock change history with bulk "
+        "inserts, spread over the last --days days. Confirmed orders take stock "
+        "and are logged like real confirmations, with restocks logged whenever a "
+        "product would run out, so stock, logs, categories, alerts, counters and "
+        "the sales rollup all agree afterwards. Run it against a benchmark database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=50000)
+        parser.add_argument('--products', type=int, default=100000)
+        parser.add_argument('--orders', type=int, default=1000000)
+        parser.add_argument('--items-per-order', type=int, default=3, help="Average order lines per order.")
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='SEED', help="Prefix of seeded SKUs, emails and customer codes.")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed, for repeatable data sets.")
+        parser.add_argument('--created-by', help="Email of the user recorded as creator; defaults to the first admin.")
+
+    def handle(self, *args, customers, products, orders, items_per_order, days, batch_size, prefix, seed,
+               created_by, **options):
+        if min(customers, products, items_per_order, days) < 1 or orders < 0:
+            raise CommandError("Counts must be positive.")
+
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.prefix = prefix.upper()
+        self.user = self._creator(created_by)
+        if Product.objects.filter(sku__startswith=f'{self.prefix}-').exists():
+            raise CommandError(f"Products with the {self.prefix} prefix exist already; pass another --prefix.")
+
+        first_day = timezone.localdate() - timedelta(days=days - 1)
+        customer_ids = self._seed_customers(customers)
+        catalog = self._seed_products(products, first_day)
+        self._seed_orders(orders, items_per_order, first_day, days, customer_ids, catalog)
+        self._finish(catalog)
+
+    def _creator(self, email):
+        users = User.objects.admins()
+        user = users.filter(email=email).first() if email else users.order_by('id').first()
+        if user is None:
+            raise CommandError("Create an admin user first, or pass --created-by.")
+        return user
+
+    def _batches(self, objects):
+        for start in range(0, len(objects), self.batch_size):
+            yield objects[start:start + self.batch_size]
+
+    def _seed_customers(self, count):
+        # Stock logs keep a snapshot of the customer's name.
+        self.customer_names = {}
+        ids = []
+        for batch in self._batches(range(count)):
+            created = User.objects.bulk_create([
+                User(
+                    email=f'{self.prefix.lower()}-customer-{number}@example.com',
+                    customer_code=f'{self.prefix}-C{number:07d}',
+                    first_name=self.rng.choice(FIRST_NAMES),
+                    last_name=self.rng.choice(LAST_NAMES),
+                    role=ROLE_CUSTOMER,
+                    password='!',
+                    created_by=self.user,
+                    modified_by=self.user,
+                )
+                for number in batch
+            ])
+            ids.extend(customer.pk for customer in created)
+            self.customer_names.update((customer.pk, customer.get_full_name()) for customer in created)
+            self.stdout.write(f"Customers: {len(ids)}/{count}")
+        return ids
+
+    def _seed_products(self, count, first_day):
+        categories = [CategoryService.get_or_create(name) for name in CATEGORIES]
+        catalog = {}
+        for batch in self._batches(range(count)):
+            new_products = []
+            for number in batch:
+                category = self.rng.choice(categories)
+                cost_price = Decimal(self.rng.randint(100, 50000)) / 100
+                new_products.append(Product(
+                    sku=f'{self.prefix}-{number:07d}',
+                    name=f'{self.rng.choice(ADJECTIVES)} {self.rng.choice(NOUNS)} {number}',
+                    category=category.name,
+                    category_ref=category,
+                    cost_price=cost_price,
+                    selling_price=(cost_price * Decimal(self.rng.uniform(1.1, 1.8))).quantize(Decimal('0.01')),
+                    stock_qty=self.rng.randint(20, 400),
+                    created_by=self.user,
+                    modified_by=self.user,
+                ))
+
+            with transaction.atomic():
+                created = Product.objects.bulk_create(new_products)
+                logs = StockChangeLog.objects.bulk_create([
+                    self._log(product, 0, product.stock_qty, None, "Initial stock on product creation")
+                    for product in created
+                ])
+                self._backdate(StockChangeLog, logs, first_day)
+            catalog.update((product.pk, product) for product in created)
+            self.stdout.write(f"Products: {len(catalog)}/{count}")
+        return catalog
+
+    def _seed_orders(self, count, items_per_order, first_day, days, customer_ids, catalog):
+        product_ids = list(catalog)
+        statuses, weights = zip(*STATUS_WEIGHTS)
+        created = 0
+        for offset in range(days):
+            day = first_day + timedelta(days=offset)
+            day_count = count // days + (offset < count % days)
+            if not day_count:
+                continue
+
+            first_sequence = OrderNumberSequence.objects.reserve(day, day_count) - day_count + 1
+            new_orders, lines, logs = [], [], []
+            for sequence in range(first_sequence, first_sequence + day_count):
+                status = self.rng.choices(statuses, weights)[0]
+                customer_id = self.rng.choice(customer_ids)
+                line_count = min(self.rng.randint(1, 2 * items_per_order - 1), len(product_ids))
+                items = []
+                for product_id in self.rng.sample(product_ids, line_count):
+                    product = catalog[product_id]
+                    quantity = self.rng.randint(1, 5)
+                    items.append(OrderItem(
+                        product=product,
+                        product_name=product.name,
+                        product_sku=product.sku,
+                        product_category=product.category,
+                        quantity=quantity,
+                        price=product.selling_price,
+                        total_price=product.selling_price * quantity,
+                    ))
+                    if status == ORDER_STATUS_CONFIRMED:
+                        logs.extend(self._take_stock(product, quantity, customer_id))
+
+                new_orders.append(Order(
+                    order_number=OrderService.format_order_number(day, sequence),
+                    customer_id=customer_id,
+                    status=status,
+                    total_amount=sum(item.total_price for item in items),
+                    created_by=self.user,
+                    modified_by=self.user,
+                ))
+                lines.append(items)
+
+            with transaction.atomic():
+                for batch_orders, batch_lines in zip(self._batches(new_orders), self._batches(lines)):
+                    saved = Order.objects.bulk_create(batch_orders)
+                    items = []
+                    for order, order_items in zip(saved, batch_lines):
+                        for item in order_items:
+                            item.order = order
+                        items.extend(order_items)
+                    OrderItem.objects.bulk_create(items, batch_size=self.batch_size)
+                    self._backdate(Order, saved, day, order_date=day)
+                for batch in self._batches(logs):
+                    self._backdate(StockChangeLog, StockChangeLog.objects.bulk_create(batch), day)
+
+            created += day_count
+            self.stdout.write(f"Orders: {created}/{count} ({day.isoformat()})")
+
+    def _take_stock(self, product, quantity, customer_id):
+        logs = []
+        if product.stock_qty < quantity:
+            restocked = product.stock_qty + self.rng.randint(50, 300)
+            logs.append(self._log(product, product.stock_qty, restocked, None, "Restock"))
+            product.stock_qty = restocked
+        logs.append(self._log(product, product.stock_qty, product.stock_qty - quantity, customer_id,
+                              "Order confirmed"))
+        product.stock_qty -= quantity
+        return logs
+
+    def _log(self, product, previous_qty, new_qty, customer_id, reason):
+        return StockChangeLog(
+            product_id=product.pk,
+            product_name=product.name,
+            product_category=product.category,
+            product_sku=product.sku,
+            customer_id=customer_id,
+            customer_name=self.customer_names.get(customer_id, ''),
+            previous_qty=previous_qty,
+            new_qty=new_qty,
+            change_reason=reason,
+            created_by_id=self.user.pk,
+            created_by_name=self.user.get_full_name(),
+        )
+
+    def _backdate(self, model, rows, day, **fields):
+        """Move ``rows``, inserted together, to ``day``; they were stamped with the current time."""
+        if not rows:
+            return
+        moment = timezone.make_aware(datetime.combine(day, day_time(12)))
+        if 'modified_at' in {field.name for field in model._meta.fields}:
+            fields['modified_at'] = moment
+        model.objects.filter(pk__gte=rows[0].pk, pk__lte=rows[-1].pk).update(created_at=moment, **fields)
+
+    def _finish(self, catalog):
+        self.stdout.write("Writing final stock levels...")
+        products = list(catalog.values())
+        with transaction.atomic():
+            for batch in self._batches(products):
+                Product.objects.bulk_update(batch, ['stock_qty'])
+
+        linked = CategoryService.sync()
+        alerts = StockAlertService.sync()
+        DashboardCounterService.reset()
+        if search.is_available():
+            search.rebuild()
+        call_command('backfill_sales_rollup', stdout=self.stdout)
+
+        for namespace in (CACHE_NAMESPACE_PRODUCTS, CACHE_NAMESPACE_CATALOG, CACHE_NAMESPACE_ORDERS,
+                          CACHE_NAMESPACE_CUSTOMERS):
+            increment_namespace(namespace)
+        product_autocomplete.invalidate()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(catalog)} products ({linked} linked to categories, {alerts} open stock alerts)."
+        ))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from common.services import DashboardCounterService
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the stored dashboard counters with a full recount. Exits with "
+        "an error on drift unless --fix is given, which resets them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help="Reset drifted counters from a full recount.")
+
+    def handle(self, *args, fix, **options):
+        drift = DashboardCounterService.drift()
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Dashboard counters match a full recount."))
+            return
+
+        for field, (stored, actual) in drift.items():
+            self.stdout.write(f"{field}: stored {stored}, actual {actual}")
+
+        if not fix:
+            raise CommandError(f"{len(drift)} dashboard counter(s) drifted; rerun with --fix to reset them.")
+
+        DashboardCounterService.reset()
+        self.stdout.write(self.style.SUCCESS("Dashboard counters reset."))
@@ -0,0 +1,247 @@
+"""
+In-process request and service metrics, exposed in the Prometheus text format.
+
+``RequestMetricsMiddleware`` measures a sampled share of requests
+(``METRICS_SAMPLE_RATE``): latency, database query count and time per
+database alias, and response size, labelled by the resolved URL name rather
+than the path, so the number of series is bounded by the URL configuration.
+Streamed responses, such as the order export, run most of their queries
+after the view returns, so they are measured when the stream closes.
+``instrument_service``
+times the public static methods of a service class under the same sampling.
+Counters, such as throttle decisions, count every event and are not sampled.
+
+Every worker process keeps its own registry, and a scrape reports the process
+that served it.
+"""
+import functools
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from common.constants import (
+    METRICS_LATENCY_BUCKETS,
+    METRICS_PREFIX,
+    METRICS_QUERY_COUNT_BUCKETS,
+    METRICS_RESPONSE_SIZE_BUCKETS,
+    METRICS_UNMATCHED_ENDPOINT,
+)
+
+HISTOGRAMS = {
+    'http_request_duration_seconds': ('Request latency.', METRICS_LATENCY_BUCKETS),
+    'http_db_queries': ('Database queries per request and database.', METRICS_QUERY_COUNT_BUCKETS),
+    'http_db_duration_seconds': ('Time spent in database queries per request and database.', METRICS_LATENCY_BUCKETS),
+    'http_response_size_bytes': ('Response body size.', METRICS_RESPONSE_SIZE_BUCKETS),
+    'service_call_duration_seconds': ('Service method latency.', METRICS_LATENCY_BUCKETS),
+}
+
+COUNTERS = {
+    'throttle_decisions_total': 'Throttle decisions per endpoint, priority and outcome.',
+}
+
+
+class _Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def observe(self, name, labels, value) -> None:
+        """Record ``value`` in histogram ``name``; ``labels`` is a tuple of ``(label, value)`` pairs."""
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(HISTOGRAMS[name][1])
+            histogram.observe(value)
+
+    def increment(self, name, labels, amount=1) -> None:
+        """Add ``amount`` to counter ``name``; ``labels`` as for ``observe``."""
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms = {}
+            self._counters = {}
+
+    def render(self) -> str:
+        with self._lock:
+            snapshot = sorted(
+                (name, labels, list(histogram.counts), histogram.sum)
+                for (name, labels), histogram in self._histograms.items()
+            )
+            counters = sorted(self._counters.items())
+
+        lines = [
+            f'# HELP {METRICS_PREFIX}_metrics_sample_rate Share of requests and service calls measured.',
+            f'# TYPE {METRICS_PREFIX}_metrics_sample_rate gauge',
+            f'{METRICS_PREFIX}_metrics_sample_rate {settings.METRICS_SAMPLE_RATE}',
+        ]
+        described = set()
+        for name, labels, counts, total in snapshot:
+            metric = f'{METRICS_PREFIX}_{name}'
+            if name not in described:
+                described.add(name)
+                lines.append(f'# HELP {metric} {HISTOGRAMS[name][0]}')
+                lines.append(f'# TYPE {metric} histogram')
+
+            label_text = _label_text(labels)
+            cumulative = 0
+            for bound, count in zip((*HISTOGRAMS[name][1], '+Inf'), counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{{label_text}}} {total}')
+            lines.append(f'{metric}_count{{{label_text}}} {cumulative}')
+
+        for (name, labels), value in counters:
+            metric = f'{METRICS_PREFIX}_{name}'
+            if name not in described:
+                described.add(name)
+                lines.append(f'# HELP {metric} {COUNTERS[name]}')
+                lines.append(f'# TYPE {metric} counter')
+            lines.append(f'{metric}{{{_label_text(labels)}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def percentile(sorted_values, share):
+    """Nearest-rank percentile of an ascending list, for the benchmark commands."""
+    index = max(int(round(share * len(sorted_values))) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def _label_text(labels):
+    return ','.join(f'{label}="{_escape(value)}"' for label, value in labels)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _sampled():
+    rate = settings.METRICS_SAMPLE_RATE
+    return settings.METRICS_ENABLED and (rate >= 1 or random.random() < rate)
+
+
+registry = MetricsRegistry()
+
+
+class _QueryTimer:
+    """``connection.execute_wrapper`` hook that counts and times queries."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+class RequestMetricsMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not _sampled():
+            return self.get_response(request)
+
+        # Replicas and the audit database run queries for requests too.
+        timers = {alias: _QueryTimer() for alias in connections}
+        started = time.perf_counter()
+        with _timing_queries(timers):
+            response = self.get_response(request)
+
+        if response.streaming and not response.is_async:
+            response.streaming_content = self._measured_stream(response.streaming_content, request, response,
+                                                               timers, started)
+        else:
+            size = None if response.streaming else len(response.content)
+            self._record(request, response, timers, time.perf_counter() - started, size)
+        return response
+
+    def _measured_stream(self, chunks, request, response, timers, started):
+        """``chunks`` of ``response``, recorded once the server has sent or abandoned them."""
+        size = 0
+        try:
+            while True:
+                with _timing_queries(timers):
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                size += len(chunk)
+                yield chunk
+        finally:
+            self._record(request, response, timers, time.perf_counter() - started, size)
+
+    @staticmethod
+    def _record(request, response, timers, duration, size):
+        match = request.resolver_match
+        labels = (
+            ('endpoint', match.view_name if match else METRICS_UNMATCHED_ENDPOINT),
+            ('method', request.method),
+        )
+        registry.observe('http_request_duration_seconds',
+                         (*labels, ('status', f'{response.status_code // 100}xx')), duration)
+        for alias, timer in timers.items():
+            # Every request has a primary sample; other databases only when used.
+            if timer.count or alias == DEFAULT_DB_ALIAS:
+                registry.observe('http_db_queries', (*labels, ('database', alias)), timer.count)
+                registry.observe('http_db_duration_seconds', (*labels, ('database', alias)), timer.duration)
+        if size is not None:
+            registry.observe('http_response_size_bytes', labels, size)
+
+
+def _timing_queries(timers):
+    stack = ExitStack()
+    for alias, timer in timers.items():
+        stack.enter_context(connections[alias].execute_wrapper(timer))
+    return stack
+
+
+def instrument_service(cls):
+    """Class decorator timing every call of ``cls``'s public static methods."""
+    for name, attribute in list(vars(cls).items()):
+        if isinstance(attribute, staticmethod) and not name.startswith('_'):
+            setattr(cls, name, staticmethod(_timed(cls.__name__, name, attribute.__func__)))
+    return cls
+
+
+def _timed(service, method, func):
+    labels = (('service', service), ('method', method))
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _sampled():
+            return func(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            registry.observe('service_call_duration_seconds', labels, time.perf_counter() - started)
+
+    return wrapper
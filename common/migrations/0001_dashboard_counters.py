@@ -0,0 +1,47 @@
+# Generated by Django 5.1.2 on 2026-10-18 05:30
+
+from django.db import migrations, models
+
+from products.constants import LOW_STOCK_THRESHOLD
+from users.constants import ROLE_CUSTOMER
+
+
+def initialize_counters(apps, schema_editor):
+    DashboardCounters = apps.get_model('common', 'DashboardCounters')
+    Product = apps.get_model('products', 'Product')
+    User = apps.get_model('users', 'User')
+
+    DashboardCounters.objects.update_or_create(pk=1, defaults={
+        'total_customers': User.objects.filter(role=ROLE_CUSTOMER).count(),
+        'low_stock_count': Product.objects.filter(stock_qty__lte=LOW_STOCK_THRESHOLD, stock_qty__gt=0).count(),
+        'out_of_stock_count': Product.objects.filter(stock_qty=0).count(),
+    })
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('products', '0002_product_image'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardCounters',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_customers', models.PositiveIntegerField(default=0)),
+                ('low_stock_count', models.PositiveIntegerField(default=0)),
+                ('out_of_stock_count', models.PositiveIntegerField(default=0)),
+                ('modified_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Dashboard Counters',
+                'verbose_name_plural': 'Dashboard Counters',
+                'db_table': 'common_dashboard_counters',
+            },
+        ),
+        migrations.RunPython(initialize_counters, migrations.RunPython.noop),
+    ]
@@ -19,4 +19,24 @@ class BaseCreatedByUpdatedBy(models.Model):
 class BaseModel(BaseTimeStamp, BaseCreatedByUpdatedBy):
 
     class Meta:
-        abstract = True
\ No newline at end of file
+        abstract = True
+
+
+class DashboardCounters(models.Model):
+    """
+    Single-row table of dashboard counts, kept up to date by the services
+    that change them so the dashboard never has to count rows.
+    """
+    total_customers = models.PositiveIntegerField(default=0)
+    low_stock_count = models.PositiveIntegerField(default=0)
+    out_of_stock_count = models.PositiveIntegerField(default=0)
+    modified_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'common_dashboard_counters'
+        verbose_name = 'Dashboard Counters'
+        verbose_name_plural = 'Dashboard Counters'
+
+    def __str__(self):
+        return (f"customers={self.total_customers} low_stock={self.low_stock_count} "
+                f"out_of_stock={self.out_of_stock_count}")
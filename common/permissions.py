@@ -0,0 +1,12 @@
+import hmac
+
+from django.conf import settings
+from rest_framework.permissions import BasePermission
+
+
+class HasMetricsToken(BasePermission):
+    """Lets a metrics scraper in with the ``X-Metrics-Token`` header instead of a user login."""
+
+    def has_permission(self, request, view):
+        token = settings.METRICS_TOKEN
+        return bool(token) and hmac.compare_digest(request.headers.get('X-Metrics-Token', ''), token)
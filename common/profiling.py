@@ -0,0 +1,136 @@
+"""
+On-demand profiling of single requests.
+
+An admin adds ``X-Profile: 1`` or ``?profile=1`` to any request, and
+``RequestProfilerMiddleware`` runs it under ``cProfile``. The stats are
+written as a pstats file to ``PROFILE_DIR``, named in the ``X-Profile-Id``
+response header, and listed and downloaded through the admin-only profiles
+endpoints. Only the newest ``PROFILE_KEEP`` files are kept.
+
+Requests without the trigger only pay for a header and a query parameter
+lookup; the JWT is checked only when the trigger is present, and any token
+the API would reject, including revoked ones, runs the request unprofiled.
+``0`` or any value other than ``1``/``true``/``yes`` does not trigger it.
+One request is profiled at a time per process; a concurrent request asking
+for a profile runs unprofiled. A profile that cannot be saved is logged and
+the response goes out as it is.
+"""
+import cProfile
+import io
+import logging
+import pstats
+import re
+import threading
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework_simplejwt.exceptions import TokenError
+
+from common.constants import PROFILE_FILE_SUFFIX, PROFILE_HEADER, PROFILE_QUERY_PARAM, PROFILE_SUMMARY_LIMIT
+from users.authentication import StatelessJWTAuthentication
+from users.constants import ROLE_ADMIN
+
+logger = logging.getLogger(__name__)
+
+PROFILE_NAME = re.compile(r'^[\w.-]+\.prof$')
+
+_profiling = threading.Lock()
+
+
+def _enabled(value):
+    return value is not None and value.lower() in ('1', 'true', 'yes')
+
+
+def _requested(request):
+    return _enabled(request.META.get(PROFILE_HEADER)) or _enabled(request.GET.get(PROFILE_QUERY_PARAM))
+
+
+def _is_admin(request):
+    try:
+        authenticated = StatelessJWTAuthentication().authenticate(Request(request))
+    except (AuthenticationFailed, TokenError):
+        return False
+    return authenticated is not None and authenticated[0].role == ROLE_ADMIN
+
+
+class RequestProfilerMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not _requested(request) or not _is_admin(request):
+            return self.get_response(request)
+
+        if not _profiling.acquire(blocking=False):
+            response = self.get_response(request)
+            response['X-Profile-Id'] = 'busy'
+            return response
+
+        try:
+            profiler = cProfile.Profile()
+            response = profiler.runcall(self.get_response, request)
+            try:
+                name = save_profile(profiler, request)
+            except Exception:
+                # The request itself has completed; only its profile is lost.
+                logger.exception("Saving the request profile failed.")
+                name = 'failed'
+        finally:
+            _profiling.release()
+
+        response['X-Profile-Id'] = name
+        return response
+
+
+def profile_dir() -> Path:
+    return Path(settings.PROFILE_DIR)
+
+
+def save_profile(profiler, request) -> str:
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+
+    match = request.resolver_match
+    endpoint = re.sub(r'[^\w-]', '_', match.view_name if match else 'unmatched')
+    name = f'{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{endpoint}-{uuid.uuid4().hex[:8]}{PROFILE_FILE_SUFFIX}'
+    profiler.dump_stats(directory / name)
+
+    for stale in list_profiles()[settings.PROFILE_KEEP:]:
+        (directory / stale['name']).unlink(missing_ok=True)
+    return name
+
+
+def list_profiles() -> list[dict]:
+    """Stored profiles, newest first."""
+    directory = profile_dir()
+    if not directory.is_dir():
+        return []
+    profiles = []
+    for path in directory.glob(f'*{PROFILE_FILE_SUFFIX}'):
+        stat = path.stat()
+        profiles.append({
+            'name': path.name,
+            'size': stat.st_size,
+            'created_at': datetime.fromtimestamp(stat.st_mtime, timezone.utc),
+        })
+    return sorted(profiles, key=lambda profile: (profile['created_at'], profile['name']), reverse=True)
+
+
+def profile_path(name) -> Path | None:
+    """Path of the stored profile ``name``, or ``None`` if there is no such profile."""
+    if not PROFILE_NAME.match(name):
+        return None
+    path = profile_dir() / name
+    return path if path.is_file() else None
+
+
+def summarize(path) -> str:
+    """The functions with the highest cumulative time, as ``pstats`` prints them."""
+    stream = io.StringIO()
+    pstats.Stats(str(path), stream=stream).sort_stats('cumulative').print_stats(PROFILE_SUMMARY_LIMIT)
+    return stream.getvalue()
@@ -0,0 +1,119 @@
+"""
+Read replica routing.
+
+Views that opt in with ``ReplicaReadMixin`` read from a replica in
+``DATABASE_REPLICA_ALIASES`` on GET, picked at random once per request so
+every query of the request sees the same snapshot; everything else, and
+every write, uses ``default``. ``ReplicaRoutingMiddleware`` notes when a
+request writes and then pins that user to the primary for
+``READ_YOUR_WRITES_SECONDS``, so their own changes never disappear behind
+replication lag. Pins live in the cache, so they hold across workers that
+share a cache backend.
+
+Replicas are only as fresh as their replication. Cached responses built from
+a replica are kept apart from those built from the primary, so a pinned user
+never gets a stale entry, and expire within the pin window.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+from common.constants import REPLICA_PIN_KEY_PREFIX
+
+_request_state = ContextVar('replica_request_state', default=None)
+
+
+class _RequestState:
+
+    def __init__(self):
+        # The replica this request reads from, if any.
+        self.replica = None
+        self.wrote = False
+
+
+def _pin_key(user_id):
+    return f'{REPLICA_PIN_KEY_PREFIX}:{user_id}'
+
+
+def pin_to_primary(user_id) -> None:
+    cache.set(_pin_key(user_id), 1, settings.READ_YOUR_WRITES_SECONDS)
+
+
+def is_pinned(user_id) -> bool:
+    return cache.get(_pin_key(user_id)) is not None
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        if state is None or state.wrote:
+            return None
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold copies of the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema by replication, not by migrating them.
+        return db not in settings.DATABASE_REPLICA_ALIASES
+
+
+class ReplicaRoutingMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = _RequestState()
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+
+        # DRF stores the user it authenticated on the underlying request.
+        user = getattr(request, 'user', None)
+        if state.wrote and user is not None and user.is_authenticated:
+            pin_to_primary(user.pk)
+        return response
+
+
+class ReplicaReadMixin:
+    """
+    Serve a view's GET requests from a read replica unless the caller wrote
+    recently. Place it before ``CachedResponseMixin``.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        state = _request_state.get()
+        if (
+            state is not None
+            and request.method in SAFE_METHODS
+            and settings.DATABASE_REPLICA_ALIASES
+            and not (request.user.is_authenticated and is_pinned(request.user.pk))
+        ):
+            state.replica = random.choice(settings.DATABASE_REPLICA_ALIASES)
+
+    def _reads_replica(self):
+        state = _request_state.get()
+        return state is not None and state.replica is not None and not state.wrote
+
+    def get_cache_key_parts(self) -> tuple:
+        return (*super().get_cache_key_parts(), 'replica' if self._reads_replica() else 'primary')
+
+    def get_cache_timeout(self) -> int:
+        # A replica may lag by up to the pin window; do not keep its answer longer.
+        timeout = super().get_cache_timeout()
+        return min(timeout, settings.READ_YOUR_WRITES_SECONDS) if self._reads_replica() else timeout
@@ -0,0 +1,8 @@
+from rest_framework import serializers
+
+
+class ProfileSerializer(serializers.Serializer):
+
+    name = serializers.CharField(read_only=True)
+    size = serializers.IntegerField(read_only=True)
+    created_at = serializers.DateTimeField(read_only=True)
@@ -0,0 +1,79 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from common.constants import COUNTER_FIELDS, DASHBOARD_COUNTERS_ID
+from common.models import DashboardCounters
+from products.constants import LOW_STOCK, OUT_OF_STOCK
+from products.models import Product
+from users.models import User
+
+
+class DashboardCounterService:
+
+    @staticmethod
+    def get() -> DashboardCounters:
+        counters = DashboardCounters.objects.filter(pk=DASHBOARD_COUNTERS_ID).first()
+        if counters is None:
+            counters = DashboardCounterService.reset()
+        return counters
+
+    @staticmethod
+    def adjust(**deltas) -> None:
+        """
+        Add ``deltas`` to the counters with a single atomic UPDATE. Call it
+        inside the transaction that makes the change being counted, so both
+        commit or roll back together.
+        """
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if not deltas:
+            return
+
+        updated = DashboardCounters.objects.filter(pk=DASHBOARD_COUNTERS_ID).update(
+            **{field: F(field) + delta for field, delta in deltas.items()}
+        )
+        if not updated:
+            # First use: the recount already includes this change.
+            DashboardCounterService.reset()
+
+    @staticmethod
+    def adjust_for_stock_changes(changes) -> None:
+        """``changes`` yields ``(old_status, new_status)`` pairs; ``None`` means the product did not exist."""
+        deltas = {'low_stock_count': 0, 'out_of_stock_count': 0}
+        for old_status, new_status in changes:
+            if old_status == new_status:
+                continue
+            for status, field in ((LOW_STOCK, 'low_stock_count'), (OUT_OF_STOCK, 'out_of_stock_count')):
+                deltas[field] += (new_status == status) - (old_status == status)
+
+        DashboardCounterService.adjust(**deltas)
+
+    @staticmethod
+    def recount() -> dict:
+        return {
+            'total_customers': User.objects.customers().count(),
+            'low_stock_count': Product.objects.low_stock().count(),
+            'out_of_stock_count': Product.objects.out_of_stock().count(),
+        }
+
+    @staticmethod
+    @transaction.atomic
+    def reset() -> DashboardCounters:
+        counts = DashboardCounterService.recount()
+        try:
+            with transaction.atomic():
+                counters, _ = DashboardCounters.objects.update_or_create(pk=DASHBOARD_COUNTERS_ID, defaults=counts)
+        except IntegrityError:
+            # Created concurrently by another worker.
+            counters = DashboardCounters.objects.get(pk=DASHBOARD_COUNTERS_ID)
+        return counters
+
+    @staticmethod
+    def drift() -> dict:
+        """Counters that disagree with a full recount, as ``{field: (stored, actual)}``."""
+        counters = DashboardCounterService.get()
+        actual = DashboardCounterService.recount()
+        return {
+            field: (getattr(counters, field), actual[field])
+            for field in COUNTER_FIELDS
+            if getattr(counters, field) != actual[field]
+        }
@@ -0,0 +1,710 @@
+import fcntl
+import glob
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings as django_settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from common.cache import CachedResponseMixin, cache_stats, increment_namespace
+from common.cache_backends import SharedFileCache
+from common.db import _WriterLane, writer_lane
+from common.metrics import registry
+from common.constants import CACHE_NAMESPACE_PRODUCTS, REPLICA_PIN_KEY_PREFIX
+from common.models import DashboardCounters
+from common.replicas import ReplicaRouter, is_pinned
+from common.services import DashboardCounterService
+from common.throttling import Bucket, PriorityTokenBucketThrottle, TokenBucketStore, throttle_store, throttle_store_path
+from common.views import DashboardInsightsApiView
+from miniERP.pagination import CustomCursorPagination
+from orders.constants import ORDER_STATUS_CANCELLED, ORDER_STATUS_CONFIRMED
+from orders.models import Order
+from orders.services import OrderService
+from products.autocomplete import product_autocomplete
+from products.models import Product, StockChangeLog
+from products.services import ProductService
+from users.blacklist import token_blacklist_filter
+from users.constants import ROLE_ADMIN, ROLE_CUSTOMER, ROLE_SALES_USER
+from users.models import User
+from users.services import CustomerService
+
+
+def create_product(user, index, stock_qty):
+    return ProductService.create_new_product(
+        sku=f"SKU-{index:05d}",
+        name=f"Product {index}",
+        category="Hardware",
+        cost_price=Decimal('5.00'),
+        selling_price=Decimal('10.00'),
+        stock_qty=stock_qty,
+        image=None,
+        created_by=user,
+        modified_by=user,
+    )
+
+
+class DashboardCounterTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(email='admin@example.com', role=ROLE_ADMIN, first_name='Test', last_name='Admin')
+        DashboardCounterService.reset()
+
+    def _create_product(self, index, stock_qty):
+        return create_product(self.admin, index, stock_qty)
+
+    def _counts(self):
+        counters = DashboardCounterService.get()
+        return counters.total_customers, counters.low_stock_count, counters.out_of_stock_count
+
+    def test_counters_follow_writes_through_services(self):
+        customer = CustomerService.create_customer({'email': 'customer@example.com', 'role': ROLE_CUSTOMER})
+        in_stock = self._create_product(1, stock_qty=12)
+        low = self._create_product(2, stock_qty=3)
+        self._create_product(3, stock_qty=0)
+        self.assertEqual(self._counts(), (1, 1, 1))
+
+        order = OrderService.create_order(
+            customer_id=customer.id,
+            items=[{'product_id': in_stock.id, 'quantity': 2}, {'product_id': low.id, 'quantity': 3}],
+            created_by=self.admin,
+            modified_by=self.admin,
+            products_dict={in_stock.id: in_stock, low.id: low},
+        )
+        OrderService.change_order_status(order, ORDER_STATUS_CONFIRMED, self.admin)
+        self.assertEqual(self._counts(), (1, 1, 2))
+
+        OrderService.change_order_status(order, ORDER_STATUS_CANCELLED, self.admin)
+        self.assertEqual(self._counts(), (1, 1, 1))
+
+        ProductService.update_product(in_stock, {'stock_qty': 0}, self.admin)
+        ProductService.delete_product(low, self.admin)
+        CustomerService.delete_customer(
+            CustomerService.create_customer({'email': 'other@example.com', 'role': ROLE_CUSTOMER})
+        )
+        self.assertEqual(self._counts(), (1, 0, 2))
+        self.assertEqual(DashboardCounterService.drift(), {})
+
+    def test_dashboard_reads_counters(self):
+        self._create_product(1, stock_qty=0)
+        self._create_product(2, stock_qty=5)
+        self.client.force_authenticate(self.admin)
+
+        response = self.client.get(reverse('common:dashboard-insights'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['out_of_stock_count'], 1)
+        self.assertEqual(response.data['low_stock_count'], 1)
+        self.assertEqual([p['sku'] for p in response.data['low_stock_products']], ['SKU-00002'])
+
+    def test_verify_command_reports_and_fixes_drift(self):
+        Product.objects.create(sku='RAW-1', name='Raw', category='Hardware',
+                               cost_price=1, selling_price=2, stock_qty=0)
+
+        with self.assertRaises(CommandError):
+            call_command('verify_dashboard_counters', stdout=open('/dev/null', 'w'))
+
+        call_command('verify_dashboard_counters', fix=True, stdout=open('/dev/null', 'w'))
+        self.assertEqual(DashboardCounters.objects.get().out_of_stock_count, 1)
+
+
+class ResponseCacheTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(email='admin@example.com', role=ROLE_ADMIN, first_name='Test', last_name='Admin')
+        cls.product = create_product(cls.admin, 1, stock_qty=50)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.admin)
+
+    def _get(self, query=''):
+        return self.client.get(reverse('list-create-products') + query)
+
+    def test_writes_invalidate_cached_lists_after_commit(self):
+        self.assertEqual(self._get()['X-Cache'], 'MISS')
+        self.assertEqual(self._get()['X-Cache'], 'HIT')
+        # Same parameters in another order share the entry.
+        self.assertEqual(self._get('?ordering=sku&category=Hardware')['X-Cache'], 'MISS')
+        self.assertEqual(self._get('?category=Hardware&ordering=sku')['X-Cache'], 'HIT')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductService.update_stock(self.product, 7, self.admin)
+
+        response = self._get()
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['stock_qty'], 7)
+
+        stats = self.client.get(reverse('common:response-cache-stats')).data['product-list']
+        self.assertEqual((stats['hits'], stats['misses']), (2, 3))
+
+    def test_other_workers_see_invalidations(self):
+        self.assertEqual(self._get()['X-Cache'], 'MISS')
+
+        # Another worker process has its own backend instance on the same files.
+        other_worker = SharedFileCache(django_settings.CACHES['default']['LOCATION'], {})
+        with mock.patch('common.cache.cache', other_worker):
+            self.assertEqual(self._get()['X-Cache'], 'HIT')
+            with self.captureOnCommitCallbacks(execute=True):
+                ProductService.update_stock(self.product, 7, self.admin)
+        self.assertEqual(self._get()['X-Cache'], 'MISS')
+
+
+class SlowView(CachedResponseMixin, APIView):
+
+    permission_classes = []
+    cache_name = 'test-slow-view'
+    calls = 0
+    calls_lock = threading.Lock()
+
+    def build_response(self, request):
+        with self.calls_lock:
+            SlowView.calls += 1
+        time.sleep(0.2)
+        return Response({'value': 42})
+
+
+class ResponseCacheStampedeTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        SlowView.calls = 0
+
+    def _request(self, _):
+        request = APIRequestFactory().get('/slow/', {'page': '1'})
+        force_authenticate(request, user=User(role=ROLE_ADMIN))
+        return SlowView.as_view()(request)
+
+    def test_concurrent_misses_compute_once(self):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            responses = list(executor.map(self._request, range(8)))
+
+        self.assertEqual(SlowView.calls, 1)
+        self.assertTrue(all(response.data == {'value': 42} for response in responses))
+        self.assertEqual(cache_stats()['test-slow-view'], {
+            'hits': 0, 'misses': 1, 'coalesced': 7, 'hit_ratio': 0.875,
+        })
+
+
+class QueryBudgetTests(APITestCase):
+    """
+    Every API endpoint runs a fixed number of queries however many rows it
+    handles. The data set and the page size are both ``rows``, so a query per
+    row shows up as a budget that differs between this class and its
+    ``rows = 100`` subclass.
+    """
+    rows = 10
+    budgets = {
+        'list-products': 1,
+        'search-products': 1,
+        'retrieve-product': 1,
+        'update-product': 7,
+        'stock-history': 1,
+        'categories': 1,
+        'facets': 1,
+        'autocomplete': 1,
+        'stock-alerts': 1,
+        'list-orders': 1,
+        'create-order': 13,
+        'retrieve-order': 2,
+        'order-items': 1,
+        'bulk-status': 13,
+        'import-orders': 10,
+        'export-orders': 1,
+        'sales-time-series': 1,
+        'list-customers': 1,
+        'retrieve-customer': 1,
+        'dashboard': 3,
+        'cache-stats': 0,
+        'metrics': 0,
+        'profiles': 0,
+        'login': 2,
+        # Builds the blacklist filter first; later refreshes load only the user.
+        'refresh': 3,
+        'logout': 6,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(email='admin@example.com', role=ROLE_ADMIN, first_name='Test', last_name='Admin')
+        cls.admin.set_password('secret-password')
+        cls.admin.save()
+        cls.editor = User.objects.create(email='editor@example.com', role=ROLE_ADMIN, first_name='Test', last_name='Editor')
+
+        cls.customers = [
+            CustomerService.create_customer({
+                'email': f'customer{index}@example.com',
+                'role': ROLE_CUSTOMER,
+                'first_name': 'Customer',
+                'last_name': str(index),
+                'created_by': cls.admin,
+                'modified_by': cls.editor,
+            })
+            for index in range(cls.rows)
+        ]
+        # Every third product is low on stock, so there are open stock alerts.
+        cls.products = [create_product(cls.admin, index, 5 if index % 3 == 0 else 1000) for index in range(cls.rows)]
+        Product.objects.update(modified_by=cls.editor)
+
+        cls.orders = [
+            OrderService.create_order(
+                customer_id=customer.id,
+                items=[{'product_id': product.id, 'quantity': 1}],
+                created_by=cls.admin,
+                modified_by=cls.editor,
+                products_dict={product.id: product},
+            )
+            for customer, product in zip(cls.customers, cls.products)
+        ]
+        OrderService.bulk_change_order_status([order.id for order in cls.orders[::2]], ORDER_STATUS_CONFIRMED, cls.admin)
+
+    def setUp(self):
+        cache.clear()
+        product_autocomplete.invalidate()
+        token_blacklist_filter.invalidate()
+        self.client.force_authenticate(self.admin)
+        pagination = mock.patch.object(CustomCursorPagination, 'page_size', self.rows)
+        pagination.start()
+        self.addCleanup(pagination.stop)
+
+    def _count_queries(self, method, url, data=None, **extra):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, **extra)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 300, (url, getattr(response, 'data', None)))
+        return len(queries)
+
+    def test_endpoints_stay_within_budget(self):
+        product, order, customer = self.products[0], self.orders[0], self.customers[0]
+        refresh = str(RefreshToken.for_user(self.admin))
+
+        counts = {
+            name: self._count_queries(method, url, data)
+            for name, method, url, data in [
+                ('list-products', 'get', reverse('list-create-products'), None),
+                ('search-products', 'get', reverse('list-create-products'), {'search': 'product'}),
+                ('retrieve-product', 'get', reverse('retrieve-update-destroy-product', args=[product.id]), None),
+                ('stock-history', 'get', reverse('product-stock-history'), None),
+                ('categories', 'get', reverse('list-categories'), None),
+                ('facets', 'get', reverse('product-facets'), None),
+                ('autocomplete', 'get', reverse('product-autocomplete'), {'q': 'product'}),
+                ('stock-alerts', 'get', reverse('list-stock-alerts'), None),
+                ('list-orders', 'get', reverse('orders:list-create-orders'), None),
+                ('retrieve-order', 'get', reverse('orders:retrieve-update-destroy-order', args=[order.id]), None),
+                ('order-items', 'get', reverse('orders:order-items', args=[order.id]), None),
+                ('export-orders', 'get', reverse('orders:export-orders'), None),
+                ('sales-time-series', 'get', reverse('orders:sales-time-series'), None),
+                ('list-customers', 'get', reverse('list-create-customer'), None),
+                ('retrieve-customer', 'get', reverse('retrieve-update-destroy-customer', args=[customer.id]), None),
+                ('dashboard', 'get', reverse('common:dashboard-insights'), None),
+                ('cache-stats', 'get', reverse('common:response-cache-stats'), None),
+                ('metrics', 'get', reverse('common:metrics'), None),
+                ('profiles', 'get', reverse('common:profiles'), None),
+                ('login', 'post', reverse('login'), {'email': self.admin.email, 'password': 'secret-password'}),
+                ('refresh', 'post', reverse('refresh'), {'refresh': refresh}),
+                ('logout', 'post', reverse('logout'), {'refresh': refresh}),
+            ]
+        }
+        counts['update-product'] = self._count_queries(
+            'patch', reverse('retrieve-update-destroy-product', args=[product.id]), {'name': 'Renamed'}, format='json'
+        )
+        counts['create-order'] = self._count_queries('post', reverse('orders:list-create-orders'), {
+            'customer_id': customer.id,
+            'items': [{'product_id': product.id, 'quantity': 1} for product in self.products],
+        }, format='json')
+        counts['bulk-status'] = self._count_queries('post', reverse('orders:bulk-update-order-status'), {
+            'order_ids': [order.id for order in self.orders],
+            'status': ORDER_STATUS_CONFIRMED,
+        }, format='json')
+        lines = ''.join(
+            json.dumps({'order_ref': f'IMP-{index}', 'customer_id': customer.id,
+                        'items': [{'product_id': product.id, 'quantity': 1}]}) + '\n'
+            for index, (customer, product) in enumerate(zip(self.customers, self.products))
+        )
+        counts['import-orders'] = self._count_queries('post', reverse('orders:import-orders'), {
+            'file': SimpleUploadedFile('orders.ndjson', lines.encode()),
+        }, format='multipart')
+
+        self.assertEqual(counts, self.budgets)
+
+    def test_related_names_are_serialized(self):
+        product = self.client.get(reverse('list-create-products')).data['results'][0]
+        self.assertEqual((product['created_by'], product['modified_by']), ('Test Admin', 'Test Editor'))
+
+        order = self.client.get(reverse('orders:list-create-orders')).data['results'][0]
+        self.assertEqual(order['customer'], self.customers[-1].get_full_name())
+
+
+class LargeQueryBudgetTests(QueryBudgetTests):
+    rows = 100
+
+
+class MetricsTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(email='admin@example.com', role=ROLE_ADMIN, first_name='Test', last_name='Admin')
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.client.force_authenticate(self.admin)
+
+    def _scrape(self, **headers):
+        response = self.client.get(reverse('common:metrics'), **headers)
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_requests_and_service_calls_are_recorded_per_endpoint(self):
+        create_product(self.admin, 1, stock_qty=5)
+        self.client.get(reverse('list-create-products'))
+        self.client.get('/api/v1/missing/')
+
+        metrics = self._scrape()
+        self.assertIn('minierp_http_request_duration_seconds_count'
+                      '{endpoint="list-create-products",method="GET",status="2xx"} 1', metrics)
+        self.assertIn('minierp_http_db_queries_count'
+                      '{endpoint="list-create-products",method="GET",database="default"} 1', metrics)
+        self.assertIn('minierp_http_response_size_bytes_count{endpoint="list-create-products",method="GET"} 1',
+                      metrics)
+        self.assertIn('endpoint="unmatched",method="GET",status="4xx"', metrics)
+        self.assertIn('minierp_service_call_duration_seconds_count'
+                      '{service="ProductService",method="create_new_product"} 1', metrics)
+
+    def test_streamed_responses_are_recorded_when_sent(self):
+        response = self.client.get(reverse('orders:export-orders'), {'file_format': 'ndjson'})
+        self.assertNotIn('endpoint="orders:export-orders"', self._scrape())
+
+        size = len(b''.join(response.streaming_content))
+        metrics = self._scrape()
+        self.assertIn('minierp_http_db_queries_count'
+                      '{endpoint="orders:export-orders",method="GET",database="default"} 1', metrics)
+        self.assertNotIn('minierp_http_db_queries_sum'
+                         '{endpoint="orders:export-orders",method="GET",database="default"} 0', metrics)
+        self.assertIn(f'minierp_http_response_size_bytes_sum{{endpoint="orders:export-orders",method="GET"}} {size}',
+                      metrics)
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_recorded(self):
+        self.client.get(reverse('list-create-products'))
+        self.assertNotIn('endpoint="list-create-products",method="GET"', self._scrape())
+
+    @override_settings(METRICS_TOKEN='scrape-token')
+    def test_scrapers_authenticate_with_the_metrics_token(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(reverse('common:metrics')).status_code, 401)
+        self.assertIn('minierp_metrics_sample_rate 1.0', self._scrape(HTTP_X_METRICS_TOKEN='scrape-token'))
+
+
+# Buckets refill with time, so the clock stands still.
+@mock.patch('common.throttling.time', **{'time.return_value': 1000.0})
+@mock.patch.object(APIView, 'throttle_classes', [PriorityTokenBucketThrottle])
+@override_settings(THROTTLE_ENABLED=True)
+class ThrottleTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(email='admin@example.com', role=ROLE_ADMIN, first_name='Test', last_name='Admin')
+        cls.sales = User.objects.create(email='sales@example.com', role=ROLE_SALES_USER, first_name='Test', last_name='Sales')
+        cls.customer = CustomerService.create_customer({'email': 'customer@example.com', 'role': ROLE_CUSTOMER})
+        cls.product = create_product(cls.admin, 1, stock_qty=100)
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        throttle_store.clear(throttle_store_path())
+        self.client.force_authenticate(self.admin)
+
+    def _dashboard(self):
+        return self.client.get(reverse('common:dashboard-insights'))
+
+    def _create_order(self):
+        return self.client.post(reverse('orders:list-create-orders'), {
+            'customer_id': self.customer.id,
+            'items': [{'product_id': self.product.id, 'quantity': 1}],
+        }, format='json').status_code
+
+    @mock.patch.object(DashboardInsightsApiView, 'throttle_rate', (0.5, 2), create=True)
+    def test_callers_are_limited_per_endpoint(self, clock):
+        self.assertEqual(self._dashboard().status_code, 200)
+        self.assertEqual(self._dashboard().status_code, 200)
+        response = self._dashboard()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '2')
+
+        # Other endpoints and other users keep their own buckets.
+        self.assertEqual(self.client.get(reverse('list-create-products')).status_code, 200)
+        self.client.force_authenticate(self.sales)
+        self.assertEqual(self._dashboard().status_code, 200)
+
+        clock.time.return_value += 2
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self._dashboard().status_code, 200)
+
+        metrics = self.client.get(reverse('common:metrics')).content.decode()
+        self.assertIn('minierp_throttle_decisions_total'
+                      '{endpoint="common:dashboard-insights",priority="low",decision="admitted"} 4', metrics)
+        self.assertIn('minierp_throttle_decisions_total'
+                      '{endpoint="common:dashboard-insights",priority="low",decision="user_limit"} 1', metrics)
+
+    @override_settings(THROTTLE_STORE='/nonexistent-dir/throttle.sqlite3')
+    def test_requests_are_let_through_when_the_store_is_unusable(self, clock):
+        self.assertEqual(self._dashboard().status_code, 200)
+        metrics = self.client.get(reverse('common:metrics')).content.decode()
+        self.assertIn('{endpoint="common:dashboard-insights",priority="low",decision="store_error"} 1', metrics)
+
+    @override_settings(THROTTLE_ADMISSION_RATE=4)
+    def test_dashboard_reads_are_shed_before_order_writes(self, clock):
+        # Of 4 admission tokens, dashboard reads leave 2 and order writes none.
+        self.assertEqual(self._dashboard().status_code, 200)
+        self.assertEqual(self._dashboard().status_code, 200)
+        self.client.force_authenticate(self.sales)
+        self.assertEqual(self._dashboard().status_code, 429)
+
+        self.assertEqual(self._create_order(), 201)
+        self.assertEqual(self._create_order(), 201)
+        self.assertEqual(self._create_order(), 429)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_workers_share_buckets_through_the_store(self, clock):
+        # Two stores on one file stand in for two worker processes.
+        path = tempfile.NamedTemporaryFile(suffix='.sqlite3', delete=False).name
+        self.addCleanup(lambda: [os.remove(name) for name in glob.glob(f'{path}*')])
+        first, second = TokenBucketStore(), TokenBucketStore()
+        bucket = [Bucket('user:1:orders', 0.001, 4)]
+
+        self.assertEqual(first.acquire(path, bucket)[0], None)
+        self.assertEqual(first.acquire(path, bucket)[0], None)
+        # The first worker's two tokens reach the file on its next sync, the
+        # third on the one after; the second worker sees the two.
+        clock.time.return_value += django_settings.THROTTLE_SYNC_SECONDS
+        self.assertEqual(first.acquire(path, bucket)[0], None)
+        self.assertEqual(second.acquire(path, bucket)[0], None)
+        self.assertEqual(second.acquire(path, bucket)[0], None)
+        self.assertEqual(second.acquire(path, bucket)[0], 0)
+
+
+
+class RequestProfilingTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(email='admin@example.com', role=ROLE_ADMIN, first_name='Test', last_name='Admin')
+        cls.sales = User.objects.create(email='sales@example.com', role=ROLE_SALES_USER, first_name='Test', last_name='Sales')
+
+    def setUp(self):
+        cache.clear()
+        profile_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(profile_dir.cleanup)
+        settings = override_settings(PROFILE_DIR=profile_dir.name, PROFILE_KEEP=2)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def _get(self, user, url, **extra):
+        token = RefreshToken.for_user(user).access_token
+        return self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {token}', **extra)
+
+    def test_admins_profile_requests_on_demand(self):
+        url = reverse('list-create-products')
+        self.assertNotIn('X-Profile-Id', self._get(self.admin, url))
+        self.assertNotIn('X-Profile-Id', self._get(self.sales, url, HTTP_X_PROFILE='1'))
+        self.assertNotIn('X-Profile-Id', self._get(self.admin, url + '?profile=0'))
+        self.assertNotIn('X-Profile-Id', self._get(self.admin, url + '?noprofile=1'))
+
+        names = [self._get(self.admin, url + '?profile=1')['X-Profile-Id'] for _ in range(3)]
+        self.assertIn('-list-create-products-', names[-1])
+
+        listed = self._get(self.admin, reverse('common:profiles')).data['results']
+        self.assertEqual([profile['name'] for profile in listed], names[:0:-1])
+
+        download = self._get(self.admin, reverse('common:profile-download', args=[names[-1]]))
+        self.assertEqual(download.status_code, 200)
+        self.assertTrue(b''.join(download.streaming_content))
+        summary = self._get(self.admin, reverse('common:profile-download', args=[names[-1]]) + '?summary=1')
+        self.assertIn(b'cumulative', summary.content)
+
+        self.assertEqual(self._get(self.admin, reverse('common:profile-download', args=['..prof'])).status_code, 404)
+        self.assertEqual(self._get(self.sales, reverse('common:profiles')).status_code, 403)
+
+    def test_tokens_of_deleted_users_are_rejected_not_profiled(self):
+        user = User.objects.create(email='gone@example.com', role=ROLE_ADMIN)
+        token = RefreshToken.for_user(user).access_token
+        user.delete()
+        response = self.client.get(reverse('list-create-products') + '?profile=1',
+                                   HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 401)
+        self.assertNotIn('X-Profile-Id', response)
+
+    def test_requests_succeed_when_the_profile_cannot_be_saved(self):
+        with tempfile.NamedTemporaryFile() as not_a_directory, \
+                override_settings(PROFILE_DIR=not_a_directory.name), self.assertLogs('common.profiling'):
+            response = self._get(self.admin, reverse('list-create-products') + '?profile=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Profile-Id'], 'failed')
+
+
+class SeedDataTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(email='admin@example.com', role=ROLE_ADMIN, first_name='Test', last_name='Admin')
+
+    def setUp(self):
+        cache.clear()
+        product_autocomplete.invalidate()
+
+    def test_seeded_stock_matches_history_and_benchmarks_run(self):
+        call_command('seed_data', customers=5, products=8, orders=40, days=4, batch_size=7, stdout=io.StringIO())
+
+        self.assertEqual(Product.objects.count(), 8)
+        self.assertEqual(Order.objects.count(), 40)
+        self.assertEqual(Order.objects.dates('order_date', 'day').count(), 4)
+        for product in Product.objects.all():
+            logs = StockChangeLog.objects.filter(product_id=product.pk)
+            self.assertEqual(product.stock_qty, sum(log.new_qty - log.previous_qty for log in logs))
+        call_command('verify_dashboard_counters', stdout=io.StringIO())
+
+        with tempfile.NamedTemporaryFile(suffix='.json') as output, tempfile.TemporaryDirectory() as profile_dir, \
+                override_settings(PROFILE_DIR=profile_dir):
+            call_command('run_benchmarks', requests=2, warmup=0, writes=True, output=output.name,
+                         stdout=io.StringIO())
+            report = json.load(output)
+        # Two orders created and two imported files of ten; the products created are deleted again.
+        self.assertEqual(report['meta']['rows']['orders'], 62)
+        self.assertEqual(report['meta']['rows']['products'], 8)
+        for name in ('list-orders', 'profile-download', 'bulk-status', 'import-orders', 'delete-product', 'logout'):
+            self.assertIn(name, report['endpoints'])
+        self.assertLessEqual(report['endpoints']['retrieve-product']['p50_ms'],
+                             report['endpoints']['retrieve-product']['p99_ms'])
+
+
+class DatabaseProfileTests(TransactionTestCase):
+
+    def test_connections_use_the_production_profile(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+    def test_writer_lane_serializes_threads_and_nests(self):
+        active = []
+        overlaps = []
+
+        def write(index):
+            try:
+                with writer_lane():
+                    active.append(index)
+                    overlaps.append(len(active) > 1)
+                    with writer_lane():
+                        User.objects.create(email=f'lane-{index}@example.com', role=ROLE_CUSTOMER)
+                    time.sleep(0.01)
+                    active.remove(index)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(write, range(8)))
+
+        self.assertFalse(any(overlaps))
+        self.assertEqual(User.objects.filter(email__startswith='lane-').count(), 8)
+
+    def test_each_database_lane_is_released_on_its_own(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        primary, audit = (os.path.join(directory.name, f'{name}-writer.lock') for name in ('primary', 'audit'))
+        lane = _WriterLane()
+
+        def is_held(path):
+            with open(path, 'a') as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return True
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                return False
+
+        with lane.hold(primary):
+            with lane.hold(audit):
+                self.assertTrue(is_held(audit))
+            # The audit write is done, so other processes may write there.
+            self.assertFalse(is_held(audit))
+            self.assertTrue(is_held(primary))
+        self.assertFalse(is_held(primary))
+
+
+@override_settings(DATABASE_REPLICA_ALIASES=['default'])
+class ReplicaRoutingTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(email='admin@example.com', role=ROLE_ADMIN, first_name='Test', last_name='Admin')
+        cls.sales = User.objects.create(email='sales@example.com', role=ROLE_SALES_USER, first_name='Test', last_name='Sales')
+        cls.product = create_product(cls.admin, 1, 20)
+
+    def setUp(self):
+        cache.clear()
+
+    def _reads_replica(self, user, url):
+        self.client.force_authenticate(user)
+        # Writes bump namespaces on commit, which never comes inside the test transaction.
+        increment_namespace(CACHE_NAMESPACE_PRODUCTS)
+        # 'default' stands in for the replica; count how often one is picked.
+        with mock.patch('common.replicas.random.choice', side_effect=lambda aliases: aliases[0]) as choice:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return choice.called
+
+    def test_reads_stay_on_primary_after_a_write(self):
+        products_url = reverse('list-create-products')
+        self.assertTrue(self._reads_replica(self.sales, products_url))
+        self.assertTrue(self._reads_replica(self.admin, reverse('orders:list-create-orders')))
+        self.assertFalse(self._reads_replica(self.admin, reverse('list-categories')))
+
+        self.client.force_authenticate(self.admin)
+        url = reverse('retrieve-update-destroy-product', args=[self.product.id])
+        self.assertEqual(self.client.patch(url, {'name': 'Renamed'}, format='json').status_code, 200)
+
+        self.assertTrue(is_pinned(self.admin.pk))
+        self.assertFalse(self._reads_replica(self.admin, products_url))
+        self.assertTrue(self._reads_replica(self.sales, products_url))
+
+        cache.delete(f'{REPLICA_PIN_KEY_PREFIX}:{self.admin.pk}')
+        self.assertTrue(self._reads_replica(self.admin, products_url))
+
+    @override_settings(DATABASE_REPLICA_ALIASES=['default', 'default'])
+    def test_one_replica_serves_every_query_of_a_request(self):
+        self.client.force_authenticate(self.sales)
+        with mock.patch('common.replicas.random.choice', side_effect=lambda aliases: aliases[0]) as choice, \
+                CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(reverse('common:dashboard-insights')).status_code, 200)
+        self.assertGreater(len(queries), 1)
+        self.assertEqual(choice.call_count, 1)
+
+    def test_router_uses_primary_outside_requests(self):
+        self.assertIsNone(ReplicaRouter().db_for_read(Product))
+        self.assertEqual(ReplicaRouter().db_for_write(Product), 'default')
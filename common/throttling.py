@@ -0,0 +1,259 @@
+"""
+Token bucket throttling with priorities.
+
+Every request takes a token from its caller's bucket for the endpoint, keyed
+by user, or by client address before login, and by URL name. A view's
+``throttle_rate`` sets the bucket's refill rate and burst; expensive
+endpoints use ``THROTTLE_EXPENSIVE_RATE``. A client polling one endpoint too
+fast is refused there and nowhere else.
+
+With ``THROTTLE_ADMISSION_RATE`` set, every request also takes a token from
+one admission bucket shared by all callers, which refills at the rate the
+server can sustain. Each priority must leave its reserve of that bucket
+untouched, so as load rises dashboard and report reads (``low``) are shed
+first, then everything else (``normal``), and writes that go through
+``OrderService`` (``critical``) only when the bucket is empty. Views set
+``throttle_priority``, and ``throttle_write_priority`` for unsafe methods.
+
+Each worker process decides from its own copy of the buckets, so a request
+costs a few dictionary lookups and takes no lock shared with other workers.
+Every ``THROTTLE_SYNC_SECONDS`` a worker charges a small SQLite file next to
+the database with the tokens it took and adopts the levels found there,
+which include every other worker's; a worker that finds another one syncing
+skips its turn rather than waiting. Between syncs the workers together can
+overspend a bucket by what the others took in one interval. The file holds
+nothing worth keeping, so it skips fsync, and if it cannot be opened or used
+requests are let through rather than refused.
+Refused requests get ``429`` with ``Retry-After``, and every decision is
+counted in ``throttle_decisions_total``.
+"""
+import fcntl
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+from common.constants import (
+    METRICS_UNMATCHED_ENDPOINT,
+    THROTTLE_ADMISSION_KEY,
+    THROTTLE_DEFAULT_RATE,
+    THROTTLE_IDLE_SECONDS,
+    THROTTLE_PRIORITY_NORMAL,
+    THROTTLE_PRIORITY_RESERVES,
+    THROTTLE_SYNC_BATCH_SIZE,
+)
+from common.metrics import registry
+
+
+class Bucket(NamedTuple):
+    key: str
+    rate: float
+    burst: float
+    # Tokens that must remain after taking one.
+    reserve: float = 0.0
+
+
+class TokenBucketStore:
+    """
+    Token buckets decided in process and reconciled with the shared file
+    every ``THROTTLE_SYNC_SECONDS``.
+    """
+
+    def __init__(self):
+        self._reset()
+        # A forked child must not share its parent's SQLite connection.
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._connection = None
+        self._lock_file = None
+        self._path = None
+        # key -> [bucket, tokens, updated_at]; ``_spent`` counts the tokens
+        # taken since the last sync, which the shared file has not seen.
+        self._buckets = {}
+        self._spent = Counter()
+        self._synced_at = float('-inf')
+
+    def _connect(self, path):
+        if self._connection is None or self._path != path:
+            if self._connection is not None:
+                self._connection.close()
+                self._lock_file.close()
+                self._connection = self._lock_file = None
+            lock_file = open(os.devnull if path == ':memory:' else f'{path}.lock', 'a')
+            try:
+                connection = sqlite3.connect(path, timeout=1.0, isolation_level=None, check_same_thread=False)
+                try:
+                    connection.execute('PRAGMA journal_mode=WAL')
+                    connection.execute('PRAGMA synchronous=OFF')
+                    connection.execute(
+                        'CREATE TABLE IF NOT EXISTS throttle_bucket '
+                        '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL) WITHOUT ROWID'
+                    )
+                except sqlite3.Error:
+                    connection.close()
+                    raise
+            except sqlite3.Error:
+                lock_file.close()
+                raise
+            self._connection, self._lock_file, self._path = connection, lock_file, path
+        return self._connection
+
+    def acquire(self, path, buckets):
+        """
+        Take a token from each of ``buckets``, or from none of them. Returns
+        ``(None, 0)`` on success, else the index of the first bucket that is
+        short and the seconds until it can give a token. Raises if a due
+        sync with the shared file fails.
+        """
+        with self._lock:
+            now = time.time()
+            for bucket in buckets:
+                if bucket.key not in self._buckets:
+                    self._buckets[bucket.key] = [bucket, bucket.burst, now]
+            if now - self._synced_at >= settings.THROTTLE_SYNC_SECONDS:
+                self._sync(path, now)
+
+            levels = []
+            for index, bucket in enumerate(buckets):
+                state = self._buckets[bucket.key]
+                state[0] = bucket
+                level = min(bucket.burst, state[1] + max(now - state[2], 0.0) * bucket.rate)
+                if level - 1 < bucket.reserve:
+                    return index, (bucket.reserve + 1 - level) / bucket.rate
+                levels.append((state, level - 1))
+
+            for state, level in levels:
+                state[1], state[2] = level, now
+                self._spent[state[0].key] += 1
+            return None, 0.0
+
+    def _sync(self, path, now):
+        """
+        Charge the shared buckets with the tokens taken here since the last
+        sync, and adopt their levels, which include every other process's.
+        Skipped while another process is syncing; the next request retries.
+        """
+        # A failing store is retried once per interval, not on every request.
+        self._synced_at = now
+        connection = self._connect(path)
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            with connection:
+                self._exchange(connection, now)
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _exchange(self, connection, now):
+        # Forget buckets that have been idle long enough to be full again.
+        for key, (bucket, tokens, updated_at) in list(self._buckets.items()):
+            if now - updated_at > THROTTLE_IDLE_SECONDS and not self._spent[key]:
+                del self._buckets[key]
+
+        keys = list(self._buckets)
+        stored = {}
+        for start in range(0, len(keys), THROTTLE_SYNC_BATCH_SIZE):
+            chunk = keys[start:start + THROTTLE_SYNC_BATCH_SIZE]
+            stored.update(
+                (key, (tokens, updated_at)) for key, tokens, updated_at in connection.execute(
+                    f'SELECT key, tokens, updated_at FROM throttle_bucket '
+                    f'WHERE key IN ({", ".join(["?"] * len(chunk))})',
+                    chunk,
+                )
+            )
+
+        levels = []
+        for key, state in self._buckets.items():
+            bucket = state[0]
+            if key in stored:
+                tokens, updated_at = stored[key]
+                level = min(bucket.burst, tokens - self._spent[key] + max(now - updated_at, 0.0) * bucket.rate)
+            else:
+                # Only this process has used the bucket so far.
+                level = min(bucket.burst, state[1] + max(now - state[2], 0.0) * bucket.rate)
+            state[1], state[2] = level, now
+            levels.append((key, level, now))
+
+        connection.executemany(
+            'INSERT INTO throttle_bucket (key, tokens, updated_at) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at',
+            levels,
+        )
+        connection.execute('DELETE FROM throttle_bucket WHERE updated_at < ?', [now - THROTTLE_IDLE_SECONDS])
+        self._spent.clear()
+
+    def clear(self, path) -> None:
+        with self._lock:
+            self._connect(path).execute('DELETE FROM throttle_bucket')
+            self._buckets.clear()
+            self._spent.clear()
+            self._synced_at = float('-inf')
+
+
+throttle_store = TokenBucketStore()
+
+
+def throttle_store_path():
+    """``THROTTLE_STORE``, or a file next to the default database."""
+    if settings.THROTTLE_STORE:
+        return settings.THROTTLE_STORE
+    connection = connections[DEFAULT_DB_ALIAS]
+    if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+        return ':memory:'
+    return f"{connection.settings_dict['NAME']}-throttle"
+
+
+def request_priority(request, view) -> str:
+    priority = None
+    if request.method not in SAFE_METHODS:
+        priority = getattr(view, 'throttle_write_priority', None)
+    return priority or getattr(view, 'throttle_priority', THROTTLE_PRIORITY_NORMAL)
+
+
+class PriorityTokenBucketThrottle(BaseThrottle):
+
+    def __init__(self):
+        self._wait = None
+
+    def allow_request(self, request, view):
+        if not settings.THROTTLE_ENABLED:
+            return True
+
+        match = request.resolver_match
+        endpoint = match.view_name if match else METRICS_UNMATCHED_ENDPOINT
+        priority = request_priority(request, view)
+        caller = f'user:{request.user.pk}' if request.user.is_authenticated else f'ip:{self.get_ident(request)}'
+        rate, burst = getattr(view, 'throttle_rate', THROTTLE_DEFAULT_RATE)
+        buckets = [Bucket(f'{caller}:{endpoint}', rate, burst)]
+        if settings.THROTTLE_ADMISSION_RATE:
+            # One second of requests is the most the server takes at once.
+            capacity = settings.THROTTLE_ADMISSION_RATE
+            buckets.append(Bucket(THROTTLE_ADMISSION_KEY, capacity, capacity,
+                                  capacity * THROTTLE_PRIORITY_RESERVES[priority]))
+
+        try:
+            short, self._wait = throttle_store.acquire(throttle_store_path(), buckets)
+        except (sqlite3.Error, OSError):
+            short, decision = None, 'store_error'
+        else:
+            decision = 'admitted' if short is None else ('user_limit', 'overload')[short]
+
+        if settings.METRICS_ENABLED:
+            registry.increment('throttle_decisions_total',
+                               (('endpoint', endpoint), ('priority', priority), ('decision', decision)))
+        return short is None
+
+    def wait(self):
+        return self._wait
@@ -1,9 +1,19 @@
 from django.urls import path
-from common.views import DashboardInsightsApiView
+from common.views import (
+    DashboardInsightsApiView,
+    MetricsApiView,
+    ProfileDownloadApiView,
+    ProfileListApiView,
+    ResponseCacheStatsApiView,
+)
 
 app_name = 'common'
 
 urlpatterns = [
     path('dashboard/', DashboardInsightsApiView.as_view(), name='dashboard-insights'),
+    path('cache/stats/', ResponseCacheStatsApiView.as_view(), name='response-cache-stats'),
+    path('metrics/', MetricsApiView.as_view(), name='metrics'),
+    path('profiles/', ProfileListApiView.as_view(), name='profiles'),
+    path('profiles/<str:name>/', ProfileDownloadApiView.as_view(), name='profile-download'),
 ]
 
@@ -1,32 +1,100 @@
+from django.http import FileResponse, Http404, HttpResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.utils import timezone
 
-from users.models import User
-from orders.models import Order
-from products.models import Product
+from common.cache import CachedResponseMixin, cache_stats
+from common.metrics import registry
+from common.permissions import HasMetricsToken
+from common.profiling import list_profiles, profile_path, summarize
+from common.replicas import ReplicaReadMixin
+from common.serializers import ProfileSerializer
+from common.constants import (
+    CACHE_NAMESPACE_CUSTOMERS,
+    CACHE_NAMESPACE_ORDERS,
+    CACHE_NAMESPACE_PRODUCTS,
+    DASHBOARD_LOW_STOCK_LIMIT,
+    THROTTLE_PRIORITY_LOW,
+)
+from common.services import DashboardCounterService
+from orders.models import DailySalesRollup
+from products.constants import LOW_STOCK
+from products.models import StockAlert
 from users.permissions import IsSales, IsAdmin
 
 
-class DashboardInsightsApiView(APIView):
+class DashboardInsightsApiView(ReplicaReadMixin, CachedResponseMixin, APIView):
 
     permission_classes = [IsAdmin | IsSales]
+    throttle_priority = THROTTLE_PRIORITY_LOW
+    cache_name = 'dashboard-insights'
+    cache_namespaces = (CACHE_NAMESPACE_PRODUCTS, CACHE_NAMESPACE_ORDERS, CACHE_NAMESPACE_CUSTOMERS)
 
-    def get(self, request):
+    def get_cache_key_parts(self):
+        # Today's sales reset at midnight without any write.
+        return (*super().get_cache_key_parts(), timezone.localdate())
+
+    def build_response(self, request):
 
-        total_customers = User.objects.customers().count()
-        today_sales = Order.objects.today_sales()
-        low_stock_products = (Product.objects.low_stock()
-                              .values('id', 'sku', 'name', 'stock_qty'))
-        out_of_stock_count = Product.objects.out_of_stock().count()
-        today = timezone.now().date().isoformat()
+        today = timezone.localdate()
+        counters = DashboardCounterService.get()
+        today_sales = DailySalesRollup.objects.by_date_range(today, today).total_revenue()
+        # Open alerts already hold the low-stock products; no catalog scan.
+        low_stock_alerts = (StockAlert.objects.open()
+                            .filter(status=LOW_STOCK)
+                            .order_by('stock_qty', 'product_id')
+                            .values_list('product', 'product__sku', 'product__name', 'stock_qty')
+                            [:DASHBOARD_LOW_STOCK_LIMIT])
+        low_stock_products = [
+            {'id': product_id, 'sku': sku, 'name': name, 'stock_qty': stock_qty}
+            for product_id, sku, name, stock_qty in low_stock_alerts
+        ]
 
         return Response({
-            'total_customers': total_customers,
+            'total_customers': counters.total_customers,
             'total_sales_today': float(today_sales),
-            'low_stock_products': list(low_stock_products),
-            'low_stock_count': low_stock_products.count(),
-            'out_of_stock_count': out_of_stock_count,
-            'date': today
+            'low_stock_products': low_stock_products,
+            'low_stock_count': counters.low_stock_count,
+            'out_of_stock_count': counters.out_of_stock_count,
+            'date': today.isoformat()
         })
 
+
+class ResponseCacheStatsApiView(APIView):
+
+    permission_classes = [IsAdmin]
+
+    def get(self, request):
+        return Response(cache_stats())
+
+
+class MetricsApiView(APIView):
+    """Request and service metrics of the serving process, in the Prometheus text format."""
+
+    permission_classes = [IsAdmin | HasMetricsToken]
+
+    def get(self, request):
+        return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class ProfileListApiView(APIView):
+    """Request profiles recorded with ``X-Profile: 1`` or ``?profile=1``, newest first."""
+
+    permission_classes = [IsAdmin]
+
+    def get(self, request):
+        return Response({'results': ProfileSerializer(list_profiles(), many=True).data})
+
+
+class ProfileDownloadApiView(APIView):
+    """The pstats file of one profile, or its top functions as text with ``?summary=1``."""
+
+    permission_classes = [IsAdmin]
+
+    def get(self, request, name):
+        path = profile_path(name)
+        if path is None:
+            raise Http404
+        if request.query_params.get('summary'):
+            return HttpResponse(summarize(path), content_type='text/plain; charset=utf-8')
+        return FileResponse(path.open('rb'), as_attachment=True, filename=name)
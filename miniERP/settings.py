@@ -1,12 +1,14 @@
 from datetime import timedelta
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 SECRET_KEY = config("SECRET_KEY")
 DEFAULT_PAGINATION_PAGE_SIZE = config("DEFAULT_PAGINATION_PAGE_SIZE", default=10, cast=int)
+ORDER_NUMBER_BLOCK_SIZE = config("ORDER_NUMBER_BLOCK_SIZE", default=10, cast=int)
+PRODUCT_AUTOCOMPLETE_MAX_PRODUCTS = config("PRODUCT_AUTOCOMPLETE_MAX_PRODUCTS", default=250000, cast=int)
 DEBUG = config("DEBUG", default=False, cast=bool)
 
 ALLOWED_HOSTS = config("ALLOWED_HOSTS", default="*", cast=lambda v: [s.strip() for s in v.split(",")])
@@ -35,6 +37,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'common.metrics.RequestMetricsMiddleware',
+    'common.profiling.RequestProfilerMiddleware',
+    'common.replicas.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -69,13 +74,76 @@ WSGI_APPLICATION = 'miniERP.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# The production profile runs SQLite in WAL mode, so readers never wait for
+# the writer, and starts every transaction with BEGIN IMMEDIATE, so writers
+# queue on the busy timeout up front instead of failing with "database is
+# locked" when a read lock cannot be upgraded. Disable it to get Django's
+# stock SQLite behaviour, e.g. to benchmark against it.
+SQLITE_PRODUCTION_PROFILE = config("SQLITE_PRODUCTION_PROFILE", default=True, cast=bool)
+SQLITE_BUSY_TIMEOUT_MS = config("SQLITE_BUSY_TIMEOUT_MS", default=20000, cast=int)
+SQLITE_CACHE_SIZE_KB = config("SQLITE_CACHE_SIZE_KB", default=65536, cast=int)
+SQLITE_MMAP_SIZE = config("SQLITE_MMAP_SIZE", default=268435456, cast=int)
+
+SQLITE_OPTIONS = {
+    'transaction_mode': 'IMMEDIATE',
+    'init_command': ';'.join([
+        'PRAGMA journal_mode=WAL',
+        f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}',
+        'PRAGMA synchronous=NORMAL',
+        f'PRAGMA mmap_size={SQLITE_MMAP_SIZE}',
+        f'PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}',
+    ]),
+} if SQLITE_PRODUCTION_PROFILE else {}
+
+# Serialize OrderService/ProductService writes within a process, see common.db.
+DATABASE_WRITER_LANE = config("DATABASE_WRITER_LANE", default=True, cast=bool)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': SQLITE_OPTIONS,
+        'CONN_MAX_AGE': config("DB_CONN_MAX_AGE", default=600, cast=int),
+        'CONN_HEALTH_CHECKS': True,
+        # A file-backed test database, unlike the default shared in-memory
+        # one, waits on locks instead of failing, which the concurrency
+        # tests rely on.
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
+# Read replicas: SQLite files kept in sync with the primary, e.g. by
+# `python manage.py replicate_sqlite`. See common.replicas.
+DATABASE_REPLICA_ALIASES = []
+for index, name in enumerate(config("DATABASE_REPLICAS", default="", cast=Csv()), start=1):
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': name,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICA_ALIASES.append(alias)
+
+# Audit database: a separate SQLite file for the stock change log, fed
+# through an outbox on the primary. See products.audit.
+AUDIT_DATABASE = config("AUDIT_DATABASE", default="")
+if AUDIT_DATABASE:
+    DATABASES['audit'] = {
+        **DATABASES['default'],
+        'NAME': AUDIT_DATABASE,
+        'TEST': {'NAME': BASE_DIR / 'test_audit.sqlite3'},
+    }
+STOCK_LOG_DATABASE = 'audit' if AUDIT_DATABASE else 'default'
+# Relay outbox entries from a background thread in every process. Disable it
+# to leave relaying to `python manage.py relay_stock_change_logs`.
+STOCK_LOG_RELAY = config("STOCK_LOG_RELAY", default=True, cast=bool)
+
+DATABASE_ROUTERS = ['products.audit.StockLogRouter', 'common.replicas.ReplicaRouter']
+
+# How long a user's reads stay on the primary after they write.
+READ_YOUR_WRITES_SECONDS = config("READ_YOUR_WRITES_SECONDS", default=5, cast=int)
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -121,13 +189,56 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'users.User'
 
+# Workers must share the cache: namespace bumps invalidate cached responses,
+# and fill locks coalesce misses, only among processes that see the same
+# entries. The default file cache is shared by the workers on this host; use
+# e.g. Redis across hosts. A per-process LocMemCache serves stale responses
+# from other workers for up to RESPONSE_CACHE_TIMEOUT.
+CACHES = {
+    'default': {
+        'BACKEND': config("CACHE_BACKEND", default="common.cache_backends.SharedFileCache"),
+        'LOCATION': config("CACHE_LOCATION", default="") or str(BASE_DIR / 'cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': config("CACHE_MAX_ENTRIES", default=10000, cast=int),
+        },
+    }
+}
+
+# Cached GET responses live this long at most; writes invalidate them sooner.
+RESPONSE_CACHE_TIMEOUT = config("RESPONSE_CACHE_TIMEOUT", default=60, cast=int)
+# How long concurrent misses wait for the request that is filling the cache.
+RESPONSE_CACHE_LOCK_TIMEOUT = config("RESPONSE_CACHE_LOCK_TIMEOUT", default=10, cast=int)
+
+METRICS_ENABLED = config("METRICS_ENABLED", default=True, cast=bool)
+# Share of requests and service calls that are measured, from 0 to 1.
+METRICS_SAMPLE_RATE = config("METRICS_SAMPLE_RATE", default=1.0, cast=float)
+# Lets a scraper read /api/v1/metrics/ with an X-Metrics-Token header; empty means admins only.
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+
+# Where request profiles are written, and how many of the newest are kept.
+PROFILE_DIR = config("PROFILE_DIR", default=str(BASE_DIR / 'profiles'))
+PROFILE_KEEP = config("PROFILE_KEEP", default=50, cast=int)
+
+# Per-user, per-endpoint token buckets plus priority admission, see common.throttling.
+# Off until it has been benchmarked under the deployment's own load.
+THROTTLE_ENABLED = config("THROTTLE_ENABLED", default=False, cast=bool)
+# SQLite file shared by the workers; empty means next to the default database.
+THROTTLE_STORE = config("THROTTLE_STORE", default="")
+# Seconds between a worker's syncs with THROTTLE_STORE.
+THROTTLE_SYNC_SECONDS = config("THROTTLE_SYNC_SECONDS", default=0.25, cast=float)
+# Requests per second all workers together admit before shedding by priority; 0 turns it off.
+THROTTLE_ADMISSION_RATE = config("THROTTLE_ADMISSION_RATE", default=0, cast=float)
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.StatelessJWTAuthentication',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'PAGE_SIZE': DEFAULT_PAGINATION_PAGE_SIZE,
     'DEFAULT_PAGINATION_CLASS': 'miniERP.pagination.CustomCursorPagination',
+    'DEFAULT_THROTTLE_CLASSES': (
+        'common.throttling.PriorityTokenBucketThrottle',
+    ) if THROTTLE_ENABLED else (),
 }
 
 SPECTACULAR_SETTINGS = {
@@ -143,8 +254,21 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': 'Bearer',
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=config("JWT_ACCESS_EXPIRES_IN_MINUTES", default=5, cast=int)),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=config("JWT_REFRESH_EXPIRES_IN_DAYS", default=1, cast=int)),
+    # Tokens carry the user's role and name, see users.tokens.
+    "TOKEN_OBTAIN_SERIALIZER": 'users.tokens.UserClaimsTokenObtainPairSerializer',
+    "TOKEN_REFRESH_SERIALIZER": 'users.tokens.UserClaimsTokenRefreshSerializer',
 }
 
+# How long a user's token version is cached; the longest a revoked token
+# keeps working in processes that do not share the cache.
+TOKEN_VERSION_CACHE_SECONDS = config("TOKEN_VERSION_CACHE_SECONDS", default=30, cast=int)
+
+# Check refresh tokens against a per-process Bloom filter of the blacklist
+# before querying it, see users.blacklist. Other processes' logouts reach the
+# filter within TOKEN_BLACKLIST_SYNC_SECONDS, or at once with a shared cache.
+TOKEN_BLACKLIST_FILTER = config("TOKEN_BLACKLIST_FILTER", default=True, cast=bool)
+TOKEN_BLACKLIST_SYNC_SECONDS = config("TOKEN_BLACKLIST_SYNC_SECONDS", default=30, cast=int)
+
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = config(
     "CORS_ALLOWED_ORIGINS",
@@ -8,3 +8,34 @@ ORDER_STATUS_CHOICES = (
     (ORDER_STATUS_CANCELLED, "Cancelled"),
 )
 
+
+ORDER_NUMBER_PREFIX = "ORD"
+
+ORDER_BULK_STATUS_MAX_ORDERS = 1000
+
+ORDER_FILE_FORMAT_CSV = "csv"
+ORDER_FILE_FORMAT_NDJSON = "ndjson"
+
+ORDER_FILE_FORMAT_CHOICES = (
+    (ORDER_FILE_FORMAT_CSV, "CSV"),
+    (ORDER_FILE_FORMAT_NDJSON, "NDJSON"),
+)
+
+ORDER_IMPORT_DEFAULT_CHUNK_SIZE = 500
+ORDER_IMPORT_MAX_CHUNK_SIZE = 5000
+ORDER_IMPORT_MAX_REPORTED_ERRORS = 1000
+
+ORDER_EXPORT_CHUNK_SIZE = 2000
+
+SALES_BUCKET_DAY = "day"
+SALES_BUCKET_WEEK = "week"
+SALES_BUCKET_MONTH = "month"
+
+SALES_BUCKET_CHOICES = (
+    (SALES_BUCKET_DAY, "Day"),
+    (SALES_BUCKET_WEEK, "Week"),
+    (SALES_BUCKET_MONTH, "Month"),
+)
+
+SALES_TIME_SERIES_MAX_BUCKETS = 400
+SALES_ROLLUP_BACKFILL_CHUNK_SIZE = 5000
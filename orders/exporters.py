@@ -0,0 +1,74 @@
+"""
+Row writers for streaming order exports.
+
+Each writer takes an iterator of export rows (tuples in ``EXPORT_COLUMNS``
+order) and yields encoded chunks as they are produced, so an export never
+holds more than one database fetch in memory.
+"""
+import csv
+import json
+
+from orders.constants import ORDER_FILE_FORMAT_CSV, ORDER_FILE_FORMAT_NDJSON
+
+EXPORT_COLUMNS = (
+    'order_id',
+    'order_number',
+    'order_date',
+    'status',
+    'customer_id',
+    'customer_email',
+    'customer_first_name',
+    'customer_last_name',
+    'total_amount',
+    'item_id',
+    'product_id',
+    'product_sku',
+    'product_name',
+    'quantity',
+    'price',
+    'total_price',
+)
+
+EXPORT_FIELDS = (
+    'id',
+    'order_number',
+    'order_date',
+    'status',
+    'customer_id',
+    'customer__email',
+    'customer__first_name',
+    'customer__last_name',
+    'total_amount',
+    'items__id',
+    'items__product_id',
+    'items__product_sku',
+    'items__product_name',
+    'items__quantity',
+    'items__price',
+    'items__total_price',
+)
+
+
+class _EchoBuffer:
+    """File-like object whose ``write`` hands the value straight back to ``csv.writer``."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    writer = csv.writer(_EchoBuffer())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def iter_ndjson(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=str) + "\n"
+
+
+WRITERS = {
+    ORDER_FILE_FORMAT_CSV: (iter_csv, 'text/csv'),
+    ORDER_FILE_FORMAT_NDJSON: (iter_ndjson, 'application/x-ndjson'),
+}
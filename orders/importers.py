@@ -0,0 +1,128 @@
+"""
+Streaming parsers for bulk order import files.
+
+Both parsers read their input lazily and yield one ``ImportedOrder`` at a
+time, so the size of an import file never dictates memory use.
+
+CSV files carry one order line per row; consecutive rows sharing an
+``order_ref`` form one order::
+
+    order_ref,customer_id,customer_code,product_id,sku,quantity,price
+    A-1,,CUST-001,,PROD-001,2,1200.00
+    A-1,,CUST-001,,PROD-002,1,
+
+NDJSON files carry one order per line::
+
+    {"order_ref": "A-1", "customer_code": "CUST-001", "items": [{"sku": "PROD-001", "quantity": 2}]}
+"""
+import csv
+import io
+import json
+from typing import NamedTuple, Optional
+
+from orders.constants import ORDER_FILE_FORMAT_CSV, ORDER_FILE_FORMAT_NDJSON
+
+
+class ImportedOrder(NamedTuple):
+    order_ref: str
+    customer_id: Optional[str]
+    customer_code: Optional[str]
+    items: list
+    rows: list
+    errors: list
+
+
+def _clean(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _item(data):
+    return {
+        'product_id': _clean(data.get('product_id')),
+        'sku': _clean(data.get('sku')),
+        'quantity': _clean(data.get('quantity')),
+        'price': _clean(data.get('price')),
+    }
+
+
+def iter_csv_orders(stream):
+    reader = csv.DictReader(stream)
+    current = None
+
+    # Row 1 is the header line.
+    for row_number, row in enumerate(reader, start=2):
+        order_ref = _clean(row.get('order_ref')) or f"row-{row_number}"
+
+        if current is not None and current.order_ref != order_ref:
+            yield current
+            current = None
+
+        if current is None:
+            current = ImportedOrder(
+                order_ref=order_ref,
+                customer_id=_clean(row.get('customer_id')),
+                customer_code=_clean(row.get('customer_code')),
+                items=[],
+                rows=[],
+                errors=[],
+            )
+
+        current.items.append(_item(row))
+        current.rows.append(row_number)
+
+    if current is not None:
+        yield current
+
+
+def iter_ndjson_orders(stream):
+    for row_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+
+        try:
+            data = json.loads(line)
+            if not isinstance(data, dict):
+                raise ValueError("expected a JSON object")
+            items = data.get('items') or []
+            if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+                raise ValueError("'items' must be a list of objects")
+        except ValueError as exc:
+            yield ImportedOrder(
+                order_ref=f"row-{row_number}",
+                customer_id=None,
+                customer_code=None,
+                items=[],
+                rows=[row_number],
+                errors=[f"Invalid JSON line: {exc}"],
+            )
+            continue
+
+        yield ImportedOrder(
+            order_ref=_clean(data.get('order_ref')) or f"row-{row_number}",
+            customer_id=_clean(data.get('customer_id')),
+            customer_code=_clean(data.get('customer_code')),
+            items=[_item(item) for item in items],
+            rows=[row_number],
+            errors=[],
+        )
+
+
+PARSERS = {
+    ORDER_FILE_FORMAT_CSV: iter_csv_orders,
+    ORDER_FILE_FORMAT_NDJSON: iter_ndjson_orders,
+}
+
+
+def iter_orders(binary_stream, file_format):
+    """Decode ``binary_stream`` as UTF-8 and parse it lazily with the parser for ``file_format``."""
+    stream = io.TextIOWrapper(binary_stream, encoding='utf-8-sig', newline='')
+    return PARSERS[file_format](stream)
+
+
+def guess_format(file_name):
+    if file_name.lower().endswith(('.ndjson', '.jsonl')):
+        return ORDER_FILE_FORMAT_NDJSON
+    return ORDER_FILE_FORMAT_CSV
@@ -0,0 +1,83 @@
+import json
+import os
+import random
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.constants import ORDER_FILE_FORMAT_CSV, ORDER_FILE_FORMAT_NDJSON, ORDER_IMPORT_DEFAULT_CHUNK_SIZE
+from orders.importers import iter_orders
+from orders.services import OrderImportService
+from products.models import Product
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic import file from existing customers and products, "
+        "import it and report rows per second. Creates real orders; run it "
+        "against a benchmark database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=10000)
+        parser.add_argument('--items-per-order', type=int, default=3)
+        parser.add_argument('--chunk-size', type=int, nargs='+', default=[ORDER_IMPORT_DEFAULT_CHUNK_SIZE])
+        parser.add_argument(
+            '--format',
+            dest='file_format',
+            choices=[ORDER_FILE_FORMAT_CSV, ORDER_FILE_FORMAT_NDJSON],
+            default=ORDER_FILE_FORMAT_CSV,
+        )
+        parser.add_argument('--output', help="Write the results as JSON to this path.")
+
+    def handle(self, *args, orders, items_per_order, chunk_size, file_format, output, **options):
+        customer_ids = list(User.objects.customers().values_list('id', flat=True)[:1000])
+        skus = list(Product.objects.values_list('sku', flat=True)[:5000])
+        if not customer_ids or len(skus) < items_per_order:
+            raise CommandError("Seed customers and products before benchmarking the import.")
+
+        results = []
+        for size in chunk_size:
+            path = self._write_file(file_format, orders, items_per_order, customer_ids, skus)
+            try:
+                with open(path, 'rb') as stream:
+                    report = OrderImportService.import_orders(iter_orders(stream, file_format), None, size)
+            finally:
+                os.remove(path)
+
+            results.append({
+                'format': file_format,
+                'chunk_size': size,
+                'orders': orders,
+                'rows': report['rows_processed'],
+                'orders_created': report['orders_created'],
+                'elapsed_seconds': report['elapsed_seconds'],
+                'rows_per_second': report['rows_per_second'],
+            })
+            self.stdout.write(
+                f"chunk_size={size}: {report['rows_processed']} rows in "
+                f"{report['elapsed_seconds']}s ({report['rows_per_second']} rows/s)"
+            )
+
+        if output:
+            with open(output, 'w') as output_file:
+                json.dump(results, output_file, indent=2)
+
+    def _write_file(self, file_format, orders, items_per_order, customer_ids, skus):
+        handle, path = tempfile.mkstemp(suffix=f'.{file_format}')
+        with os.fdopen(handle, 'w') as stream:
+            if file_format == ORDER_FILE_FORMAT_CSV:
+                stream.write("order_ref,customer_id,sku,quantity\n")
+            for number in range(orders):
+                customer_id = random.choice(customer_ids)
+                items = [(sku, random.randint(1, 5)) for sku in random.sample(skus, items_per_order)]
+                if file_format == ORDER_FILE_FORMAT_CSV:
+                    stream.writelines(f"BENCH-{number},{customer_id},{sku},{qty}\n" for sku, qty in items)
+                else:
+                    stream.write(json.dumps({
+                        'order_ref': f"BENCH-{number}",
+                        'customer_id': customer_id,
+                        'items': [{'sku': sku, 'quantity': qty} for sku, qty in items],
+                    }) + "\n")
+        return path
@@ -0,0 +1,59 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.constants import ORDER_FILE_FORMAT_CHOICES, ORDER_IMPORT_DEFAULT_CHUNK_SIZE
+from orders.importers import guess_format, iter_orders
+from orders.services import OrderImportService
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Import pending orders from a CSV or NDJSON file, streaming it in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Path to the CSV or NDJSON file.")
+        parser.add_argument(
+            '--format',
+            dest='file_format',
+            choices=[choice for choice, _ in ORDER_FILE_FORMAT_CHOICES],
+            help="File format (default: guessed from the file extension).",
+        )
+        parser.add_argument('--chunk-size', type=int, default=ORDER_IMPORT_DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--created-by', help="Email of the user recorded as creator of the orders.")
+        parser.add_argument('--report', help="Write the full JSON report to this path.")
+
+    def handle(self, *args, path, file_format, chunk_size, created_by, report, **options):
+        if chunk_size < 1:
+            raise CommandError("--chunk-size must be at least 1.")
+
+        user = None
+        if created_by:
+            user = User.objects.filter(email=created_by).first()
+            if user is None:
+                raise CommandError(f"User {created_by} not found.")
+
+        try:
+            stream = open(path, 'rb')
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        with stream:
+            result = OrderImportService.import_orders(
+                records=iter_orders(stream, file_format or guess_format(path)),
+                created_by=user,
+                chunk_size=chunk_size,
+            )
+
+        if report:
+            with open(report, 'w') as report_file:
+                json.dump(result, report_file, indent=2)
+
+        for error in result['errors']:
+            self.stderr.write(f"{error['order_ref']} (rows {error['rows']}): {'; '.join(error['errors'])}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['orders_created']} orders from {result['rows_processed']} rows, "
+            f"{result['orders_failed']} failed, in {result['elapsed_seconds']}s "
+            f"({result['rows_per_second']} rows/s)."
+        ))
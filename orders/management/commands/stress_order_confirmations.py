@@ -0,0 +1,255 @@
+import json
+import multiprocessing
+import random
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.db.models import F, Sum
+from rest_framework.exceptions import ValidationError
+
+from common.metrics import percentile
+from orders.constants import ORDER_STATUS_CONFIRMED
+from orders.models import Order, OrderItem
+from orders.services import OrderService
+from products.audit import relay_outbox, uses_outbox
+from products.models import Product, StockChangeLog
+from products.services import ProductService
+from users.models import User
+
+
+class _LockWaitTimer:
+    """
+    Time how long a confirmation waits for the stock lock: from the end of
+    its previous statement to the end of the one that takes the lock. That is
+    the ``SELECT ... FOR UPDATE`` where row locks exist, otherwise the first
+    write or ``BEGIN IMMEDIATE``, which is where SQLite takes its write lock;
+    the gap before it covers any wait in the writer lane.
+    """
+
+    def __init__(self):
+        self.waiting = True
+        self.elapsed = 0.0
+        self._last = time.perf_counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        statement = sql.lstrip().upper()
+        takes_lock = self.waiting and (
+            'FOR UPDATE' in statement
+            or not statement.startswith(('SELECT', 'SAVEPOINT', 'RELEASE', 'ROLLBACK'))
+        )
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            now = time.perf_counter()
+            if takes_lock:
+                self.waiting = False
+                self.elapsed = now - self._last
+            self._last = now
+
+
+def _confirm_orders(order_ids, user_id, max_retries):
+    """Confirm ``order_ids`` one by one in a worker process."""
+    user = User.objects.get(pk=user_id)
+    result = {'confirmed': [], 'rejected': 0, 'failed': 0, 'retries': 0, 'latencies': [], 'lock_waits': []}
+    try:
+        for order_id in order_ids:
+            # Lock wait covers the lock-taking statement of the successful
+            # attempt plus every attempt lost to "database is locked".
+            started = time.perf_counter()
+            lost = 0.0
+            for attempt in range(max_retries + 1):
+                timer = _LockWaitTimer()
+                attempt_started = time.perf_counter()
+                try:
+                    with connection.execute_wrapper(timer):
+                        OrderService.change_order_status(Order.objects.get(pk=order_id), ORDER_STATUS_CONFIRMED, user)
+                except ValidationError:
+                    result['rejected'] += 1
+                except OperationalError:
+                    if attempt < max_retries:
+                        result['retries'] += 1
+                        time.sleep(random.uniform(0, 0.005))
+                        lost += time.perf_counter() - attempt_started
+                        continue
+                    result['failed'] += 1
+                else:
+                    result['confirmed'].append(order_id)
+                    result['latencies'].append(time.perf_counter() - started)
+                    result['lock_waits'].append(lost + timer.elapsed)
+                break
+    finally:
+        connection.close()
+    return result
+
+
+def _read_stock(product_ids, stop):
+    """Read the hot products' stock until ``stop`` is set, timing each read."""
+    result = {'latencies': [], 'failed': 0}
+    try:
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                list(Product.objects.filter(pk__in=product_ids).values_list('pk', 'stock_qty'))
+            except OperationalError:
+                result['failed'] += 1
+            else:
+                result['latencies'].append(time.perf_counter() - started)
+    finally:
+        connection.close()
+    return result
+
+
+def _summary_ms(values):
+    values = sorted(value * 1000 for value in values)
+    if not values:
+        return None
+    return {
+        'p50': round(percentile(values, 0.50), 3),
+        'p95': round(percentile(values, 0.95), 3),
+        'p99': round(percentile(values, 0.99), 3),
+        'max': round(values[-1], 3),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Create a few hot products and many pending orders competing for them, "
+        "confirm the orders from several processes at once, and report "
+        "confirmations per second, the lock-wait distribution and, with "
+        "--readers, how long concurrent stock reads take. Fails unless "
+        "no product went negative, every product's stock equals the sum of its "
+        "stock log deltas, and the stock taken equals the quantity confirmed. "
+        "Creates real data; run it against a benchmark database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--readers', type=int, default=0,
+                            help="Processes reading the hot products' stock while the workers confirm.")
+        parser.add_argument('--orders', type=int, default=2000)
+        parser.add_argument('--products', type=int, default=5, help="Number of hot SKUs the orders share.")
+        parser.add_argument('--stock', type=int, default=200, help="Starting stock of each hot SKU.")
+        parser.add_argument('--items-per-order', type=int, default=2)
+        parser.add_argument('--max-retries', type=int, default=50,
+                            help="Retries of a confirmation that could not take the lock.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help="Write the results as JSON to this path.")
+
+    def handle(self, *args, workers, readers, orders, products, stock, items_per_order, max_retries, seed, output,
+               **options):
+        user = User.objects.admins().order_by('id').first()
+        customer_ids = list(User.objects.customers().values_list('id', flat=True)[:1000])
+        if user is None or not customer_ids:
+            raise CommandError("Create an admin user and seed customers before running the stress test.")
+        if min(workers, orders, products, items_per_order) < 1 or items_per_order > products:
+            raise CommandError("Counts must be positive, with no more items per order than products.")
+
+        rng = random.Random(seed)
+        hot_products = self._create_products(products, stock, user)
+        order_ids = self._create_orders(orders, items_per_order, hot_products, customer_ids, user, rng)
+
+        # Forked workers must open their own connections.
+        connections.close_all()
+        chunks = [(order_ids[index::workers], user.pk, max_retries) for index in range(workers)]
+        started = time.perf_counter()
+        context = multiprocessing.get_context('fork')
+        with context.Manager() as manager, context.Pool(workers + readers) as pool:
+            stop = manager.Event()
+            product_ids = [product.pk for product in hot_products]
+            reads = [pool.apply_async(_read_stock, (product_ids, stop)) for _ in range(readers)]
+            results = pool.starmap(_confirm_orders, chunks)
+            elapsed = time.perf_counter() - started
+            stop.set()
+            reads = [read.get() for read in reads]
+
+        confirmed = [order_id for result in results for order_id in result['confirmed']]
+        report = {
+            'workers': workers,
+            'orders': orders,
+            'products': products,
+            'stock_per_product': stock,
+            'confirmed': len(confirmed),
+            'rejected': sum(result['rejected'] for result in results),
+            'failed': sum(result['failed'] for result in results),
+            'retries': sum(result['retries'] for result in results),
+            'elapsed_seconds': round(elapsed, 3),
+            'confirmations_per_second': round(len(confirmed) / elapsed, 1),
+            'latency_ms': _summary_ms([value for result in results for value in result['latencies']]),
+            'lock_wait_ms': _summary_ms([value for result in results for value in result['lock_waits']]),
+            'reads': sum(len(read['latencies']) for read in reads),
+            'failed_reads': sum(read['failed'] for read in reads),
+            'read_latency_ms': _summary_ms([value for read in reads for value in read['latencies']]),
+            'violations': self._check(hot_products, stock, order_ids, confirmed),
+        }
+
+        self.stdout.write(json.dumps(report, indent=2))
+        if output:
+            with open(output, 'w') as output_file:
+                json.dump(report, output_file, indent=2)
+        if report['violations']:
+            raise CommandError(f"{len(report['violations'])} stock invariant violations.")
+
+    def _create_products(self, count, stock, user):
+        run = uuid.uuid4().hex[:6].upper()
+        return [
+            ProductService.create_new_product(
+                sku=f'STRESS-{run}-{number}',
+                name=f'Stress Product {run} {number}',
+                category='Stress Test',
+                cost_price=Decimal('5.00'),
+                selling_price=Decimal('10.00'),
+                stock_qty=stock,
+                image=None,
+                created_by=user,
+                modified_by=user,
+            )
+            for number in range(count)
+        ]
+
+    def _create_orders(self, count, items_per_order, hot_products, customer_ids, user, rng):
+        products_dict = {product.pk: product for product in hot_products}
+        order_ids = []
+        for _ in range(count):
+            items = [
+                {'product_id': product.pk, 'quantity': rng.randint(1, 3)}
+                for product in rng.sample(hot_products, rng.randint(1, items_per_order))
+            ]
+            order = OrderService.create_order(rng.choice(customer_ids), items, user, user, products_dict)
+            order_ids.append(order.pk)
+        return order_ids
+
+    def _check(self, hot_products, stock, order_ids, confirmed):
+        product_ids = [product.pk for product in hot_products]
+        if uses_outbox():
+            # Workers relay in threads that may not have finished.
+            while relay_outbox():
+                pass
+        current = dict(Product.objects.filter(pk__in=product_ids).values_list('pk', 'stock_qty'))
+        logged = dict(StockChangeLog.objects
+                      .filter(product_id__in=product_ids)
+                      .values('product_id')
+                      .annotate(total=Sum(F('new_qty') - F('previous_qty')))
+                      .values_list('product_id', 'total'))
+        taken = dict(OrderItem.objects
+                     .filter(order__in=order_ids, order__status=ORDER_STATUS_CONFIRMED)
+                     .values('product')
+                     .annotate(total=Sum('quantity'))
+                     .values_list('product', 'total'))
+
+        violations = []
+        for product_id in product_ids:
+            qty = current[product_id]
+            if qty < 0:
+                violations.append(f"Product {product_id} has negative stock {qty}.")
+            if qty != logged.get(product_id, 0):
+                violations.append(f"Product {product_id} has stock {qty} but its logs add up to {logged.get(product_id)}.")
+            if stock - qty != taken.get(product_id, 0):
+                violations.append(f"Product {product_id} lost {stock - qty} units for {taken.get(product_id, 0)} confirmed.")
+
+        confirmed_in_db = Order.objects.filter(pk__in=order_ids, status=ORDER_STATUS_CONFIRMED).count()
+        if confirmed_in_db != len(confirmed):
+            violations.append(f"{confirmed_in_db} orders are confirmed but workers confirmed {len(confirmed)}.")
+        return violations
@@ -0,0 +1,52 @@
+# Generated by Django 5.1.2 on 2026-10-18 05:21
+
+import datetime
+
+from django.db import migrations, models
+
+
+def seed_sequences_from_orders(apps, schema_editor):
+    # Continue numbering after any order numbers issued by the old MAX-scan
+    # generator ("ORD-YYYYMMDD-NNNN") so the first allocation of a day never
+    # collides with an existing order.
+    Order = apps.get_model('orders', 'Order')
+    OrderNumberSequence = apps.get_model('orders', 'OrderNumberSequence')
+
+    last_values = {}
+    for order_number in Order.objects.values_list('order_number', flat=True).iterator():
+        try:
+            _, day, sequence = order_number.split('-')
+            day = datetime.datetime.strptime(day, '%Y%m%d').date()
+            sequence = int(sequence)
+        except ValueError:
+            continue
+        last_values[day] = max(last_values.get(day, 0), sequence)
+
+    OrderNumberSequence.objects.bulk_create(
+        OrderNumberSequence(day=day, last_value=last_value)
+        for day, last_value in last_values.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_remove_order_notes_alter_order_customer_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderNumberSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('last_value', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Order Number Sequence',
+                'verbose_name_plural': 'Order Number Sequences',
+                'db_table': 'orders_order_number_sequence',
+            },
+        ),
+        migrations.RunPython(seed_sequences_from_orders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.1.2 on 2026-10-18 05:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def snapshot_item_categories(apps, schema_editor):
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    Product = apps.get_model('products', 'Product')
+
+    OrderItem.objects.update(product_category=Coalesce(
+        Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('category')[:1]),
+        Value(''),
+    ))
+
+
+def backfill_sales_rollup(apps, schema_editor):
+    """Sum the lines of orders confirmed before the rollup existed into it."""
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    DailySalesRollup = apps.get_model('orders', 'DailySalesRollup')
+
+    totals = (OrderItem.objects
+              .filter(order__status='CONFIRMED')
+              .values('order__order_date', 'product_sku', 'product_category', 'order__customer_id')
+              .annotate(product_id=Max('product_id'), quantity=Sum('quantity'),
+                        revenue=Sum('total_price'), order_lines=Count('id'))
+              .order_by())
+    batch = []
+    for total in totals.iterator(chunk_size=5000):
+        batch.append(DailySalesRollup(
+            date=total['order__order_date'],
+            product_sku=total['product_sku'],
+            product_id=total['product_id'],
+            category=total['product_category'],
+            customer_id=total['order__customer_id'],
+            quantity=total['quantity'],
+            revenue=total['revenue'],
+            order_lines=total['order_lines'],
+        ))
+        if len(batch) == 5000:
+            DailySalesRollup.objects.bulk_create(batch)
+            batch = []
+    DailySalesRollup.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_order_number_sequence'),
+        ('products', '0002_product_image'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='product_category',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.RunPython(snapshot_item_categories, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('product_sku', models.CharField(max_length=100)),
+                ('category', models.CharField(max_length=100)),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('order_lines', models.IntegerField(default=0)),
+                ('customer', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('product', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='products.product')),
+            ],
+            options={
+                'verbose_name': 'Daily Sales Rollup',
+                'verbose_name_plural': 'Daily Sales Rollups',
+                'db_table': 'orders_daily_sales_rollup',
+                'indexes': [models.Index(fields=['product_sku', 'date'], name='orders_dail_product_48bdad_idx'), models.Index(fields=['category', 'date'], name='orders_dail_categor_15b946_idx'), models.Index(fields=['customer', 'date'], name='orders_dail_custome_f7fc31_idx')],
+                'constraints': [models.UniqueConstraint(fields=('date', 'product_sku', 'category', 'customer'), name='orders_daily_sales_rollup_key')],
+            },
+        ),
+        migrations.RunPython(backfill_sales_rollup, migrations.RunPython.noop),
+    ]
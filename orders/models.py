@@ -8,7 +8,7 @@ from orders.constants import (
     ORDER_STATUS_CANCELLED,
     ORDER_STATUS_CHOICES
 )
-from orders.querysets import OrderManager, OrderItemManager
+from orders.querysets import OrderManager, OrderItemManager, OrderNumberSequenceManager, DailySalesRollupManager
 
 
 class Order(BaseModel):
@@ -74,6 +74,18 @@ class Order(BaseModel):
     def can_be_cancelled(self):
         return self.status in [ORDER_STATUS_PENDING, ORDER_STATUS_CONFIRMED]
 
+    def status_transition_error(self, new_status):
+        if new_status == self.status:
+            return "Status is already set to the specified value."
+
+        if self.status == ORDER_STATUS_CONFIRMED and new_status == ORDER_STATUS_PENDING:
+            return "Cannot change status from CONFIRMED to PENDING."
+
+        if self.status == ORDER_STATUS_CANCELLED:
+            return "Cannot change status of a cancelled order."
+
+        return None
+
     def calculate_total(self):
         total = sum(item.total_price for item in self.items.all())
         return total
@@ -98,6 +110,11 @@ class OrderItem(models.Model):
     product_sku = models.CharField(
         max_length=100,
     )
+    product_category = models.CharField(
+        max_length=100,
+        blank=True,
+        default='',
+    )
     quantity = models.PositiveIntegerField(
         validators=[MinValueValidator(1)],
     )
@@ -129,3 +146,86 @@ class OrderItem(models.Model):
     def save(self, *args, **kwargs):
         self.total_price = self.quantity * self.price
         super().save(*args, **kwargs)
+
+
+class OrderNumberSequence(models.Model):
+    day = models.DateField(
+        unique=True,
+    )
+    last_value = models.PositiveIntegerField(
+        default=0,
+    )
+
+    objects = OrderNumberSequenceManager()
+
+    class Meta:
+        db_table = 'orders_order_number_sequence'
+        verbose_name = 'Order Number Sequence'
+        verbose_name_plural = 'Order Number Sequences'
+
+    def __str__(self):
+        return f"{self.day.isoformat()}: {self.last_value}"
+
+
+class DailySalesRollup(models.Model):
+    """
+    Confirmed sales per (date, product, category, customer), maintained
+    incrementally by ``OrderService`` on confirmation and cancellation.
+
+    Products are identified by SKU, which is unique, immutable and
+    snapshotted on every order line, so a cancellation can still reverse
+    the right row after the product itself has been deleted.
+    """
+    date = models.DateField()
+    product_sku = models.CharField(
+        max_length=100,
+    )
+    product = models.ForeignKey(
+        'products.Product',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+        null=True,
+        blank=True,
+    )
+    category = models.CharField(
+        max_length=100,
+    )
+    customer = models.ForeignKey(
+        'users.User',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+    )
+    quantity = models.IntegerField(
+        default=0,
+    )
+    revenue = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+    )
+    order_lines = models.IntegerField(
+        default=0,
+    )
+
+    objects = DailySalesRollupManager()
+
+    class Meta:
+        db_table = 'orders_daily_sales_rollup'
+        verbose_name = 'Daily Sales Rollup'
+        verbose_name_plural = 'Daily Sales Rollups'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'product_sku', 'category', 'customer'],
+                name='orders_daily_sales_rollup_key',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['product_sku', 'date']),
+            models.Index(fields=['category', 'date']),
+            models.Index(fields=['customer', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.date.isoformat()} {self.product_sku} x {self.quantity} ({self.revenue})"
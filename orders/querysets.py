@@ -1,7 +1,17 @@
-from django.db import models
-from django.db.models import Sum
+from collections import defaultdict
+
+from django.db import IntegrityError, connections, models, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
 from django.utils import timezone
-from orders.constants import ORDER_STATUS_PENDING, ORDER_STATUS_CONFIRMED, ORDER_STATUS_CANCELLED
+from orders.constants import (
+    ORDER_STATUS_PENDING,
+    ORDER_STATUS_CONFIRMED,
+    ORDER_STATUS_CANCELLED,
+    SALES_BUCKET_DAY,
+    SALES_BUCKET_MONTH,
+    SALES_BUCKET_WEEK,
+)
 
 
 class OrderQuerySet(models.QuerySet):
@@ -100,3 +110,114 @@ class OrderItemManager(models.Manager):
     def by_product(self, product):
         return self.get_queryset().by_product(product)
 
+
+
+class OrderNumberSequenceManager(models.Manager):
+
+    def reserve(self, day, count=1):
+        """
+        Atomically advance the counter for ``day`` by ``count`` and return the
+        last reserved value. The counter row is created on first use.
+        """
+        with transaction.atomic(using=self.db):
+            updated = self.filter(day=day).update(last_value=F('last_value') + count)
+            if not updated:
+                try:
+                    with transaction.atomic(using=self.db):
+                        self.create(day=day, last_value=count)
+                    return count
+                except IntegrityError:
+                    # Another worker created the row first.
+                    self.filter(day=day).update(last_value=F('last_value') + count)
+            return self.filter(day=day).values_list('last_value', flat=True).get()
+
+
+class DailySalesRollupQuerySet(models.QuerySet):
+
+    BUCKET_FUNCTIONS = {
+        SALES_BUCKET_DAY: TruncDay,
+        SALES_BUCKET_WEEK: TruncWeek,
+        SALES_BUCKET_MONTH: TruncMonth,
+    }
+
+    def by_date_range(self, start_date=None, end_date=None):
+        queryset = self
+        if start_date:
+            queryset = queryset.filter(date__gte=start_date)
+        if end_date:
+            queryset = queryset.filter(date__lte=end_date)
+        return queryset
+
+    def total_revenue(self):
+        return self.aggregate(total=Sum('revenue'))['total'] or 0
+
+    def time_series(self, bucket):
+        return (self
+                .annotate(period=self.BUCKET_FUNCTIONS[bucket]('date'))
+                .values('period')
+                .annotate(
+                    quantity=Sum('quantity'),
+                    revenue=Sum('revenue'),
+                    order_lines=Sum('order_lines'),
+                )
+                .order_by('period'))
+
+
+class DailySalesRollupManager(models.Manager):
+
+    def get_queryset(self):
+        return DailySalesRollupQuerySet(self.model, using=self._db)
+
+    def by_date_range(self, start_date=None, end_date=None):
+        return self.get_queryset().by_date_range(start_date, end_date)
+
+    def record_lines(self, lines, sign=1):
+        """
+        Add (``sign=1``) or subtract (``sign=-1``) order lines from the
+        rollup. ``lines`` yields ``(date, product_sku, product_id, category,
+        customer_id, quantity, revenue)``; lines sharing a key are summed
+        first and every key is then applied in one batched upsert.
+        """
+        totals = defaultdict(lambda: [None, 0, 0, 0])
+        for date, product_sku, product_id, category, customer_id, quantity, revenue in lines:
+            total = totals[(date, product_sku, category, customer_id)]
+            total[0] = product_id or total[0]
+            total[1] += sign * quantity
+            total[2] += sign * revenue
+            total[3] += sign
+
+        if not totals:
+            return
+
+        connection = connections[self.db]
+        ops = connection.ops
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        params = [
+            (
+                ops.adapt_datefield_value(date),
+                product_sku,
+                product_id,
+                category,
+                customer_id,
+                quantity,
+                ops.adapt_decimalfield_value(revenue, max_digits=14, decimal_places=2),
+                order_lines,
+            )
+            for (date, product_sku, category, customer_id), (product_id, quantity, revenue, order_lines) in totals.items()
+        ]
+
+        # ON CONFLICT ... DO UPDATE is understood by both SQLite (3.24+) and
+        # PostgreSQL; the ORM's update_conflicts can only overwrite columns,
+        # not increment them.
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {table} "
+                f"(date, product_sku, product_id, category, customer_id, quantity, revenue, order_lines) "
+                f"VALUES (%s, %s, %s, %s, %s, %s, %s, %s) "
+                f"ON CONFLICT (date, product_sku, category, customer_id) DO UPDATE SET "
+                f"product_id = COALESCE(excluded.product_id, {table}.product_id), "
+                f"quantity = {table}.quantity + excluded.quantity, "
+                f"revenue = {table}.revenue + excluded.revenue, "
+                f"order_lines = {table}.order_lines + excluded.order_lines",
+                params,
+            )
@@ -1,8 +1,23 @@
+from datetime import timedelta
 from decimal import Decimal
+from django.utils import timezone
 from rest_framework import serializers
 
-from orders.constants import ORDER_STATUS_CHOICES, ORDER_STATUS_CONFIRMED, ORDER_STATUS_PENDING, ORDER_STATUS_CANCELLED
-from orders.services import OrderService
+from orders.constants import (
+    ORDER_BULK_STATUS_MAX_ORDERS,
+    ORDER_IMPORT_DEFAULT_CHUNK_SIZE,
+    ORDER_FILE_FORMAT_CHOICES,
+    ORDER_FILE_FORMAT_CSV,
+    ORDER_IMPORT_MAX_CHUNK_SIZE,
+    ORDER_STATUS_CHOICES,
+    SALES_BUCKET_CHOICES,
+    SALES_BUCKET_DAY,
+    SALES_BUCKET_MONTH,
+    SALES_BUCKET_WEEK,
+    SALES_TIME_SERIES_MAX_BUCKETS,
+)
+from orders.importers import guess_format, iter_orders
+from orders.services import OrderImportService, OrderService, SalesReportService
 from users.models import User
 from users.constants import ROLE_CUSTOMER
 from products.models import Product
@@ -31,7 +46,7 @@ class OrderListSerializer(serializers.Serializer):
     id = serializers.IntegerField(read_only=True)
     order_number = serializers.CharField(read_only=True)
     customer_id = serializers.IntegerField(read_only=True)
-    customer = serializers.CharField(source='get_full_name', read_only=True)
+    customer = serializers.CharField(source='customer.get_full_name', read_only=True)
     order_date = serializers.DateField(read_only=True)
     status = serializers.CharField(read_only=True)
     total_amount = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
@@ -100,7 +115,7 @@ class OrderRetrieveSerializer(serializers.Serializer):
     id = serializers.IntegerField(read_only=True)
     order_number = serializers.CharField(read_only=True)
     customer_id = serializers.IntegerField(source='customer.id', read_only=True)
-    customer = serializers.CharField(source='get_full_name', read_only=True)
+    customer = serializers.CharField(source='customer.get_full_name', read_only=True)
     order_date = serializers.DateField(read_only=True)
     status = serializers.CharField(read_only=True)
     total_amount = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
@@ -124,14 +139,9 @@ class OrderStatusUpdateSerializer(serializers.Serializer):
         if not new_status:
             raise serializers.ValidationError({'status': "This field is required."})
 
-        if new_status == instance.status:
-            raise serializers.ValidationError("Status is already set to the specified value.")
-
-        if instance.status == ORDER_STATUS_CONFIRMED and new_status == ORDER_STATUS_PENDING:
-            raise serializers.ValidationError("Cannot change status from CONFIRMED to PENDING.")
-
-        if instance.status == ORDER_STATUS_CANCELLED:
-            raise serializers.ValidationError("Cannot change status of a cancelled order.")
+        error = instance.status_transition_error(new_status)
+        if error:
+            raise serializers.ValidationError(error)
 
         return attrs
 
@@ -147,3 +157,101 @@ class OrderStatusUpdateSerializer(serializers.Serializer):
         )
 
 
+class OrderBulkStatusUpdateSerializer(serializers.Serializer):
+
+    order_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=ORDER_BULK_STATUS_MAX_ORDERS,
+    )
+    status = serializers.ChoiceField(
+        choices=ORDER_STATUS_CHOICES,
+    )
+
+    def validate_order_ids(self, value):
+        return list(dict.fromkeys(value))
+
+    def create(self, validated_data):
+
+        user = self.context['request'].user
+
+        return OrderService.bulk_change_order_status(
+            order_ids=validated_data['order_ids'],
+            new_status=validated_data['status'],
+            user=user
+        )
+
+
+class OrderImportSerializer(serializers.Serializer):
+
+    file = serializers.FileField()
+    file_format = serializers.ChoiceField(choices=ORDER_FILE_FORMAT_CHOICES, required=False)
+    chunk_size = serializers.IntegerField(
+        min_value=1,
+        max_value=ORDER_IMPORT_MAX_CHUNK_SIZE,
+        default=ORDER_IMPORT_DEFAULT_CHUNK_SIZE,
+    )
+    created_by = serializers.HiddenField(default=serializers.CurrentUserDefault())
+
+    def create(self, validated_data):
+
+        uploaded_file = validated_data['file']
+        file_format = validated_data.get('file_format') or guess_format(uploaded_file.name)
+
+        uploaded_file.open('rb')
+        return OrderImportService.import_orders(
+            records=iter_orders(uploaded_file.file, file_format),
+            created_by=validated_data['created_by'],
+            chunk_size=validated_data['chunk_size'],
+        )
+
+
+class OrderExportSerializer(serializers.Serializer):
+
+    file_format = serializers.ChoiceField(choices=ORDER_FILE_FORMAT_CHOICES, default=ORDER_FILE_FORMAT_CSV)
+
+
+class SalesTimeSeriesQuerySerializer(serializers.Serializer):
+
+    DEFAULT_PERIODS = {
+        SALES_BUCKET_DAY: 30,
+        SALES_BUCKET_WEEK: 12,
+        SALES_BUCKET_MONTH: 12,
+    }
+
+    bucket = serializers.ChoiceField(choices=SALES_BUCKET_CHOICES, default=SALES_BUCKET_DAY)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    product_id = serializers.IntegerField(required=False, min_value=1)
+    product_sku = serializers.CharField(required=False, max_length=100)
+    category = serializers.CharField(required=False, max_length=100)
+    customer_id = serializers.IntegerField(required=False, min_value=1)
+
+    def validate(self, attrs):
+        bucket = attrs['bucket']
+        date_to = attrs.setdefault('date_to', timezone.localdate())
+
+        if 'date_from' not in attrs:
+            date_from = SalesReportService.period_start(date_to, bucket)
+            for _ in range(self.DEFAULT_PERIODS[bucket] - 1):
+                date_from = SalesReportService.period_start(date_from - timedelta(days=1), bucket)
+            attrs['date_from'] = date_from
+
+        if attrs['date_from'] > attrs['date_to']:
+            raise serializers.ValidationError({'date_from': "Must not be after date_to."})
+
+        periods = SalesReportService.periods(attrs['date_from'], attrs['date_to'], bucket)
+        if sum(1 for _ in periods) > SALES_TIME_SERIES_MAX_BUCKETS:
+            raise serializers.ValidationError(
+                f"The date range spans more than {SALES_TIME_SERIES_MAX_BUCKETS} {bucket} buckets."
+            )
+
+        return attrs
+
+
+class SalesTimeSeriesPointSerializer(serializers.Serializer):
+
+    period = serializers.DateField(read_only=True)
+    quantity = serializers.IntegerField(read_only=True)
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+    order_lines = serializers.IntegerField(read_only=True)
@@ -1,81 +1,152 @@
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.conf import settings
 from django.db import transaction
-from datetime import datetime
+from django.db.models import Q, prefetch_related_objects
+from django.utils import timezone
 from rest_framework.exceptions import ValidationError
 
-from orders.constants import ORDER_STATUS_CANCELLED, ORDER_STATUS_CONFIRMED, ORDER_STATUS_PENDING
+from common.cache import bump_namespaces
+from common.constants import CACHE_NAMESPACE_ORDERS
+from common.db import writer_lane
+from common.metrics import instrument_service
+from orders.constants import (
+    ORDER_IMPORT_DEFAULT_CHUNK_SIZE,
+    ORDER_IMPORT_MAX_REPORTED_ERRORS,
+    ORDER_NUMBER_PREFIX,
+    ORDER_STATUS_CANCELLED,
+    ORDER_STATUS_CONFIRMED,
+    ORDER_STATUS_PENDING,
+    SALES_BUCKET_MONTH,
+    SALES_BUCKET_WEEK,
+)
 from users.models import User
-from orders.models import Order, OrderItem
-from products.services import ProductService
+from orders.models import DailySalesRollup, Order, OrderItem, OrderNumberSequence
+from products.models import Product
+from products.services import ProductService, StockMovement
 
 
-class OrderService:
+class OrderNumberAllocator:
+    """
+    Hands out per-day order sequence values from blocks reserved in
+    ``OrderNumberSequence``.
 
-    @staticmethod
-    def generate_order_number():
+    A block is reserved in its own short transaction, so the counter row is
+    never locked for the lifetime of an order transaction. Values left in a
+    block when the day rolls over or the process exits are skipped, which
+    leaves gaps but never duplicates.
+    """
 
-        today = datetime.now().strftime('%Y%m%d')
-        prefix = f"ORD-{today}"
+    def __init__(self, block_size):
+        self.block_size = max(block_size, 1)
+        self._lock = threading.Lock()
+        self._day = None
+        self._next_value = 1
+        self._last_value = 0
 
-        last_order = Order.objects.filter(
-            order_number__startswith=prefix
-        ).order_by('-order_number').first()
+    def allocate(self, count=1):
+        day = timezone.localdate()
 
-        if last_order:
-            last_sequence = int(last_order.order_number.split('-')[-1])
-            new_sequence = last_sequence + 1
-        else:
-            new_sequence = 1
+        # Inside a caller's transaction a cached block could be rolled back
+        # while this process still hands it out, so reserve exactly what is
+        # needed as part of that transaction instead.
+        if transaction.get_connection().in_atomic_block:
+            last_value = OrderNumberSequence.objects.reserve(day, count)
+            return day, range(last_value - count + 1, last_value + 1)
+
+        with self._lock:
+            if self._day != day or self._last_value - self._next_value + 1 < count:
+                size = max(self.block_size, count)
+                self._last_value = OrderNumberSequence.objects.reserve(day, size)
+                self._next_value = self._last_value - size + 1
+                self._day = day
+
+            values = range(self._next_value, self._next_value + count)
+            self._next_value += count
+            return day, values
 
-        return f"{prefix}-{new_sequence:04d}"
+    def reset(self):
+        with self._lock:
+            self._day = None
+            self._next_value = 1
+            self._last_value = 0
+
+
+order_number_allocator = OrderNumberAllocator(settings.ORDER_NUMBER_BLOCK_SIZE)
+
+
+@instrument_service
+class OrderService:
 
     @staticmethod
-    @transaction.atomic
-    def create_order(customer_id, items, created_by, modified_by, products_dict):
+    def format_order_number(day, sequence):
+        return f"{ORDER_NUMBER_PREFIX}-{day:%Y%m%d}-{sequence:04d}"
 
-        customer = User.objects.get(id=customer_id)
-        order_number = OrderService.generate_order_number()
+    @staticmethod
+    def generate_order_numbers(count):
+        day, values = order_number_allocator.allocate(count)
+        return [OrderService.format_order_number(day, value) for value in values]
 
-        order = Order.objects.create(
-            order_number=order_number,
-            customer=customer,
-            status=ORDER_STATUS_PENDING,
-            total_amount=0.00,
-            created_by=created_by,
-            modified_by=modified_by
-        )
+    @staticmethod
+    def generate_order_number():
+        return OrderService.generate_order_numbers(1)[0]
 
-        order_items = []
-        total_amount = 0
+    @staticmethod
+    def create_order(customer_id, items, created_by, modified_by, products_dict):
 
-        for item_data in items:
-            product = products_dict[item_data['product_id']]
-            price = item_data.get('price', product.selling_price)
-            quantity = item_data['quantity']
-            item_total = quantity * price
+        with writer_lane():
+            # Reserved in the order's own transaction, so a failed order
+            # gives its number back and every sequence write queues in the lane.
+            order_number = OrderService.generate_order_number()
+            customer = User.objects.get(id=customer_id)
+
+            order = Order.objects.create(
+                order_number=order_number,
+                customer=customer,
+                status=ORDER_STATUS_PENDING,
+                total_amount=0.00,
+                created_by=created_by,
+                modified_by=modified_by
+            )
 
-            order_items.append(
-                OrderItem(
-                    order=order,
-                    product=product,
-                    product_name=product.name,
-                    product_sku=product.sku,
-                    quantity=quantity,
-                    price=price,
-                    total_price=item_total
+            order_items = []
+            total_amount = 0
+
+            for item_data in items:
+                product = products_dict[item_data['product_id']]
+                price = item_data.get('price', product.selling_price)
+                quantity = item_data['quantity']
+                item_total = quantity * price
+
+                order_items.append(
+                    OrderItem(
+                        order=order,
+                        product=product,
+                        product_name=product.name,
+                        product_sku=product.sku,
+                        product_category=product.category,
+                        quantity=quantity,
+                        price=price,
+                        total_price=item_total
+                    )
                 )
-            )
 
-            total_amount += item_total
+                total_amount += item_total
 
-        OrderItem.objects.bulk_create(order_items)
+            OrderItem.objects.bulk_create(order_items)
 
-        order.total_amount = total_amount
-        order.save(update_fields=['total_amount'])
+            order.total_amount = total_amount
+            order.save(update_fields=['total_amount'])
+            bump_namespaces(CACHE_NAMESPACE_ORDERS)
 
         return order
 
     @staticmethod
-    @transaction.atomic
+    @writer_lane()
     def change_order_status(order, new_status, user):
 
         old_status = order.status
@@ -83,21 +154,115 @@ class OrderService:
         if old_status == new_status:
             return order
 
-        # Handle status transitions
-        if new_status == ORDER_STATUS_CONFIRMED:
-            OrderService._confirm_order(order, user)
-        elif new_status == ORDER_STATUS_CANCELLED:
-            OrderService._cancel_order(order, old_status, user)
+        prefetch_related_objects([order], 'items')
+
+        # Apply the stock side of the transition
+        ProductService.apply_stock_movements(
+            OrderService._status_change_movements(order, old_status, new_status),
+            user=user,
+        )
+        OrderService._record_sales([order], old_status, new_status)
 
         # Update order status
         order.status = new_status
         order.modified_by = user
         order.save(update_fields=['status', 'modified_by', 'modified_at'])
+        bump_namespaces(CACHE_NAMESPACE_ORDERS)
 
         return order
 
     @staticmethod
-    @transaction.atomic
+    @writer_lane()
+    def bulk_change_order_status(order_ids, new_status, user):
+        """
+        Move many orders to ``new_status`` in one transaction.
+
+        Each order is checked with the same transition rules as a single
+        update and fails on its own; the stock changes of every order that
+        passes are aggregated per product and applied together, with the
+        stock logs written in one bulk insert.
+        """
+        orders = {
+            order.pk: order
+            for order in (Order.objects
+                          .select_for_update(of=('self',))
+                          .filter(pk__in=order_ids)
+                          .select_related('customer')
+                          .prefetch_related('items')
+                          .order_by('pk'))
+        }
+
+        errors = {}
+        candidates = []
+        for order_id in order_ids:
+            order = orders.get(order_id)
+            error = "Order not found." if order is None else order.status_transition_error(new_status)
+            if error:
+                errors[order_id] = error
+                continue
+
+            try:
+                movements = OrderService._status_change_movements(order, order.status, new_status)
+            except ValidationError as exc:
+                errors[order_id] = OrderService._error_message(exc)
+                continue
+
+            candidates.append((order, movements))
+
+        locked_products = ProductService.lock_products(
+            {movement.product_id for _, movements in candidates for movement in movements}
+        )
+        available = {product_id: product.stock_qty for product_id, product in locked_products.items()}
+
+        accepted = []
+        movements_to_apply = []
+        for order, movements in candidates:
+            shortages = [
+                locked_products[movement.product_id]
+                for movement in movements
+                if available[movement.product_id] + movement.delta < 0
+            ]
+            if shortages:
+                errors[order.pk] = "Insufficient stock for " + "; ".join(
+                    f"{product.name} sku: {product.sku}" for product in shortages
+                )
+                continue
+
+            for movement in movements:
+                available[movement.product_id] += movement.delta
+            accepted.append(order)
+            movements_to_apply.extend(movements)
+
+        ProductService.apply_stock_movements(movements_to_apply, user=user, locked_products=locked_products)
+
+        for old_status in {order.status for order in accepted}:
+            OrderService._record_sales(
+                [order for order in accepted if order.status == old_status], old_status, new_status
+            )
+
+        Order.objects.filter(pk__in=[order.pk for order in accepted]).update(
+            status=new_status,
+            modified_by=user,
+            modified_at=timezone.now(),
+        )
+        bump_namespaces(CACHE_NAMESPACE_ORDERS)
+
+        return {
+            'status': new_status,
+            'succeeded': len(accepted),
+            'failed': len(errors),
+            'results': [
+                {
+                    'order_id': order_id,
+                    'success': order_id not in errors,
+                    'error': errors.get(order_id),
+                }
+                for order_id in order_ids
+            ],
+        }
+
+    @staticmethod
+    @writer_lane()
     def delete_order(instance):
 
         if instance.status != ORDER_STATUS_PENDING:
@@ -107,43 +272,325 @@ class OrderService:
             )
 
         instance.delete()
+        bump_namespaces(CACHE_NAMESPACE_ORDERS)
 
     @staticmethod
-    def _confirm_order(order, user):
-
-        if order.status != ORDER_STATUS_PENDING:
-            raise ValidationError("Only pending orders can be confirmed.")
+    def _stock_movements(order, sign, reason):
 
+        movements = []
         for item in order.items.all():
-            new_qty = item.product.stock_qty - item.quantity
+            if item.product_id is None:
+                if sign < 0:
+                    raise ValidationError(
+                        {"stock": f"Product {item.product_name} sku: {item.product_sku} no longer exists."},
+                        code="product_not_found"
+                    )
+                # Nothing to restock once the product has been deleted.
+                continue
+
+            movements.append(StockMovement(
+                product_id=item.product_id,
+                delta=sign * item.quantity,
+                reason=reason,
+                customer_id=order.customer_id,
+                customer_name=order.customer.get_full_name() if order.customer_id else '',
+            ))
+
+        return movements
+
+    @staticmethod
+    def _status_change_movements(order, old_status, new_status):
+
+        if new_status == ORDER_STATUS_CONFIRMED:
+            if old_status != ORDER_STATUS_PENDING:
+                raise ValidationError("Only pending orders can be confirmed.")
+            return OrderService._stock_movements(order, -1, f"Order {order.order_number} confirmed")
+
+        if new_status == ORDER_STATUS_CANCELLED and old_status == ORDER_STATUS_CONFIRMED:
+            return OrderService._stock_movements(order, 1, f"Order {order.order_number} cancelled")
 
-            if new_qty < 0:
-                raise ValidationError(
-                    {"stock": f"Insufficient stock for {item.product.name} sku: {item.product.sku}"},
-                    code="insufficient_stock"
+        return []
+
+    @staticmethod
+    def _record_sales(orders, old_status, new_status):
+
+        if new_status == ORDER_STATUS_CONFIRMED:
+            sign = 1
+        elif new_status == ORDER_STATUS_CANCELLED and old_status == ORDER_STATUS_CONFIRMED:
+            sign = -1
+        else:
+            return
+
+        DailySalesRollup.objects.record_lines(
+            (
+                (order.order_date, item.product_sku, item.product_id, item.product_category,
+                 order.customer_id, item.quantity, item.total_price)
+                for order in orders
+                for item in order.items.all()
+            ),
+            sign=sign,
+        )
+
+    @staticmethod
+    def _error_message(exc):
+
+        detail = exc.detail
+        if isinstance(detail, dict):
+            detail = next(iter(detail.values()))
+        if isinstance(detail, list):
+            detail = detail[0]
+        return str(detail)
+
+
+class OrderImportService:
+    """
+    Bulk-creates pending orders from parsed import records (see
+    ``orders.importers``), one chunk of orders at a time.
+
+    Every chunk costs a fixed number of queries: one lookup for its
+    customers, one for its products, one order number block and two bulk
+    inserts. An order with any invalid line is skipped and reported with
+    its source rows; the rest of the chunk is still imported.
+    """
+
+    @staticmethod
+    def import_orders(records, created_by, chunk_size=ORDER_IMPORT_DEFAULT_CHUNK_SIZE):
+
+        started = time.perf_counter()
+        report = {
+            'rows_processed': 0,
+            'orders_created': 0,
+            'orders_failed': 0,
+            'errors': [],
+            'errors_truncated': False,
+        }
+
+        records = iter(records)
+        while chunk := list(islice(records, chunk_size)):
+            OrderImportService._import_chunk(chunk, created_by, report)
+
+        elapsed = time.perf_counter() - started
+        report['elapsed_seconds'] = round(elapsed, 3)
+        report['rows_per_second'] = round(report['rows_processed'] / elapsed, 1) if elapsed else None
+        return report
+
+    @staticmethod
+    def _import_chunk(chunk, created_by, report):
+
+        customers_by_id, customers_by_code = OrderImportService._resolve_customers(chunk)
+        products_by_id, products_by_sku = OrderImportService._resolve_products(chunk)
+
+        valid = []
+        for record in chunk:
+            report['rows_processed'] += len(record.rows)
+
+            errors = list(record.errors)
+            customer = None
+            lines = []
+
+            if not errors:
+                customer = (customers_by_id.get(OrderImportService._to_int(record.customer_id))
+                            or customers_by_code.get(record.customer_code))
+                if customer is None:
+                    errors.append("Customer not found or not a valid customer.")
+                if not record.items:
+                    errors.append("Order has no items.")
+
+                seen_products = set()
+                for index, item in enumerate(record.items):
+                    label = f"Row {record.rows[index]}" if len(record.rows) == len(record.items) else f"Item {index + 1}"
+                    line, line_errors = OrderImportService._parse_line(item, products_by_id, products_by_sku)
+                    if line and line[0].pk in seen_products:
+                        line_errors.append(f"Duplicate product {line[0].sku} in order.")
+                    errors.extend(f"{label}: {error}" for error in line_errors)
+                    if line:
+                        seen_products.add(line[0].pk)
+                        lines.append(line)
+
+            if errors:
+                OrderImportService._report_error(report, record, errors)
+                continue
+
+            valid.append((customer, lines))
+
+        if not valid:
+            return
+
+        with writer_lane():
+            order_numbers = OrderService.generate_order_numbers(len(valid))
+            orders = Order.objects.bulk_create([
+                Order(
+                    order_number=order_number,
+                    customer=customer,
+                    status=ORDER_STATUS_PENDING,
+                    total_amount=sum(quantity * price for _, quantity, price in lines),
+                    created_by=created_by,
+                    modified_by=created_by,
                 )
+                for order_number, (customer, lines) in zip(order_numbers, valid)
+            ])
 
-            ProductService.update_stock(
-                product=item.product,
-                new_qty=new_qty,
-                user=user,
-                customer=order.customer,
-                reason=f"Order {order.order_number} confirmed"
-            )
+            OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    product=product,
+                    product_name=product.name,
+                    product_sku=product.sku,
+                    product_category=product.category,
+                    quantity=quantity,
+                    price=price,
+                    total_price=quantity * price,
+                )
+                for order, (_, lines) in zip(orders, valid)
+                for product, quantity, price in lines
+            ])
+            bump_namespaces(CACHE_NAMESPACE_ORDERS)
+
+        report['orders_created'] += len(orders)
+
+    @staticmethod
+    def _resolve_customers(chunk):
+
+        ids = {OrderImportService._to_int(record.customer_id) for record in chunk} - {None}
+        codes = {record.customer_code for record in chunk} - {None}
+
+        customers = (User.objects
+                     .customers()
+                     .filter(Q(pk__in=ids) | Q(customer_code__in=codes))
+                     .only('id', 'customer_code'))
+
+        by_id, by_code = {}, {}
+        for customer in customers:
+            by_id[customer.pk] = customer
+            if customer.customer_code:
+                by_code[customer.customer_code] = customer
+        return by_id, by_code
 
     @staticmethod
-    def _cancel_order(order, old_status, user):
+    def _resolve_products(chunk):
+
+        ids, skus = set(), set()
+        for record in chunk:
+            for item in record.items:
+                product_id = OrderImportService._to_int(item['product_id'])
+                if product_id is not None:
+                    ids.add(product_id)
+                elif item['sku']:
+                    skus.add(item['sku'].upper())
+
+        products = (Product.objects
+                    .filter(Q(pk__in=ids) | Q(sku__in=skus))
+                    .only('id', 'sku', 'name', 'category', 'selling_price'))
+
+        by_id, by_sku = {}, {}
+        for product in products:
+            by_id[product.pk] = product
+            by_sku[product.sku] = product
+        return by_id, by_sku
+
+    @staticmethod
+    def _parse_line(item, products_by_id, products_by_sku):
+
+        errors = []
+
+        product_id = OrderImportService._to_int(item['product_id'])
+        if product_id is not None:
+            product = products_by_id.get(product_id)
+            if product is None:
+                errors.append(f"Product with ID {product_id} not found.")
+        elif item['sku']:
+            product = products_by_sku.get(item['sku'].upper())
+            if product is None:
+                errors.append(f"Product with SKU {item['sku']} not found.")
+        else:
+            product = None
+            errors.append("Either product_id or sku is required.")
+
+        quantity = OrderImportService._to_int(item['quantity'])
+        if quantity is None or quantity < 1:
+            errors.append("Quantity must be a whole number of at least 1.")
 
-        if old_status != ORDER_STATUS_CONFIRMED:
+        price = None
+        if item['price'] is not None:
+            try:
+                price = Decimal(item['price']).quantize(Decimal('0.01'))
+            except InvalidOperation:
+                errors.append(f"Invalid price {item['price']}.")
+            else:
+                if price < Decimal('0.01'):
+                    errors.append("Price must be at least 0.01.")
+
+        if errors:
+            return None, errors
+
+        return (product, quantity, price if price is not None else product.selling_price), errors
+
+    @staticmethod
+    def _report_error(report, record, errors):
+
+        report['orders_failed'] += 1
+        if len(report['errors']) >= ORDER_IMPORT_MAX_REPORTED_ERRORS:
+            report['errors_truncated'] = True
             return
 
-        for item in order.items.all():
-            new_qty = item.product.stock_qty + item.quantity
-
-            ProductService.update_stock(
-                product=item.product,
-                new_qty=new_qty,
-                user=user,
-                customer=order.customer,
-                reason=f"Order {order.order_number} cancelled"
-            )
+        report['errors'].append({
+            'order_ref': record.order_ref,
+            'rows': record.rows,
+            'errors': errors,
+        })
+
+    @staticmethod
+    def _to_int(value):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+
+class SalesReportService:
+
+    @staticmethod
+    def period_start(day, bucket):
+        if bucket == SALES_BUCKET_WEEK:
+            return day - timedelta(days=day.weekday())
+        if bucket == SALES_BUCKET_MONTH:
+            return day.replace(day=1)
+        return day
+
+    @staticmethod
+    def next_period(day, bucket):
+        if bucket == SALES_BUCKET_WEEK:
+            return day + timedelta(days=7)
+        if bucket == SALES_BUCKET_MONTH:
+            return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+        return day + timedelta(days=1)
+
+    @staticmethod
+    def periods(date_from, date_to, bucket):
+        period = SalesReportService.period_start(date_from, bucket)
+        while period <= date_to:
+            yield period
+            period = SalesReportService.next_period(period, bucket)
+
+    @staticmethod
+    def time_series(bucket, date_from, date_to, product_id=None, product_sku=None, category=None, customer_id=None):
+        """
+        Sales per bucket between ``date_from`` and ``date_to`` read from the
+        daily rollup only, with empty buckets filled in as zeros.
+        """
+        queryset = DailySalesRollup.objects.by_date_range(date_from, date_to)
+        if product_id:
+            queryset = queryset.filter(product_id=product_id)
+        if product_sku:
+            queryset = queryset.filter(product_sku=product_sku.upper())
+        if category:
+            queryset = queryset.filter(category__iexact=category)
+        if customer_id:
+            queryset = queryset.filter(customer_id=customer_id)
+
+        totals = {row['period']: row for row in queryset.time_series(bucket)}
+
+        return [
+            totals.get(period) or {'period': period, 'quantity': 0, 'revenue': 0, 'order_lines': 0}
+            for period in SalesReportService.periods(date_from, date_to, bucket)
+        ]
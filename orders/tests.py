@@ -1,3 +1,426 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APITestCase
+
+from orders.constants import ORDER_STATUS_CANCELLED, ORDER_STATUS_CONFIRMED, ORDER_STATUS_PENDING
+from orders.models import DailySalesRollup, Order, OrderNumberSequence
+from orders.services import OrderNumberAllocator, OrderService
+from products.models import Product, StockChangeLog
+from users.constants import ROLE_ADMIN, ROLE_CUSTOMER
+from users.models import User
+
+
+def create_user(email, role, **extra):
+    return User.objects.create(email=email, role=role, first_name='Test', last_name=role.title(), **extra)
+
+
+def create_product(index, stock_qty=100, created_by=None):
+    return Product.objects.create(
+        sku=f"SKU-{index:05d}",
+        name=f"Product {index}",
+        category="Hardware",
+        cost_price=Decimal('5.00'),
+        selling_price=Decimal('10.00'),
+        stock_qty=stock_qty,
+        created_by=created_by,
+        modified_by=created_by,
+    )
+
+
+def create_order(customer, products, quantity=1, created_by=None):
+    return OrderService.create_order(
+        customer_id=customer.id,
+        items=[{'product_id': product.id, 'quantity': quantity} for product in products],
+        created_by=created_by,
+        modified_by=created_by,
+        products_dict={product.id: product for product in products},
+    )
+
+
+class OrderNumberSequenceTests(TestCase):
+
+    def test_reserve_creates_and_advances_counter(self):
+        day = timezone.localdate()
+
+        self.assertEqual(OrderNumberSequence.objects.reserve(day), 1)
+        self.assertEqual(OrderNumberSequence.objects.reserve(day, 5), 6)
+        self.assertEqual(OrderNumberSequence.objects.get(day=day).last_value, 6)
+
+    def test_order_number_format(self):
+        day = timezone.localdate()
+
+        self.assertEqual(
+            OrderService.format_order_number(day, 7),
+            f"ORD-{day:%Y%m%d}-0007",
+        )
+
+    def test_failed_order_gives_its_number_back(self):
+        product = create_product(1)
+        with self.assertRaises(User.DoesNotExist):
+            OrderService.create_order(customer_id=0, items=[{'product_id': product.id, 'quantity': 1}],
+                                      created_by=None, modified_by=None, products_dict={product.id: product})
+
+        order = create_order(create_user('customer@example.com', ROLE_CUSTOMER), [product])
+        self.assertEqual(order.order_number, OrderService.format_order_number(timezone.localdate(), 1))
+
+
+class OrderNumberAllocatorConcurrencyTests(TransactionTestCase):
+
+    workers = 8
+    numbers_per_worker = 50
+
+    def _allocate_many(self, allocator):
+        try:
+            return [
+                value
+                for _ in range(self.numbers_per_worker)
+                for value in allocator.allocate()[1]
+            ]
+        finally:
+            connection.close()
+
+    def test_parallel_workers_never_share_a_number(self):
+        # Each allocator stands in for a separate worker process with its own
+        # cached block; they only coordinate through the counter table.
+        allocators = [OrderNumberAllocator(block_size=7) for _ in range(self.workers)]
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = list(executor.map(self._allocate_many, allocators))
+
+        values = [value for result in results for value in result]
+        self.assertEqual(len(values), self.workers * self.numbers_per_worker)
+        self.assertEqual(len(values), len(set(values)))
+
+
+class OrderConfirmationStressTests(TransactionTestCase):
+
+    def test_parallel_confirmations_never_oversell(self):
+        create_user('admin@example.com', ROLE_ADMIN)
+        create_user('customer@example.com', ROLE_CUSTOMER)
+
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            call_command('stress_order_confirmations', workers=3, orders=30, products=2, stock=10,
+                         output=output.name, stdout=io.StringIO())
+            report = json.load(output)
+
+        self.assertEqual(report['violations'], [])
+        self.assertEqual(report['confirmed'] + report['rejected'] + report['failed'], 30)
+        self.assertGreater(report['rejected'], 0)
+
+
+class OrderStockMovementTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user('admin@example.com', ROLE_ADMIN)
+        cls.customer = create_user('customer@example.com', ROLE_CUSTOMER)
+
+    def _confirm(self, order):
+        return OrderService.change_order_status(order, ORDER_STATUS_CONFIRMED, self.admin)
+
+    def test_confirm_query_count_does_not_grow_with_line_items(self):
+        small_order = create_order(self.customer, [create_product(i) for i in range(2)], created_by=self.admin)
+        large_order = create_order(self.customer, [create_product(i) for i in range(10, 60)], created_by=self.admin)
+
+        with self.assertNumQueries(10):
+            self._confirm(small_order)
+        with self.assertNumQueries(10):
+            self._confirm(large_order)
+
+        self.assertEqual(set(Product.objects.filter(order_items__order=large_order).values_list('stock_qty', flat=True)), {99})
+        self.assertEqual(StockChangeLog.objects.filter(change_reason__contains=large_order.order_number).count(), 50)
+
+    def test_confirm_rolls_back_when_any_line_would_oversell(self):
+        plenty = create_product(1, stock_qty=10)
+        scarce = create_product(2, stock_qty=1)
+        order = create_order(self.customer, [plenty, scarce], quantity=2, created_by=self.admin)
+
+        with self.assertRaises(ValidationError) as ctx:
+            self._confirm(order)
+
+        self.assertIn(scarce.sku, str(ctx.exception.detail))
+        plenty.refresh_from_db()
+        scarce.refresh_from_db()
+        self.assertEqual((plenty.stock_qty, scarce.stock_qty), (10, 1))
+        self.assertEqual(Order.objects.get(pk=order.pk).status, ORDER_STATUS_PENDING)
+
+    def test_oversell_error_names_only_the_short_products(self):
+        # After the UPDATE takes 2, this product has 1 left, still less than 2.
+        in_stock = create_product(1, stock_qty=3)
+        short = create_product(2, stock_qty=1)
+        order = create_order(self.customer, [in_stock, short], quantity=2, created_by=self.admin)
+
+        with self.assertRaises(ValidationError) as ctx:
+            self._confirm(order)
+
+        self.assertIn(short.sku, str(ctx.exception.detail))
+        self.assertNotIn(in_stock.sku, str(ctx.exception.detail))
+        self.assertEqual(Product.objects.get(pk=in_stock.pk).stock_qty, 3)
+
+    def test_cancel_restores_stock_and_logs_each_line(self):
+        products = [create_product(i, stock_qty=5) for i in range(3)]
+        order = create_order(self.customer, products, quantity=2, created_by=self.admin)
+        self._confirm(order)
+
+        OrderService.change_order_status(order, ORDER_STATUS_CANCELLED, self.admin)
+
+        logs = StockChangeLog.objects.filter(change_reason=f"Order {order.order_number} cancelled")
+        self.assertEqual(
+            sorted(logs.values_list('previous_qty', 'new_qty', 'customer_id')),
+            [(3, 5, self.customer.id)] * 3,
+        )
+        self.assertEqual(set(Product.objects.values_list('stock_qty', flat=True)), {5})
+
+
+class BulkOrderStatusUpdateApiTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user('admin@example.com', ROLE_ADMIN)
+        cls.customer = create_user('customer@example.com', ROLE_CUSTOMER)
+
+    def setUp(self):
+        self.client.force_authenticate(self.admin)
+
+    def _post(self, order_ids, status):
+        return self.client.post(
+            reverse('orders:bulk-update-order-status'),
+            {'order_ids': order_ids, 'status': status},
+            format='json',
+        )
+
+    def test_confirms_orders_and_reports_failures_per_order(self):
+        hot = create_product(1, stock_qty=3)
+        other = create_product(2, stock_qty=10)
+        first = create_order(self.customer, [hot, other], quantity=2, created_by=self.admin)
+        second = create_order(self.customer, [hot], quantity=2, created_by=self.admin)
+        third = create_order(self.customer, [other], quantity=2, created_by=self.admin)
+        OrderService.change_order_status(third, ORDER_STATUS_CANCELLED, self.admin)
+
+        response = self._post([first.pk, second.pk, third.pk, 999], ORDER_STATUS_CONFIRMED)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['succeeded'], response.data['failed']), (1, 3))
+        results = {result['order_id']: result for result in response.data['results']}
+        self.assertTrue(results[first.pk]['success'])
+        self.assertIn(hot.sku, results[second.pk]['error'])
+        self.assertEqual(results[third.pk]['error'], "Cannot change status of a cancelled order.")
+        self.assertEqual(results[999]['error'], "Order not found.")
+
+        self.assertEqual(
+            dict(Order.objects.filter(pk__in=[first.pk, second.pk]).values_list('pk', 'status')),
+            {first.pk: ORDER_STATUS_CONFIRMED, second.pk: ORDER_STATUS_PENDING},
+        )
+        hot.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((hot.stock_qty, other.stock_qty), (1, 8))
+
+    def test_cancel_aggregates_stock_across_orders(self):
+        product = create_product(1, stock_qty=10)
+        orders = [create_order(self.customer, [product], quantity=2, created_by=self.admin) for _ in range(3)]
+        for order in orders:
+            OrderService.change_order_status(order, ORDER_STATUS_CONFIRMED, self.admin)
+
+        response = self._post([order.pk for order in orders], ORDER_STATUS_CANCELLED)
+
+        self.assertEqual(response.data['succeeded'], 3)
+        product.refresh_from_db()
+        self.assertEqual(product.stock_qty, 10)
+        self.assertEqual(
+            list(StockChangeLog.objects.filter(change_reason__endswith='cancelled')
+                 .order_by('id').values_list('previous_qty', 'new_qty')),
+            [(4, 6), (6, 8), (8, 10)],
+        )
+
+    def test_requires_admin(self):
+        self.client.force_authenticate(self.customer)
+
+        response = self._post([1], ORDER_STATUS_CONFIRMED)
+
+        self.assertEqual(response.status_code, 403)
+
+
+class OrderImportApiTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user('admin@example.com', ROLE_ADMIN)
+        cls.customer = create_user('customer@example.com', ROLE_CUSTOMER, customer_code='CUST-001')
+        cls.products = [create_product(i) for i in range(3)]
+
+    def setUp(self):
+        self.client.force_authenticate(self.admin)
+
+    def _upload(self, name, content, **data):
+        return self.client.post(
+            reverse('orders:import-orders'),
+            {'file': SimpleUploadedFile(name, content.encode()), **data},
+            format='multipart',
+        )
+
+    def test_csv_import_creates_valid_orders_and_reports_bad_rows(self):
+        content = (
+            "order_ref,customer_id,customer_code,product_id,sku,quantity,price\n"
+            f"A-1,,CUST-001,,{self.products[0].sku},2,12.50\n"
+            f"A-1,,CUST-001,{self.products[1].pk},,1,\n"
+            f"A-2,{self.customer.pk},,,NOPE,1,\n"
+            f"A-3,{self.customer.pk},,,{self.products[2].sku},0,\n"
+            f"A-4,{self.admin.pk},,,{self.products[2].sku},1,\n"
+        )
+
+        response = self._upload('orders.csv', content, chunk_size=2)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['rows_processed'], 5)
+        self.assertEqual((response.data['orders_created'], response.data['orders_failed']), (1, 3))
+        errors = {error['order_ref']: error for error in response.data['errors']}
+        self.assertEqual(errors['A-2']['rows'], [4])
+        self.assertEqual(errors['A-2']['errors'], ["Row 4: Product with SKU NOPE not found."])
+        self.assertIn("Row 5: Quantity", errors['A-3']['errors'][0])
+        self.assertEqual(errors['A-4']['errors'], ["Customer not found or not a valid customer."])
+
+        order = Order.objects.get()
+        self.assertEqual(order.total_amount, Decimal('35.00'))
+        self.assertEqual(order.items.count(), 2)
+
+    def test_ndjson_import_uses_one_lookup_per_chunk(self):
+        lines = [
+            '{"order_ref": "N-%d", "customer_code": "CUST-001", "items": [{"sku": "%s", "quantity": 1}]}'
+            % (number, self.products[number % 3].sku)
+            for number in range(40)
+        ]
+        lines.insert(5, 'not json')
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self._upload('orders.ndjson', "\n".join(lines), chunk_size=25)
+
+        statements = [query['sql'] for query in ctx.captured_queries]
+        self.assertEqual(sum('FROM "products_product"' in sql for sql in statements), 2)
+        self.assertEqual(sum(sql.startswith('INSERT INTO "orders_order_item"') for sql in statements), 2)
+        self.assertEqual((response.data['orders_created'], response.data['orders_failed']), (40, 1))
+        self.assertEqual(response.data['errors'][0]['rows'], [6])
+        self.assertEqual(Order.objects.values('order_number').distinct().count(), 40)
+
+
+class OrderExportApiTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user('admin@example.com', ROLE_ADMIN)
+        cls.customer = create_user('customer@example.com', ROLE_CUSTOMER)
+        products = [create_product(i) for i in range(2)]
+        cls.confirmed = create_order(cls.customer, products, quantity=3, created_by=cls.admin)
+        cls.pending = create_order(cls.customer, products[:1], created_by=cls.admin)
+        OrderService.change_order_status(cls.confirmed, ORDER_STATUS_CONFIRMED, cls.admin)
+
+    def setUp(self):
+        self.client.force_authenticate(self.admin)
+
+    def _export(self, **params):
+        response = self.client.get(reverse('orders:export-orders'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export_streams_one_row_per_line_item_and_honours_filters(self):
+        rows = list(csv.DictReader(io.StringIO(self._export(status=ORDER_STATUS_CONFIRMED))))
+
+        self.assertEqual(len(rows), 2)
+        self.assertEqual({row['order_number'] for row in rows}, {self.confirmed.order_number})
+        self.assertEqual([row['quantity'] for row in rows], ['3', '3'])
+        self.assertEqual(rows[0]['customer_email'], self.customer.email)
+
+    def test_ndjson_export(self):
+        lines = self._export(file_format='ndjson').splitlines()
+
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(json.loads(lines[-1])['order_number'], self.pending.order_number)
+
+    def test_rejects_unknown_format(self):
+        response = self.client.get(reverse('orders:export-orders'), {'file_format': 'xml'})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class DailySalesRollupTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user('admin@example.com', ROLE_ADMIN)
+        cls.customer = create_user('customer@example.com', ROLE_CUSTOMER)
+        cls.products = [create_product(i) for i in range(2)]
+
+    def _rollup(self):
+        return sorted(DailySalesRollup.objects.values_list('product_sku', 'quantity', 'revenue', 'order_lines'))
+
+    def test_confirm_adds_and_cancel_reverses_sales(self):
+        first = create_order(self.customer, self.products, quantity=2, created_by=self.admin)
+        second = create_order(self.customer, self.products[:1], quantity=1, created_by=self.admin)
+
+        OrderService.change_order_status(first, ORDER_STATUS_CONFIRMED, self.admin)
+        OrderService.bulk_change_order_status([second.pk], ORDER_STATUS_CONFIRMED, self.admin)
+
+        self.assertEqual(self._rollup(), [
+            (self.products[0].sku, 3, Decimal('30.00'), 2),
+            (self.products[1].sku, 2, Decimal('20.00'), 1),
+        ])
+
+        OrderService.change_order_status(first, ORDER_STATUS_CANCELLED, self.admin)
+
+        self.assertEqual(self._rollup(), [
+            (self.products[0].sku, 1, Decimal('10.00'), 1),
+            (self.products[1].sku, 0, Decimal('0.00'), 0),
+        ])
+
+    def test_backfill_rebuilds_the_same_rollup(self):
+        for quantity in (1, 2, 3):
+            order = create_order(self.customer, self.products, quantity=quantity, created_by=self.admin)
+            OrderService.change_order_status(order, ORDER_STATUS_CONFIRMED, self.admin)
+        expected = [row for row in self._rollup()]
+
+        DailySalesRollup.objects.all().delete()
+        call_command('backfill_sales_rollup', chunk_size=2, stdout=io.StringIO())
+
+        self.assertEqual(self._rollup(), expected)
+
+    def test_time_series_is_gap_filled_and_reads_only_the_rollup(self):
+        today = timezone.localdate()
+        DailySalesRollup.objects.create(
+            date=today - timedelta(days=2), product_sku='SKU-A', category='Hardware',
+            customer=self.customer, quantity=4, revenue=Decimal('40.00'), order_lines=1,
+        )
+        self.client.force_authenticate(self.admin)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('orders:sales-time-series'), {
+                'date_from': (today - timedelta(days=3)).isoformat(),
+                'date_to': today.isoformat(),
+            })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(point['quantity'], point['revenue']) for point in response.data['results']],
+            [(0, '0.00'), (4, '40.00'), (0, '0.00'), (0, '0.00')],
+        )
+
+    def test_time_series_monthly_buckets_default_to_a_year(self):
+        self.client.force_authenticate(self.admin)
+
+        response = self.client.get(reverse('orders:sales-time-series'), {'bucket': 'month'})
+
+        self.assertEqual(len(response.data['results']), 12)
+        self.assertEqual(response.data['results'][-1]['period'], timezone.localdate().replace(day=1).isoformat())
@@ -2,7 +2,11 @@ from django.urls import path
 from orders.views import (
     ListCreateOrdersApiView,
     RetrieveUpdateDestroyOrderApiView,
-    OrderItemsListApiView
+    OrderItemsListApiView,
+    BulkOrderStatusUpdateApiView,
+    OrderImportApiView,
+    OrderExportApiView,
+    SalesTimeSeriesApiView
 )
 
 app_name = 'orders'
@@ -11,5 +15,9 @@ urlpatterns = [
     path('', ListCreateOrdersApiView.as_view(), name='list-create-orders'),
     path('<int:pk>/', RetrieveUpdateDestroyOrderApiView.as_view(), name='retrieve-update-destroy-order'),
     path('<int:order_id>/items/', OrderItemsListApiView.as_view(), name='order-items'),
+    path('bulk-status/', BulkOrderStatusUpdateApiView.as_view(), name='bulk-update-order-status'),
+    path('import/', OrderImportApiView.as_view(), name='import-orders'),
+    path('export/', OrderExportApiView.as_view(), name='export-orders'),
+    path('sales/', SalesTimeSeriesApiView.as_view(), name='sales-time-series'),
 ]
 
@@ -1,24 +1,43 @@
-from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView, ListAPIView
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView, ListAPIView, GenericAPIView
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
 from rest_framework.filters import OrderingFilter, SearchFilter
 from django_filters.rest_framework import DjangoFilterBackend
 
+from common.constants import (
+    THROTTLE_EXPENSIVE_RATE,
+    THROTTLE_PRIORITY_CRITICAL,
+    THROTTLE_PRIORITY_LOW,
+)
+from common.replicas import ReplicaReadMixin
 from orders.models import Order, OrderItem
 from orders.serializers import (
     OrderListSerializer,
     OrderCreateSerializer,
     OrderRetrieveSerializer,
     OrderStatusUpdateSerializer,
-    OrderItemDetailSerializer
+    OrderItemDetailSerializer,
+    OrderBulkStatusUpdateSerializer,
+    OrderImportSerializer,
+    OrderExportSerializer,
+    SalesTimeSeriesQuerySerializer,
+    SalesTimeSeriesPointSerializer
 )
+from orders.constants import ORDER_EXPORT_CHUNK_SIZE
+from orders.exporters import EXPORT_FIELDS, WRITERS
 from orders.filters import OrderFilter, OrderItemFilter
-from orders.services import OrderService
+from orders.services import OrderService, SalesReportService
 from users.permissions import IsSales, IsAdmin
 
 
-class ListCreateOrdersApiView(ListCreateAPIView):
+class ListCreateOrdersApiView(ReplicaReadMixin, ListCreateAPIView):
 
     queryset = Order.objects.all()
     permission_classes = [IsSales | IsAdmin]
+    throttle_rate = THROTTLE_EXPENSIVE_RATE
+    throttle_write_priority = THROTTLE_PRIORITY_CRITICAL
     filterset_class = OrderFilter
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     search_fields = ['order_number', 'customer__email', 'customer__first_name', 'customer__last_name']
@@ -37,6 +56,7 @@ class ListCreateOrdersApiView(ListCreateAPIView):
 
 class RetrieveUpdateDestroyOrderApiView(RetrieveUpdateDestroyAPIView):
     queryset = Order.objects.all()
+    throttle_write_priority = THROTTLE_PRIORITY_CRITICAL
 
     def get_serializer_class(self):
         if self.request.method in ['PUT', 'PATCH']:
@@ -54,7 +74,7 @@ class RetrieveUpdateDestroyOrderApiView(RetrieveUpdateDestroyAPIView):
         return Order.objects.select_related(
             'customer', 'created_by', 'modified_by'
         ).prefetch_related(
-            'items__product'
+            'items'
         ).all()
 
     def perform_destroy(self, instance):
@@ -74,3 +94,82 @@ class OrderItemsListApiView(ListAPIView):
         return OrderItem.objects.filter(
             order_id=order_id
         ).all()
+
+
+class BulkOrderStatusUpdateApiView(GenericAPIView):
+
+    serializer_class = OrderBulkStatusUpdateSerializer
+    permission_classes = [IsAdmin]
+    throttle_write_priority = THROTTLE_PRIORITY_CRITICAL
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.save())
+
+
+class OrderImportApiView(GenericAPIView):
+
+    serializer_class = OrderImportSerializer
+    permission_classes = [IsAdmin]
+    throttle_rate = THROTTLE_EXPENSIVE_RATE
+    throttle_write_priority = THROTTLE_PRIORITY_CRITICAL
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.save())
+
+
+class OrderExportApiView(GenericAPIView):
+
+    serializer_class = OrderExportSerializer
+    permission_classes = [IsSales | IsAdmin]
+    throttle_rate = THROTTLE_EXPENSIVE_RATE
+    throttle_priority = THROTTLE_PRIORITY_LOW
+    filterset_class = OrderFilter
+    filter_backends = [DjangoFilterBackend]
+    pagination_class = None
+
+    def get_queryset(self):
+        return Order.objects.all()
+
+    def get(self, request):
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        file_format = serializer.validated_data['file_format']
+
+        rows = (self.filter_queryset(self.get_queryset())
+                .order_by('id', 'items__id')
+                .values_list(*EXPORT_FIELDS)
+                .iterator(chunk_size=ORDER_EXPORT_CHUNK_SIZE))
+
+        writer, content_type = WRITERS[file_format]
+        response = StreamingHttpResponse(writer(rows), content_type=content_type)
+        response['Content-Disposition'] = (
+            f'attachment; filename="orders-{timezone.localdate():%Y%m%d}.{file_format}"'
+        )
+        return response
+
+
+class SalesTimeSeriesApiView(GenericAPIView):
+
+    serializer_class = SalesTimeSeriesQuerySerializer
+    permission_classes = [IsSales | IsAdmin]
+    throttle_rate = THROTTLE_EXPENSIVE_RATE
+    throttle_priority = THROTTLE_PRIORITY_LOW
+
+    def get(self, request):
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        points = SalesReportService.time_series(**params)
+
+        return Response({
+            'bucket': params['bucket'],
+            'date_from': params['date_from'],
+            'date_to': params['date_to'],
+            'results': SalesTimeSeriesPointSerializer(points, many=True).data,
+        })
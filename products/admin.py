@@ -1,23 +1,6 @@
 from django.contrib import admin
 from products.models import Product, StockChangeLog
 
-class StockChangeLogInline(admin.TabularInline):
-    model = StockChangeLog
-    extra = 0
-    can_delete = False
-    readonly_fields = [
-        'created_at', 'customer',
-        'previous_qty', 'new_qty', 'change_reason'
-    ]
-    fields = [
-        'created_at', 'customer',
-        'previous_qty', 'new_qty', 'change_reason'
-    ]
-
-    def has_add_permission(self, request, obj=None):
-        return False
-
-
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = (
@@ -45,32 +28,30 @@ class ProductAdmin(admin.ModelAdmin):
         }),
     )
 
-    inlines = [StockChangeLogInline]
-
 
 @admin.register(StockChangeLog)
 class StockChangeLogAdmin(admin.ModelAdmin):
     list_display = (
-        'product', 'created_at', 'customer',
+        'product_sku', 'created_at', 'customer_name',
         'previous_qty', 'new_qty', 'change_reason'
     )
     list_filter = ('created_at', 'change_reason')
-    search_fields = ('product__sku', 'product__name', 'customer__email', )
+    search_fields = ('product_sku', 'product_name', 'customer_name', )
     readonly_fields = [
-        'product', 'created_at', 'customer',
-        'previous_qty', 'new_qty', 'change_reason'
+        'product_id', 'product_sku', 'product_name', 'created_at', 'customer_id', 'customer_name',
+        'previous_qty', 'new_qty', 'change_reason', 'created_by_name'
     ]
     ordering = ('-created_at',)
 
     fieldsets = (
         ('Stock Change Information', {
-            'fields': ('product', 'created_at', 'change_reason')
+            'fields': ('product_id', 'product_sku', 'product_name', 'created_at', 'change_reason')
         }),
         ('Quantity Details', {
             'fields': ('previous_qty', 'new_qty')
         }),
         ('Related Users', {
-            'fields': ('customer', )
+            'fields': ('customer_id', 'customer_name', 'created_by_name')
         }),
     )
 
@@ -80,6 +61,3 @@ class StockChangeLogAdmin(admin.ModelAdmin):
 
     def has_delete_permission(self, request, obj=None):
         return False
-
-
-
@@ -0,0 +1,141 @@
+"""
+Stock change log storage.
+
+By default stock logs are written to ``default`` in the transaction that
+changes the stock. Setting ``AUDIT_DATABASE`` moves them to a database of
+their own, so the audit trail's inserts and indexes stop competing with
+orders for SQLite's single writer.
+
+A second database cannot share the stock change's transaction, so logs then
+go through a transactional outbox: ``save_stock_logs`` stores them in
+``StockChangeLogOutbox`` on ``default``, committed or rolled back together
+with the stock change, and ``relay_outbox`` copies them to the audit
+database and deletes them from the outbox. Every log carries the id of its
+outbox entry under a unique constraint, so a relay that dies between the two
+steps, or two relays racing, never duplicate a log.
+
+Each process relays in a background thread woken after every commit that
+added logs; ``python manage.py relay_stock_change_logs`` drains anything left
+behind, e.g. by a process that exited first. Logs show up in the stock
+history once relayed, normally within milliseconds of the change.
+"""
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.dateparse import parse_datetime
+
+from common.cache import increment_namespace
+from common.constants import CACHE_NAMESPACE_PRODUCTS
+from common.db import writer_lane
+from products.constants import STOCK_LOG_RELAY_BATCH_SIZE
+from products.models import StockChangeLog, StockChangeLogOutbox
+
+logger = logging.getLogger(__name__)
+
+# Fields copied through the outbox; the audit database assigns its own ids.
+_PAYLOAD_FIELDS = [
+    field.attname for field in StockChangeLog._meta.concrete_fields
+    if field.attname not in ('id', 'outbox_id')
+]
+
+
+def uses_outbox() -> bool:
+    return settings.STOCK_LOG_DATABASE != DEFAULT_DB_ALIAS
+
+
+class StockLogRouter:
+    """Keep ``StockChangeLog`` in ``STOCK_LOG_DATABASE``, and nothing else there."""
+
+    def _routes(self, model):
+        return uses_outbox() and model is StockChangeLog
+
+    def db_for_read(self, model, **hints):
+        return settings.STOCK_LOG_DATABASE if self._routes(model) else None
+
+    def db_for_write(self, model, **hints):
+        return settings.STOCK_LOG_DATABASE if self._routes(model) else None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if not uses_outbox() or db != settings.STOCK_LOG_DATABASE:
+            # ``default`` keeps its copy of the table, e.g. for
+            # `relay_stock_change_logs --copy-existing`.
+            return None
+        return app_label == 'products' and model_name == 'stockchangelog'
+
+
+def save_stock_logs(logs: list[StockChangeLog]) -> list[StockChangeLog]:
+    """
+    Store ``logs`` as part of the current transaction on ``default``: directly,
+    or through the outbox when they live in an audit database.
+    """
+    if not uses_outbox():
+        return StockChangeLog.objects.bulk_create(logs)
+
+    StockChangeLogOutbox.objects.bulk_create(
+        StockChangeLogOutbox(payload={name: getattr(log, name) for name in _PAYLOAD_FIELDS})
+        for log in logs
+    )
+    if settings.STOCK_LOG_RELAY:
+        transaction.on_commit(stock_log_relay.wake, robust=True)
+    return logs
+
+
+def relay_outbox(batch_size: int = STOCK_LOG_RELAY_BATCH_SIZE) -> int:
+    """Move up to ``batch_size`` of the oldest outbox entries to the audit database."""
+    entries = list(StockChangeLogOutbox.objects.order_by('id')[:batch_size])
+    if not entries:
+        return 0
+
+    logs = []
+    for entry in entries:
+        payload = dict(entry.payload)
+        payload['created_at'] = parse_datetime(payload['created_at'])
+        logs.append(StockChangeLog(outbox_id=entry.pk, **payload))
+
+    # Entries relayed before an interruption are skipped, then deleted below.
+    with writer_lane(using=settings.STOCK_LOG_DATABASE):
+        StockChangeLog.objects.bulk_create(logs, ignore_conflicts=True)
+    with writer_lane():
+        StockChangeLogOutbox.objects.filter(pk__in=[entry.pk for entry in entries]).delete()
+
+    increment_namespace(CACHE_NAMESPACE_PRODUCTS)
+    return len(entries)
+
+
+class StockLogRelay:
+    """A per-process background thread that drains the outbox when woken."""
+
+    def __init__(self):
+        self._reset()
+        # Threads do not survive a fork; a child starts its own on first use.
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def wake(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='stock-log-relay', daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                while relay_outbox():
+                    pass
+            except Exception:
+                # The entries stay in the outbox for the next wake-up or the
+                # relay command.
+                logger.exception("Relaying stock change logs failed.")
+
+
+stock_log_relay = StockLogRelay()
@@ -0,0 +1,189 @@
+"""
+In-process prefix index for product autocomplete.
+
+Each process keeps a sorted list of ``(key, product_id)`` pairs for SKUs and
+for product names starting at each of their first words, and answers a
+prefix lookup with a bisect plus a short forward scan, without touching the
+database.
+
+``ProductService`` applies its catalog changes to the local index once they
+commit and bumps the shared catalog version; other processes notice the new
+version within ``AUTOCOMPLETE_VERSION_CHECK_SECONDS`` and rebuild in a
+background thread, answering from the old index until the new one is ready.
+Only a process's first lookup waits for a build. The index holds at most
+``PRODUCT_AUTOCOMPLETE_MAX_PRODUCTS`` products, evicting the oldest first.
+"""
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from common.cache import increment_namespace, namespace_versions
+from common.constants import CACHE_NAMESPACE_CATALOG
+from products.constants import AUTOCOMPLETE_MAX_NAME_WORDS, AUTOCOMPLETE_VERSION_CHECK_SECONDS
+from products.models import Product
+
+logger = logging.getLogger(__name__)
+
+
+def _index_keys(sku, name):
+    words = name.lower().split()
+    name_keys = {' '.join(words[start:]) for start in range(min(len(words), AUTOCOMPLETE_MAX_NAME_WORDS))}
+    return sku.lower(), name_keys
+
+
+class ProductAutocompleteIndex:
+
+    def __init__(self, max_products):
+        self.max_products = max_products
+        self.version = None
+        self._checked_at = 0.0
+        self._lock = threading.RLock()
+        self._rebuild_thread = None
+        self._products = OrderedDict()
+        self._sku_keys = []
+        self._name_keys = []
+        # Threads do not survive a fork; a child starts its own rebuilds.
+        os.register_at_fork(after_in_child=self._forget_rebuild)
+
+    def _forget_rebuild(self):
+        self._rebuild_thread = None
+
+    def __len__(self):
+        return len(self._products)
+
+    def lookup(self, prefix, limit) -> list[dict]:
+        """Up to ``limit`` products whose SKU, then name, starts with ``prefix``."""
+        self._ensure_fresh()
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+
+        found = []
+        with self._lock:
+            for keys in (self._sku_keys, self._name_keys):
+                position = bisect_left(keys, (prefix,))
+                while position < len(keys) and len(found) < limit and keys[position][0].startswith(prefix):
+                    product_id = keys[position][1]
+                    if product_id not in found:
+                        found.append(product_id)
+                    position += 1
+
+            return [
+                {'id': product_id, 'sku': sku, 'name': name, 'selling_price': selling_price}
+                for product_id in found
+                for sku, name, selling_price in (self._products[product_id],)
+            ]
+
+    def rebuild(self, version=None) -> None:
+        if version is None:
+            version = namespace_versions([CACHE_NAMESPACE_CATALOG])[0]
+
+        # Newest products win when the catalog exceeds the bound.
+        rows = list(Product.objects
+                    .order_by('-id')
+                    .values_list('id', 'sku', 'name', 'selling_price')[:self.max_products])
+        rows.reverse()
+
+        products = OrderedDict()
+        sku_keys = []
+        name_keys = []
+        for product_id, sku, name, selling_price in rows:
+            products[product_id] = (sku, name, selling_price)
+            sku_key, product_name_keys = _index_keys(sku, name)
+            sku_keys.append((sku_key, product_id))
+            name_keys.extend((key, product_id) for key in product_name_keys)
+        sku_keys.sort()
+        name_keys.sort()
+
+        with self._lock:
+            self._products, self._sku_keys, self._name_keys = products, sku_keys, name_keys
+            self.version = version
+            self._checked_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.version = None
+
+    def on_commit(self, products=(), removed_ids=()) -> None:
+        """Apply catalog changes to this process's index once the current transaction commits."""
+        changes = [(product.pk, product.sku, product.name, product.selling_price) for product in products]
+        removed_ids = list(removed_ids)
+        transaction.on_commit(lambda: self.apply(changes, removed_ids))
+
+    def apply(self, changes, removed_ids) -> None:
+        with self._lock:
+            if self.version is not None:
+                for product_id in removed_ids:
+                    self._remove(product_id)
+                for product_id, sku, name, selling_price in changes:
+                    self._add(product_id, sku, name, selling_price)
+
+            version = increment_namespace(CACHE_NAMESPACE_CATALOG)
+            # Only adopt the new version if no other process changed the
+            # catalog in between; otherwise the next lookup rebuilds.
+            if self.version is not None and self.version == version - 1:
+                self.version = version
+
+    def _ensure_fresh(self):
+        if self.version is not None and time.monotonic() - self._checked_at < AUTOCOMPLETE_VERSION_CHECK_SECONDS:
+            return
+
+        version = namespace_versions([CACHE_NAMESPACE_CATALOG])[0]
+        if self.version is None:
+            # Nothing to answer from yet.
+            self.rebuild(version)
+        elif version != self.version:
+            self._rebuild_in_background(version)
+        else:
+            self._checked_at = time.monotonic()
+
+    def _rebuild_in_background(self, version):
+        with self._lock:
+            if self._rebuild_thread is not None and self._rebuild_thread.is_alive():
+                return
+            # Lookups keep using the old index meanwhile, without checking again.
+            self._checked_at = time.monotonic()
+            self._rebuild_thread = threading.Thread(target=self._run_rebuild, args=(version,),
+                                                    name='product-autocomplete-rebuild', daemon=True)
+            self._rebuild_thread.start()
+
+    def _run_rebuild(self, version):
+        try:
+            self.rebuild(version)
+        except Exception:
+            # The old index stays; the next version check tries again.
+            logger.exception("Rebuilding the product autocomplete index failed.")
+        finally:
+            connections.close_all()
+
+    def _add(self, product_id, sku, name, selling_price):
+        self._remove(product_id)
+
+        self._products[product_id] = (sku, name, selling_price)
+        sku_key, name_keys = _index_keys(sku, name)
+        insort(self._sku_keys, (sku_key, product_id))
+        for key in name_keys:
+            insort(self._name_keys, (key, product_id))
+
+        while len(self._products) > self.max_products:
+            self._remove(next(iter(self._products)))
+
+    def _remove(self, product_id):
+        entry = self._products.pop(product_id, None)
+        if entry is None:
+            return
+
+        sku_key, name_keys = _index_keys(entry[0], entry[1])
+        for keys, key in [(self._sku_keys, sku_key), *((self._name_keys, key) for key in name_keys)]:
+            position = bisect_left(keys, (key, product_id))
+            if position < len(keys) and keys[position] == (key, product_id):
+                del keys[position]
+
+
+product_autocomplete = ProductAutocompleteIndex(settings.PRODUCT_AUTOCOMPLETE_MAX_PRODUCTS)
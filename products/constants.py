@@ -8,4 +8,32 @@ STOCK_STATUS_CHOICES = (
     (IN_STOCK, IN_STOCK),
     (OUT_OF_STOCK, OUT_OF_STOCK),
     (LOW_STOCK, LOW_STOCK),
-)
\ No newline at end of file
+)
+# Stock statuses that open a stock alert.
+STOCK_ALERT_STATUS_CHOICES = (
+    (LOW_STOCK, LOW_STOCK),
+    (OUT_OF_STOCK, OUT_OF_STOCK),
+)
+STOCK_ALERT_ACKNOWLEDGE_MAX_IDS = 500
+PRODUCT_SEARCH_TABLE = "products_product_search"
+# bm25() column weights for sku, name and category.
+PRODUCT_SEARCH_WEIGHTS = (10.0, 5.0, 1.0)
+
+AUTOCOMPLETE_DEFAULT_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+# Leading words of a product name that start an indexed prefix.
+AUTOCOMPLETE_MAX_NAME_WORDS = 4
+# How often, in seconds, a process checks whether another one changed the catalog.
+AUTOCOMPLETE_VERSION_CHECK_SECONDS = 1.0
+
+# Selling price bands for catalog facets: (label, lower bound inclusive, upper bound exclusive).
+PRICE_BANDS = (
+    ("0-50", None, 50),
+    ("50-100", 50, 100),
+    ("100-500", 100, 500),
+    ("500-1000", 500, 1000),
+    ("1000+", 1000, None),
+)
+
+# Outbox entries moved to the audit database per relay batch, see products.audit.
+STOCK_LOG_RELAY_BATCH_SIZE = 500
@@ -1,42 +1,76 @@
 import django_filters
+from rest_framework.filters import OrderingFilter, SearchFilter
 
-from products.constants import IN_STOCK, LOW_STOCK, OUT_OF_STOCK, STOCK_STATUS_CHOICES
-from products.models import Product, StockChangeLog
+from products import search
+from products.constants import STOCK_ALERT_STATUS_CHOICES, STOCK_STATUS_CHOICES
+from products.models import Category, Product, StockAlert, StockChangeLog
+from products.querysets import category_key
 
 
 class ProductFilter(django_filters.FilterSet):
 
-    category = django_filters.CharFilter(field_name='category', lookup_expr='iexact')
-    stock_status = django_filters.ChoiceFilter(
-        method='filter_stock_status',
-        choices=STOCK_STATUS_CHOICES,
-    )
+    category = django_filters.CharFilter(method='filter_category')
+    category_id = django_filters.NumberFilter(field_name='category_ref')
+    stock_status = django_filters.ChoiceFilter(choices=STOCK_STATUS_CHOICES)
     min_price = django_filters.NumberFilter(field_name='selling_price', lookup_expr='gte')
     max_price = django_filters.NumberFilter(field_name='selling_price', lookup_expr='lte')
 
     class Meta:
         model = Product
-        fields = ['category', 'stock_status', 'min_price', 'max_price']
+        fields = ['category', 'category_id', 'stock_status', 'min_price', 'max_price']
 
-
-    def filter_stock_status(self, queryset, name, value):
-
-        if value == IN_STOCK:
-            return queryset.in_stock()
-        elif value == LOW_STOCK:
-            return queryset.low_stock()
-        elif value == OUT_OF_STOCK:
-            return queryset.out_of_stock()
-        return queryset
+    def filter_category(self, queryset, name, value):
+        # Resolve the name once so the product query is an indexed id match.
+        category_id = (Category.objects
+                       .filter(key=category_key(value))
+                       .values_list('id', flat=True)
+                       .first())
+        if category_id is None:
+            return queryset.none()
+        return queryset.filter(category_ref=category_id)
 
 
 class StockChangeLogFilter(django_filters.FilterSet):
 
-    product_id = django_filters.NumberFilter(field_name='product')
-    customer_id = django_filters.NumberFilter(field_name='customer')
-    sales_user_id = django_filters.NumberFilter(field_name='sales_user')
+    product_id = django_filters.NumberFilter(field_name='product_id')
+    customer_id = django_filters.NumberFilter(field_name='customer_id')
+    sales_user_id = django_filters.NumberFilter(field_name='created_by_id')
 
     class Meta:
         model = StockChangeLog
         fields = ['product_id', 'customer_id', 'sales_user_id']
 
+
+class StockAlertFilter(django_filters.FilterSet):
+
+    product_id = django_filters.NumberFilter(field_name='product')
+    status = django_filters.ChoiceFilter(choices=STOCK_ALERT_STATUS_CHOICES)
+    is_open = django_filters.BooleanFilter(field_name='resolved_at', lookup_expr='isnull')
+    pending = django_filters.BooleanFilter(field_name='notified_at', lookup_expr='isnull')
+
+    class Meta:
+        model = StockAlert
+        fields = ['product_id', 'status', 'is_open', 'pending']
+
+
+class ProductSearchFilter(SearchFilter):
+    """
+    ``?search=`` over the full-text index: every term must prefix-match the
+    SKU, name or category, and results carry a ``search_rank``. Falls back
+    to DRF's ``icontains`` search where the index is unavailable.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms or not search.is_available():
+            return super().filter_queryset(request, queryset, view)
+        return search.search(queryset, terms)
+
+
+class ProductOrderingFilter(OrderingFilter):
+    """Order search results by relevance unless ``?ordering=`` asks otherwise."""
+
+    def get_ordering(self, request, queryset, view):
+        if not request.query_params.get(self.ordering_param) and 'search_rank' in queryset.query.annotations:
+            return ['search_rank', '-id']
+        return super().get_ordering(request, queryset, view)
@@ -0,0 +1,73 @@
+import json
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from products import search
+from products.filters import ProductOrderingFilter, ProductSearchFilter
+from products.models import Product
+from products.views import ListCreateProductsApiView
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the full-text product search against DRF's icontains search for "
+        "a set of terms over the products already in the database, fetching "
+        "one page of results per query in the order the product list uses."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('terms', nargs='*', default=['lap', 'SKU-001', 'wireless mouse', 'electronics'])
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--output', help="Write the results as JSON to this path.")
+
+    def handle(self, *args, terms, repeat, output, **options):
+        if not search.is_available():
+            raise CommandError("The product search index needs SQLite with FTS5; run migrations first.")
+
+        total = Product.objects.count()
+        self.stdout.write(f"Benchmarking {len(terms)} terms over {total} products, {repeat} runs each.")
+
+        view = ListCreateProductsApiView()
+        results = []
+        for term in terms:
+            request = Request(APIRequestFactory().get('/', {'search': term}))
+            for backends in ((SearchFilter, OrderingFilter), (ProductSearchFilter, ProductOrderingFilter)):
+                name = backends[0].__name__
+                timings, matches = self._time(backends, request, view, repeat)
+                result = {
+                    'term': term,
+                    'backend': name,
+                    'products': total,
+                    'matches': matches,
+                    'median_ms': round(statistics.median(timings), 3),
+                    'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 3),
+                }
+                results.append(result)
+                self.stdout.write(
+                    f"{term!r:>20} {name:<20} matches={matches:<8} "
+                    f"median={result['median_ms']}ms p95={result['p95_ms']}ms"
+                )
+
+        if output:
+            with open(output, 'w') as output_file:
+                json.dump(results, output_file, indent=2)
+
+    def _filter(self, backends, request, view):
+        queryset = Product.objects.all()
+        for backend in backends:
+            queryset = backend().filter_queryset(request, queryset, view)
+        return queryset
+
+    def _time(self, backends, request, view, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(self._filter(backends, request, view)[:settings.DEFAULT_PAGINATION_PAGE_SIZE])
+            timings.append((time.perf_counter() - started) * 1000)
+        return sorted(timings), self._filter(backends, request, view).count()
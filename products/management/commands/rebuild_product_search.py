@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from products import search
+
+
+class Command(BaseCommand):
+    help = (
+        "Repopulate the full-text product search index from the products "
+        "table. Run it after loading products without ProductService."
+    )
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError("The product search index needs SQLite with FTS5; run migrations first.")
+
+        with transaction.atomic():
+            total = search.rebuild()
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} products."))
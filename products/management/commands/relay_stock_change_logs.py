@@ -0,0 +1,77 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from common.db import writer_lane
+from products.audit import relay_outbox, uses_outbox
+from products.constants import STOCK_LOG_RELAY_BATCH_SIZE
+from products.models import StockChangeLog
+
+
+class Command(BaseCommand):
+    help = (
+        "Move stock change logs waiting in the outbox to the audit database "
+        "(AUDIT_DATABASE), polling every --interval seconds. Pass --copy-existing "
+        "once, when first enabling the audit database, to copy the logs already "
+        "stored in the primary database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds between polls of an empty outbox.")
+        parser.add_argument('--once', action='store_true', help="Drain the outbox and exit.")
+        parser.add_argument('--copy-existing', action='store_true',
+                            help="Copy the primary database's stock logs into the audit database first. "
+                                 "Safe to repeat, and to run after logs were relayed.")
+
+    def handle(self, *args, interval, once, copy_existing, **options):
+        if not uses_outbox():
+            raise CommandError("Set AUDIT_DATABASE first; stock logs are written to the primary database.")
+
+        if copy_existing:
+            self._copy_existing()
+
+        while True:
+            relayed = 0
+            while count := relay_outbox():
+                relayed += count
+            if relayed:
+                self.stdout.write(f"Relayed {relayed} stock change log(s).")
+            if once:
+                return
+            time.sleep(interval)
+
+    def _copy_existing(self):
+        audit = settings.STOCK_LOG_DATABASE
+        audit_logs = StockChangeLog.objects.using(audit)
+
+        # The relay queues behind the copy, then assigns ids after it.
+        with writer_lane(using=audit):
+            # Logs relayed before the copy, e.g. while STOCK_LOG_RELAY was on,
+            # have ids the audit database assigned, which may clash with the
+            # copied ones. Set them aside and add them back after the copy,
+            # where they belong in the history; their outbox ids still keep
+            # the relay from adding them twice.
+            relayed = list(audit_logs.filter(outbox_id__isnull=False).order_by('pk'))
+            audit_logs.filter(outbox_id__isnull=False).delete()
+
+            # Ids are kept, so the history stays in order; logs copied by an
+            # earlier run are skipped.
+            copied, last_id = 0, 0
+            while True:
+                batch = list(StockChangeLog.objects
+                             .using(DEFAULT_DB_ALIAS)
+                             .filter(pk__gt=last_id)
+                             .order_by('pk')[:STOCK_LOG_RELAY_BATCH_SIZE])
+                if not batch:
+                    break
+                audit_logs.bulk_create(batch, ignore_conflicts=True)
+                copied += len(batch)
+                last_id = batch[-1].pk
+
+            for log in relayed:
+                log.pk = None
+            audit_logs.bulk_create(relayed, batch_size=STOCK_LOG_RELAY_BATCH_SIZE)
+        self.stdout.write(f"Copied {copied} stock change log(s) to the audit database, "
+                          f"followed by {len(relayed)} relayed before the copy.")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from products.services import CategoryService
+
+
+class Command(BaseCommand):
+    help = (
+        "Link products that have no category row yet and recompute every "
+        "category's product count and stock value from the products table."
+    )
+
+    def handle(self, *args, **options):
+        linked = CategoryService.sync()
+        self.stdout.write(self.style.SUCCESS(f"Linked {linked} products; category totals recomputed."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from products.services import StockAlertService
+
+
+class Command(BaseCommand):
+    help = (
+        "Resolve every open stock alert and reopen one for each product that is "
+        "currently low or out of stock, after stock was written outside ProductService."
+    )
+
+    def handle(self, *args, **options):
+        opened = StockAlertService.sync()
+        self.stdout.write(self.style.SUCCESS(f"{opened} open stock alerts."))
@@ -0,0 +1,57 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+from products.constants import PRODUCT_SEARCH_TABLE, PRODUCT_SEARCH_WEIGHTS
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if not cursor.fetchone()[0]:
+            return
+
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE {PRODUCT_SEARCH_TABLE} USING fts5("
+            f"sku, name, category, tokenize = \"unicode61 tokenchars '-_'\", prefix = '2 3')"
+        )
+        cursor.execute(
+            f"INSERT INTO {PRODUCT_SEARCH_TABLE} (rowid, sku, name, category) "
+            f"SELECT id, sku, name, category FROM products_product"
+        )
+        cursor.execute(
+            f"INSERT INTO {PRODUCT_SEARCH_TABLE} ({PRODUCT_SEARCH_TABLE}, rank) "
+            f"VALUES ('rank', 'bm25({', '.join(map(str, PRODUCT_SEARCH_WEIGHTS))})')"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {PRODUCT_SEARCH_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_product_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearchEntry',
+            fields=[
+                ('product', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='products.product')),
+                ('sku', models.TextField()),
+                ('name', models.TextField()),
+                ('category', models.TextField()),
+            ],
+            options={
+                'db_table': 'products_product_search',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.1.2 on 2026-10-18 05:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+
+
+def link_categories(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    Product = apps.get_model('products', 'Product')
+
+    # The earliest spelling of each category becomes its display name.
+    names = {}
+    for name in Product.objects.order_by('id').values_list('category', flat=True).iterator():
+        key = ' '.join(name.split()).lower()
+        if key and key not in names:
+            names[key] = ' '.join(name.split())
+    categories = {
+        category.key: category
+        for category in Category.objects.bulk_create([Category(key=key, name=name) for key, name in names.items()])
+    }
+
+    for name in Product.objects.order_by().values_list('category', flat=True).distinct():
+        category = categories.get(' '.join(name.split()).lower())
+        if category is not None:
+            Product.objects.filter(category=name).update(category_ref=category, category=category.name)
+
+    totals = (Product.objects
+              .values('category_ref')
+              .annotate(count=Count('id'), value=Sum(F('cost_price') * F('stock_qty'))))
+    for row in totals:
+        if row['category_ref'] is not None:
+            Category.objects.filter(pk=row['category_ref']).update(
+                product_count=row['count'],
+                stock_value=row['value'] or 0,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_product_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True)),
+                ('name', models.CharField(max_length=100)),
+                ('product_count', models.PositiveIntegerField(default=0)),
+                ('stock_value', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('modified_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Category',
+                'verbose_name_plural': 'Categories',
+                'db_table': 'products_category',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='category_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='products', to='products.category'),
+        ),
+        migrations.RunPython(link_categories, migrations.RunPython.noop),
+    ]
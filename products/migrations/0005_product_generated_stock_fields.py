@@ -0,0 +1,41 @@
+# Generated by Django 5.1.2 on 2026-10-18 06:03
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+import django.db.models.functions.math
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_category'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='reorder_threshold',
+            field=models.PositiveIntegerField(default=10, help_text='Stock at or below this quantity counts as low stock'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='stock_status',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(stock_qty=0, then=models.Value('OUT_OF_STOCK')), models.When(stock_qty__lte=models.F('reorder_threshold'), then=models.Value('LOW_STOCK')), default=models.Value('IN_STOCK')), output_field=models.CharField(max_length=20)),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='profit_margin',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(models.Q(('cost_price__gt', 0)), then=django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('selling_price'), '-', models.F('cost_price')), '*', models.Value(100)), '/', django.db.models.functions.comparison.Cast('cost_price', models.FloatField())), 2)), default=models.Value(0.0), output_field=models.FloatField()), output_field=models.DecimalField(decimal_places=2, max_digits=12)),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['stock_status', 'stock_qty'], name='products_pr_stock_s_73f56a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['profit_margin'], name='products_pr_profit__3766c6_idx'),
+        ),
+    ]
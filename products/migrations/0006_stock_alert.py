@@ -0,0 +1,59 @@
+# Generated by Django 5.1.2 on 2026-10-18 06:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def open_alerts(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    StockAlert = apps.get_model('products', 'StockAlert')
+
+    products = (Product.objects
+                .filter(stock_status__in=['LOW_STOCK', 'OUT_OF_STOCK'])
+                .order_by('id')
+                .values_list('id', 'sku', 'name', 'stock_status', 'stock_qty', 'reorder_threshold'))
+    StockAlert.objects.bulk_create(
+        (StockAlert(
+            product_id=product_id,
+            product_sku=sku,
+            product_name=name,
+            status=status,
+            stock_qty=stock_qty,
+            reorder_threshold=reorder_threshold,
+        ) for product_id, sku, name, status, stock_qty, reorder_threshold in products.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_generated_stock_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_name', models.CharField(max_length=255)),
+                ('product_sku', models.CharField(max_length=100)),
+                ('status', models.CharField(choices=[('LOW_STOCK', 'LOW_STOCK'), ('OUT_OF_STOCK', 'OUT_OF_STOCK')], max_length=20)),
+                ('stock_qty', models.PositiveIntegerField()),
+                ('reorder_threshold', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('notified_at', models.DateTimeField(blank=True, null=True)),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_alerts', to='products.product')),
+            ],
+            options={
+                'verbose_name': 'Stock Alert',
+                'verbose_name_plural': 'Stock Alerts',
+                'db_table': 'products_stock_alert',
+                'ordering': ['-id'],
+                'indexes': [models.Index(condition=models.Q(('resolved_at__isnull', True)), fields=['status', 'stock_qty', 'product'], name='products_alert_open_idx'), models.Index(condition=models.Q(('notified_at__isnull', True)), fields=['id'], name='products_alert_pending_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('resolved_at__isnull', True)), fields=('product',), name='products_stock_alert_one_open_per_product')],
+            },
+        ),
+        migrations.RunPython(open_alerts, migrations.RunPython.noop),
+    ]
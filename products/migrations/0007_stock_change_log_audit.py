@@ -0,0 +1,116 @@
+import django.core.serializers.json
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Concat, Trim
+from django.utils import timezone
+
+
+def snapshot_names(apps, schema_editor):
+    StockChangeLog = apps.get_model('products', 'StockChangeLog')
+    User = apps.get_model('users', 'User')
+    db = schema_editor.connection.alias
+
+    logs = StockChangeLog.objects.using(db)
+    if not logs.exists():
+        return
+
+    def full_name(column):
+        return Subquery(User.objects.using(db)
+                        .filter(pk=OuterRef(column))
+                        .annotate(full_name=Trim(Concat('first_name', Value(' '), 'last_name')))
+                        .values('full_name')[:1])
+
+    logs.exclude(customer_id=None).update(customer_name=Coalesce(full_name('customer_id'), Value('')))
+    logs.exclude(created_by_id=None).update(created_by_name=Coalesce(full_name('created_by_id'), Value('')))
+
+
+def _fk_to_id(name, blank):
+    """Turn the ``name`` foreign key into a plain ``name_id`` column, keeping its data."""
+    return [
+        migrations.AlterField(
+            model_name='stockchangelog',
+            name=name,
+            field=models.BigIntegerField(blank=blank, null=True, db_column=f'{name}_id'),
+        ),
+        migrations.RenameField(
+            model_name='stockchangelog',
+            old_name=name,
+            new_name=f'{name}_id',
+        ),
+        migrations.AlterField(
+            model_name='stockchangelog',
+            name=f'{name}_id',
+            field=models.BigIntegerField(blank=blank, null=True),
+        ),
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_stock_alert'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockChangeLogOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payload', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'products_stock_change_log_outbox',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='stockchangelog',
+            name='products_st_product_611b75_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='stockchangelog',
+            name='products_st_custome_ebf8ff_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='stockchangelog',
+            name='products_st_created_091563_idx',
+        ),
+        *_fk_to_id('product', blank=True),
+        *_fk_to_id('customer', blank=True),
+        *_fk_to_id('created_by', blank=True),
+        migrations.AddField(
+            model_name='stockchangelog',
+            name='customer_name',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='stockchangelog',
+            name='created_by_name',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='stockchangelog',
+            name='outbox_id',
+            field=models.BigIntegerField(blank=True, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='stockchangelog',
+            name='created_at',
+            field=models.DateTimeField(default=timezone.now),
+        ),
+        migrations.RunPython(snapshot_names, migrations.RunPython.noop, hints={'model_name': 'stockchangelog'}),
+        migrations.AddIndex(
+            model_name='stockchangelog',
+            index=models.Index(fields=['product_id', '-created_at'], name='products_log_product_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockchangelog',
+            index=models.Index(fields=['customer_id'], name='products_log_customer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockchangelog',
+            index=models.Index(fields=['created_by_id'], name='products_log_created_by_idx'),
+        ),
+    ]
@@ -1,8 +1,47 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.db.models.functions import Cast, Round
+from django.utils import timezone
 
 from common.models import BaseModel
-from products.constants import OUT_OF_STOCK, LOW_STOCK, IN_STOCK, LOW_STOCK_THRESHOLD
-from products.querysets import ProductManager
+from products.constants import (
+    OUT_OF_STOCK,
+    LOW_STOCK,
+    IN_STOCK,
+    LOW_STOCK_THRESHOLD,
+    PRODUCT_SEARCH_TABLE,
+    STOCK_ALERT_STATUS_CHOICES,
+)
+from products.querysets import CategoryManager, ProductManager, StockAlertManager
+
+
+def get_stock_status(stock_qty, threshold=LOW_STOCK_THRESHOLD):
+    if stock_qty == 0:
+        return OUT_OF_STOCK
+    if stock_qty <= threshold:
+        return LOW_STOCK
+    return IN_STOCK
+
+
+class Category(models.Model):
+    key = models.CharField(max_length=100, unique=True)
+    name = models.CharField(max_length=100)
+    product_count = models.PositiveIntegerField(default=0)
+    stock_value = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    modified_at = models.DateTimeField(auto_now=True)
+
+    objects = CategoryManager()
+
+    class Meta:
+        db_table = 'products_category'
+        verbose_name = 'Category'
+        verbose_name_plural = 'Categories'
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
 
 
 class Product(BaseModel):
@@ -13,9 +52,44 @@ class Product(BaseModel):
     )
     name = models.CharField(max_length=255)
     category = models.CharField(max_length=100)
+    category_ref = models.ForeignKey(
+        Category,
+        on_delete=models.PROTECT,
+        related_name='products',
+        null=True,
+        blank=True,
+    )
     cost_price = models.DecimalField(max_digits=10, decimal_places=2)
     selling_price = models.DecimalField(max_digits=10, decimal_places=2)
     stock_qty = models.PositiveIntegerField()
+    reorder_threshold = models.PositiveIntegerField(
+        default=LOW_STOCK_THRESHOLD,
+        help_text='Stock at or below this quantity counts as low stock'
+    )
+    stock_status = models.GeneratedField(
+        expression=Case(
+            When(stock_qty=0, then=Value(OUT_OF_STOCK)),
+            When(stock_qty__lte=F('reorder_threshold'), then=Value(LOW_STOCK)),
+            default=Value(IN_STOCK),
+        ),
+        output_field=models.CharField(max_length=20),
+        db_persist=True,
+    )
+    profit_margin = models.GeneratedField(
+        expression=Case(
+            When(
+                Q(cost_price__gt=0),
+                then=Round(
+                    (F('selling_price') - F('cost_price')) * 100 / Cast('cost_price', FloatField()),
+                    2,
+                ),
+            ),
+            default=Value(0.0),
+            output_field=FloatField(),
+        ),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        db_persist=True,
+    )
     image = models.ImageField(
         upload_to='products/images/',
         null=True,
@@ -33,41 +107,62 @@ class Product(BaseModel):
             models.Index(fields=['sku']),
             models.Index(fields=['category']),
             models.Index(fields=['stock_qty']),
+            models.Index(fields=['stock_status', 'stock_qty']),
+            models.Index(fields=['profit_margin']),
         ]
 
     def __str__(self):
         return f"{self.name} ({self.sku}) [ID: {self.pk}]"
 
-    @property
-    def stock_status(self):
-        if self.stock_qty == 0:
-            return OUT_OF_STOCK
-        if self.stock_qty <= LOW_STOCK_THRESHOLD:
-            return LOW_STOCK
-        return IN_STOCK
 
-    @property
-    def profit_margin(self):
-        if self.cost_price > 0:
-            return ((self.selling_price - self.cost_price) / self.cost_price) * 100
-        return 0
+class ProductSearchEntry(models.Model):
+    """
+    A row of the FTS5 product search index. The table is created by a
+    migration on SQLite only and written through ``products.search``; the
+    model exists so product queries can join it.
+    """
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        db_constraint=False,
+        related_name='search_entry',
+    )
+    sku = models.TextField()
+    name = models.TextField()
+    category = models.TextField()
+
+    class Meta:
+        managed = False
+        db_table = PRODUCT_SEARCH_TABLE
 
 
 class StockChangeLog(models.Model):
-    product = models.ForeignKey(Product, on_delete=models.SET_NULL, related_name='stock_change_logs', null=True, blank=True)
+    """
+    Audit trail of stock changes. Products and users are referenced by plain
+    ids with snapshots of their names, so the table can live in its own
+    audit database (``STOCK_LOG_DATABASE``) and outlives the rows it records.
+    """
+    product_id = models.BigIntegerField(null=True, blank=True)
     product_name = models.CharField(max_length=255)
     product_category = models.CharField(max_length=100)
     product_sku = models.CharField(max_length=100)
 
-    customer = models.ForeignKey('users.User', on_delete=models.PROTECT, related_name='stock_change_logs',null=True, blank=True)
+    customer_id = models.BigIntegerField(null=True, blank=True)
+    customer_name = models.CharField(max_length=255, blank=True, default='')
 
     previous_qty = models.PositiveIntegerField()
     new_qty = models.PositiveIntegerField()
 
     change_reason = models.CharField(max_length=255)
 
-    created_at = models.DateTimeField(auto_now_add=True)
-    created_by = models.ForeignKey('users.User', on_delete=models.PROTECT, related_name='created_stock_change_logs')
+    created_at = models.DateTimeField(default=timezone.now)
+    created_by_id = models.BigIntegerField(null=True, blank=True)
+    created_by_name = models.CharField(max_length=255, blank=True, default='')
+
+    # Id of the outbox entry this log was relayed from; makes relaying idempotent.
+    outbox_id = models.BigIntegerField(null=True, blank=True, unique=True)
 
     class Meta:
         db_table = 'products_stock_change_log'
@@ -75,14 +170,79 @@ class StockChangeLog(models.Model):
         verbose_name_plural = 'Stock Change Logs'
         ordering = ['-id']
         indexes = [
-            models.Index(fields=['product', '-created_at']),
-            models.Index(fields=['customer']),
-            models.Index(fields=['created_by']),
+            models.Index(fields=['product_id', '-created_at'], name='products_log_product_idx'),
+            models.Index(fields=['customer_id'], name='products_log_customer_idx'),
+            models.Index(fields=['created_by_id'], name='products_log_created_by_idx'),
         ]
 
     def __str__(self):
-        return f"Stock change for {self.product_sku} at {self.created_at} by {self.created_by.get_full_name()} for reason: {self.change_reason}"
+        return f"Stock change for {self.product_sku} at {self.created_at} by {self.created_by_name} for reason: {self.change_reason}"
 
     @property
     def quantity_change(self):
         return self.new_qty - self.previous_qty
+
+
+class StockChangeLogOutbox(models.Model):
+    """
+    Stock change logs written in the same transaction as the stock change,
+    waiting to be relayed to a separate audit database. See products.audit.
+    """
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'products_stock_change_log_outbox'
+        ordering = ['id']
+
+
+class StockAlert(models.Model):
+    """
+    A product crossing below its reorder threshold. ``ProductService`` opens
+    an alert when a product's stock status becomes low or out of stock and
+    resolves it when the status changes again, so open alerts are exactly the
+    products that need restocking. ``notified_at`` marks alerts that a
+    notification consumer has picked up.
+    """
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, related_name='stock_alerts', null=True, blank=True)
+    product_name = models.CharField(max_length=255)
+    product_sku = models.CharField(max_length=100)
+
+    status = models.CharField(max_length=20, choices=STOCK_ALERT_STATUS_CHOICES)
+    stock_qty = models.PositiveIntegerField()
+    reorder_threshold = models.PositiveIntegerField()
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+    notified_at = models.DateTimeField(null=True, blank=True)
+
+    objects = StockAlertManager()
+
+    class Meta:
+        db_table = 'products_stock_alert'
+        verbose_name = 'Stock Alert'
+        verbose_name_plural = 'Stock Alerts'
+        ordering = ['-id']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product'],
+                condition=Q(resolved_at__isnull=True),
+                name='products_stock_alert_one_open_per_product',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['status', 'stock_qty', 'product'],
+                condition=Q(resolved_at__isnull=True),
+                name='products_alert_open_idx',
+            ),
+            models.Index(
+                fields=['id'],
+                condition=Q(notified_at__isnull=True),
+                name='products_alert_pending_idx',
+            ),
+        ]
+
+    def __str__(self):
+        state = 'resolved' if self.resolved_at else 'open'
+        return f"{self.status} alert for {self.product_sku} at {self.stock_qty} ({state})"
@@ -1,5 +1,10 @@
 from django.db import models
-from products.constants import LOW_STOCK_THRESHOLD
+from products.constants import LOW_STOCK, OUT_OF_STOCK
+
+
+def category_key(name):
+    """Canonical form of a category name: trimmed, single-spaced, lowercase."""
+    return ' '.join(name.split()).lower()
 
 
 class ProductQuerySet(models.QuerySet):
@@ -8,14 +13,17 @@ class ProductQuerySet(models.QuerySet):
         return self.filter(stock_qty__gt=0)
 
     def out_of_stock(self):
-        return self.filter(stock_qty=0)
+        return self.filter(stock_status=OUT_OF_STOCK)
 
-    def low_stock(self, threshold=LOW_STOCK_THRESHOLD):
-        return self.filter(stock_qty__lte=threshold, stock_qty__gt=0)
+    def low_stock(self, threshold=None):
+        """Products at or below their own reorder threshold, or below ``threshold`` when given."""
+        if threshold is not None:
+            return self.filter(stock_qty__lte=threshold, stock_qty__gt=0)
+        return self.filter(stock_status=LOW_STOCK)
 
     def by_category(self, category):
         if category:
-            return self.filter(category__iexact=category)
+            return self.filter(category_ref__key=category_key(category))
         return self
 
 
@@ -30,6 +38,33 @@ class ProductManager(models.Manager):
     def out_of_stock(self):
         return self.get_queryset().out_of_stock()
 
-    def low_stock(self, threshold=LOW_STOCK_THRESHOLD):
+    def low_stock(self, threshold=None):
         return self.get_queryset().low_stock(threshold)
 
+
+class StockAlertQuerySet(models.QuerySet):
+
+    def open(self):
+        return self.filter(resolved_at__isnull=True)
+
+    def pending(self):
+        """Alerts no notification consumer has acknowledged yet."""
+        return self.filter(notified_at__isnull=True)
+
+
+class StockAlertManager(models.Manager):
+
+    def get_queryset(self):
+        return StockAlertQuerySet(self.model, using=self._db)
+
+    def open(self):
+        return self.get_queryset().open()
+
+    def pending(self):
+        return self.get_queryset().pending()
+
+
+class CategoryManager(models.Manager):
+
+    def get_by_name(self, name):
+        return self.filter(key=category_key(name)).first()
@@ -0,0 +1,82 @@
+"""
+Full-text product search backed by an SQLite FTS5 table.
+
+``products_product_search`` holds one row per product, keyed by the product
+id as its rowid, with the ``sku``, ``name`` and ``category`` columns tokenized
+so that hyphens and underscores stay inside a token (``SKU-001`` is one
+term). ``ProductService`` keeps it in step with every product write; the
+``rebuild_product_search`` command repopulates it after bulk loads that
+bypass the service.
+
+On databases without FTS5 the table does not exist and callers fall back to
+the plain ``icontains`` search.
+"""
+from django.db import connection
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+from products.constants import PRODUCT_SEARCH_TABLE
+
+_available = {}
+
+
+def is_available() -> bool:
+    if connection.vendor != 'sqlite':
+        return False
+    if connection.alias not in _available:
+        _available[connection.alias] = PRODUCT_SEARCH_TABLE in connection.introspection.table_names()
+    return _available[connection.alias]
+
+
+def match_expression(terms) -> str:
+    """Quote each term and make it a prefix query, so ``lap gam`` matches ``Gaming Laptop``."""
+    return ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms if term.strip('"'))
+
+
+def search(queryset, terms):
+    """
+    Restrict ``queryset`` to products matching every term and annotate
+    ``search_rank`` (BM25, lower is better; SKU hits weigh most).
+
+    The index is joined rather than probed per product, so SQLite drives the
+    query from the full-text match and ranks each hit once.
+    """
+    table = connection.ops.quote_name(PRODUCT_SEARCH_TABLE)
+    return (queryset
+            .filter(
+                RawSQL(f"{table} MATCH %s", (match_expression(terms),), output_field=BooleanField()),
+                search_entry__isnull=False,
+            )
+            .annotate(search_rank=RawSQL(f"{table}.rank", (), output_field=FloatField())))
+
+
+def index_products(products) -> None:
+    if not is_available():
+        return
+    rows = [(product.pk, product.sku, product.name, product.category) for product in products]
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {PRODUCT_SEARCH_TABLE} WHERE rowid = %s", [(row[0],) for row in rows])
+        cursor.executemany(
+            f"INSERT INTO {PRODUCT_SEARCH_TABLE} (rowid, sku, name, category) VALUES (%s, %s, %s, %s)",
+            rows,
+        )
+
+
+def remove_products(product_ids) -> None:
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {PRODUCT_SEARCH_TABLE} WHERE rowid = %s", [(pk,) for pk in product_ids])
+
+
+def rebuild() -> int:
+    """Repopulate the index from ``products_product`` and return the number of indexed products."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {PRODUCT_SEARCH_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {PRODUCT_SEARCH_TABLE} (rowid, sku, name, category) "
+            f"SELECT id, sku, name, category FROM products_product"
+        )
+        cursor.execute(f"INSERT INTO {PRODUCT_SEARCH_TABLE} ({PRODUCT_SEARCH_TABLE}) VALUES ('optimize')")
+        cursor.execute(f"SELECT COUNT(*) FROM {PRODUCT_SEARCH_TABLE}")
+        return cursor.fetchone()[0]
@@ -1,8 +1,9 @@
 from decimal import Decimal
 
 from rest_framework import serializers
+from products.constants import AUTOCOMPLETE_DEFAULT_LIMIT, AUTOCOMPLETE_MAX_LIMIT, STOCK_ALERT_ACKNOWLEDGE_MAX_IDS
 from products.models import Product
-from products.services import ProductService
+from products.services import ProductService, StockAlertService
 
 
 class ProductListSerializer(serializers.Serializer):
@@ -11,16 +12,18 @@ class ProductListSerializer(serializers.Serializer):
     sku = serializers.CharField(read_only=True)
     name = serializers.CharField(read_only=True)
     category = serializers.CharField(read_only=True)
+    category_id = serializers.IntegerField(source='category_ref_id', read_only=True, allow_null=True)
     cost_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     selling_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     stock_qty = serializers.IntegerField(read_only=True)
+    reorder_threshold = serializers.IntegerField(read_only=True)
     image = serializers.ImageField(read_only=True, allow_null=True)
-    stock_status = serializers.CharField()
+    stock_status = serializers.CharField(read_only=True)
     profit_margin = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     created_at = serializers.DateTimeField(read_only=True)
     modified_at = serializers.DateTimeField(read_only=True)
-    created_by = serializers.IntegerField(source='created_by.full_name', read_only=True)
-    modified_by = serializers.IntegerField(source='modified_by.full_name', read_only=True)
+    created_by = serializers.CharField(source='created_by.get_full_name', read_only=True, allow_null=True)
+    modified_by = serializers.CharField(source='modified_by.get_full_name', read_only=True, allow_null=True)
 
 def validate_product_prices(selling_price, cost_price):
     if selling_price < cost_price:
@@ -34,6 +37,7 @@ class ProductCreateSerializer(serializers.Serializer):
     cost_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal(0.01))
     selling_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal(0.01))
     stock_qty = serializers.IntegerField(min_value=0)
+    reorder_threshold = serializers.IntegerField(min_value=0, required=False)
     image = serializers.ImageField(required=False, allow_null=True)
 
     created_by = serializers.HiddenField(default=serializers.CurrentUserDefault())
@@ -67,16 +71,18 @@ class ProductRetrieveSerializer(serializers.Serializer):
     sku = serializers.CharField(read_only=True)
     name = serializers.CharField(read_only=True)
     category = serializers.CharField(read_only=True)
+    category_id = serializers.IntegerField(source='category_ref_id', read_only=True, allow_null=True)
     cost_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     selling_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     stock_qty = serializers.IntegerField(read_only=True)
+    reorder_threshold = serializers.IntegerField(read_only=True)
     image = serializers.ImageField(read_only=True, allow_null=True)
     profit_margin = serializers.CharField(read_only=True)
     stock_status = serializers.CharField(read_only=True)
     created_at = serializers.DateTimeField(read_only=True)
     modified_at = serializers.DateTimeField(read_only=True)
-    created_by= serializers.CharField(source='created_by.get_full_name')
-    modified_by= serializers.CharField(source='modified_by.get_full_name')
+    created_by = serializers.CharField(source='created_by.get_full_name', read_only=True, allow_null=True)
+    modified_by = serializers.CharField(source='modified_by.get_full_name', read_only=True, allow_null=True)
 
 
 
@@ -86,10 +92,15 @@ class ProductUpdateSerializer(serializers.Serializer):
     cost_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal(0.01), required=False)
     selling_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal(0.01), required=False)
     stock_qty = serializers.IntegerField(min_value=0, required=False)
+    reorder_threshold = serializers.IntegerField(min_value=0, required=False)
     image = serializers.ImageField(required=False, allow_null=True)
 
     def validate(self, attrs):
-        validate_product_prices(attrs['selling_price'], attrs['cost_price'])
+        # Partial updates compare against the stored price they leave unchanged.
+        validate_product_prices(
+            attrs.get('selling_price', self.instance.selling_price),
+            attrs.get('cost_price', self.instance.cost_price),
+        )
         return attrs
 
     def update(self, instance, validated_data):
@@ -113,9 +124,61 @@ class StockChangeLogListSerializer(serializers.Serializer):
     change_reason = serializers.CharField(read_only=True)
     created_at = serializers.DateTimeField(read_only=True)
 
-    created_by = serializers.CharField(source='created_by.get_full_name', read_only=True)
-    customer = serializers.CharField(source='customer.get_full_name',read_only=True,allow_null=True)
+    created_by = serializers.CharField(source='created_by_name', read_only=True)
+    customer = serializers.SerializerMethodField()
+
+    def get_customer(self, obj):
+        return obj.customer_name if obj.customer_id else None
+
+
+class ProductAutocompleteQuerySerializer(serializers.Serializer):
+
+    q = serializers.CharField(max_length=100)
+    limit = serializers.IntegerField(
+        default=AUTOCOMPLETE_DEFAULT_LIMIT,
+        min_value=1,
+        max_value=AUTOCOMPLETE_MAX_LIMIT,
+    )
+
 
+class ProductAutocompleteSerializer(serializers.Serializer):
 
+    id = serializers.IntegerField(read_only=True)
+    sku = serializers.CharField(read_only=True)
+    name = serializers.CharField(read_only=True)
+    selling_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
 
 
+class CategoryListSerializer(serializers.Serializer):
+
+    id = serializers.IntegerField(read_only=True)
+    key = serializers.CharField(read_only=True)
+    name = serializers.CharField(read_only=True)
+    product_count = serializers.IntegerField(read_only=True)
+    stock_value = serializers.DecimalField(max_digits=16, decimal_places=2, read_only=True)
+
+
+class StockAlertListSerializer(serializers.Serializer):
+
+    id = serializers.IntegerField(read_only=True)
+    product_id = serializers.IntegerField(read_only=True, allow_null=True)
+    product_sku = serializers.CharField(read_only=True)
+    product_name = serializers.CharField(read_only=True)
+    status = serializers.CharField(read_only=True)
+    stock_qty = serializers.IntegerField(read_only=True)
+    reorder_threshold = serializers.IntegerField(read_only=True)
+    created_at = serializers.DateTimeField(read_only=True)
+    resolved_at = serializers.DateTimeField(read_only=True, allow_null=True)
+    notified_at = serializers.DateTimeField(read_only=True, allow_null=True)
+
+
+class StockAlertAcknowledgeSerializer(serializers.Serializer):
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=STOCK_ALERT_ACKNOWLEDGE_MAX_IDS,
+    )
+
+    def create(self, validated_data):
+        return {'acknowledged': StockAlertService.acknowledge(validated_data['ids'])}
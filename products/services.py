@@ -1,11 +1,194 @@
+from collections import defaultdict
+from decimal import Decimal
+from typing import NamedTuple, Optional
+
 from django.db import transaction
-from products.models import Product, StockChangeLog
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Q, Sum, When
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
 
+from common.cache import bump_namespaces
+from common.constants import CACHE_NAMESPACE_PRODUCTS
+from common.db import writer_lane
+from common.metrics import instrument_service
+from common.services import DashboardCounterService
+from products import search
+from products.audit import save_stock_logs
+from products.autocomplete import product_autocomplete
+from products.constants import IN_STOCK, LOW_STOCK, LOW_STOCK_THRESHOLD, OUT_OF_STOCK, PRICE_BANDS
+from products.models import Category, Product, StockAlert, StockChangeLog, get_stock_status
+from products.querysets import category_key
 
-class ProductService:
+
+class StockMovement(NamedTuple):
+    product_id: int
+    delta: int
+    reason: str
+    customer_id: Optional[int] = None
+    customer_name: str = ''
+
+
+def stock_value(cost_price, stock_qty) -> Decimal:
+    return Decimal(str(cost_price)) * stock_qty
+
+
+class CategoryService:
+
+    @staticmethod
+    def get_or_create(name: str) -> Category:
+        key = category_key(name)
+        if not key:
+            raise ValidationError({"category": "Category must not be blank."}, code="invalid_category")
+
+        category, _ = Category.objects.get_or_create(key=key, defaults={'name': ' '.join(name.split())})
+        return category
+
+    @staticmethod
+    def adjust(deltas) -> None:
+        """
+        Apply ``{category_id: (product_count_delta, stock_value_delta)}`` to
+        the stored totals with one UPDATE. Products without a category row
+        (``None``) are skipped until ``sync`` links them.
+        """
+        deltas = {
+            category_id: delta
+            for category_id, delta in deltas.items()
+            if category_id is not None and any(delta)
+        }
+        if not deltas:
+            return
+
+        Category.objects.filter(pk__in=deltas).update(
+            product_count=Case(
+                *[When(pk=category_id, then=F('product_count') + count)
+                  for category_id, (count, _) in deltas.items()],
+                default=F('product_count'),
+                output_field=IntegerField(),
+            ),
+            stock_value=Case(
+                *[When(pk=category_id, then=F('stock_value') + value)
+                  for category_id, (_, value) in deltas.items()],
+                default=F('stock_value'),
+                output_field=DecimalField(max_digits=16, decimal_places=2),
+            ),
+            modified_at=timezone.now(),
+        )
 
     @staticmethod
     @transaction.atomic
+    def sync() -> int:
+        """
+        Link products that have no category row yet, then recompute every
+        category's totals from the products table. Returns the number of
+        products linked.
+        """
+        linked = 0
+        names = (Product.objects
+                 .filter(category_ref__isnull=True)
+                 .order_by()
+                 .values_list('category', flat=True)
+                 .distinct())
+        for name in list(names):
+            category = CategoryService.get_or_create(name)
+            linked += (Product.objects
+                       .filter(category_ref__isnull=True, category=name)
+                       .update(category_ref=category, category=category.name))
+
+        totals = {
+            row['category_ref']: row
+            for row in (Product.objects
+                        .values('category_ref')
+                        .annotate(count=Count('id'), value=Sum(F('cost_price') * F('stock_qty'))))
+        }
+        categories = list(Category.objects.all())
+        for category in categories:
+            row = totals.get(category.pk, {})
+            category.product_count = row.get('count', 0)
+            category.stock_value = row.get('value') or 0
+        Category.objects.bulk_update(categories, ['product_count', 'stock_value'])
+
+        return linked
+
+
+class StockAlertService:
+
+    @staticmethod
+    def record(changes) -> None:
+        """
+        Keep each changed product's open alert in step with its stock status.
+
+        ``changes`` yields ``(product, old_status, new_status)`` with the
+        product already carrying its new ``stock_qty``; ``None`` means the
+        product did not exist before, or is about to be deleted. Only a
+        status change resolves or opens an alert; a product staying low or
+        out of stock just has its open alert's quantity refreshed. Nothing
+        is queried for products that stay in stock.
+        """
+        resolved_ids, opened, refreshed = [], [], {}
+        for product, old_status, new_status in changes:
+            if old_status == new_status:
+                if new_status in (LOW_STOCK, OUT_OF_STOCK):
+                    refreshed[product.pk] = product.stock_qty
+                continue
+            if old_status in (LOW_STOCK, OUT_OF_STOCK):
+                resolved_ids.append(product.pk)
+            if new_status in (LOW_STOCK, OUT_OF_STOCK):
+                opened.append(StockAlert(
+                    product=product,
+                    product_name=product.name,
+                    product_sku=product.sku,
+                    status=new_status,
+                    stock_qty=product.stock_qty,
+                    reorder_threshold=product.reorder_threshold,
+                ))
+
+        if resolved_ids:
+            StockAlert.objects.open().filter(product__in=resolved_ids).update(resolved_at=timezone.now())
+        if opened:
+            StockAlert.objects.bulk_create(opened)
+        if refreshed:
+            StockAlert.objects.open().filter(product__in=refreshed).update(stock_qty=Case(
+                *[When(product=product_id, then=qty) for product_id, qty in refreshed.items()],
+                output_field=IntegerField(),
+            ))
+
+    @staticmethod
+    def acknowledge(alert_ids) -> int:
+        """Mark alerts as picked up by a notification consumer and return how many were pending."""
+        return StockAlert.objects.pending().filter(pk__in=alert_ids).update(notified_at=timezone.now())
+
+    @staticmethod
+    @transaction.atomic
+    def sync() -> int:
+        """
+        Rebuild open alerts from the products' current stock status, for
+        stock written without going through ``ProductService``. Returns the
+        number of open alerts afterwards.
+        """
+        StockAlert.objects.open().update(resolved_at=timezone.now())
+        products = (Product.objects
+                    .filter(stock_status__in=[LOW_STOCK, OUT_OF_STOCK])
+                    .only('id', 'sku', 'name', 'stock_qty', 'reorder_threshold', 'stock_status')
+                    .order_by('pk'))
+        StockAlert.objects.bulk_create(
+            (StockAlert(
+                product=product,
+                product_name=product.name,
+                product_sku=product.sku,
+                status=product.stock_status,
+                stock_qty=product.stock_qty,
+                reorder_threshold=product.reorder_threshold,
+            ) for product in products.iterator()),
+            batch_size=1000,
+        )
+        return StockAlert.objects.open().count()
+
+
+@instrument_service
+class ProductService:
+
+    @staticmethod
+    @writer_lane()
     def create_new_product(
         sku: str,
         name: str,
@@ -15,16 +198,21 @@ class ProductService:
         stock_qty: int,
         image,
         created_by,
-        modified_by
+        modified_by,
+        reorder_threshold: int = LOW_STOCK_THRESHOLD
     ) -> Product:
 
+        category = CategoryService.get_or_create(category)
+
         product = Product.objects.create(
             sku=sku,
             name=name,
-            category=category,
+            category=category.name,
+            category_ref=category,
             cost_price=cost_price,
             selling_price=selling_price,
             stock_qty=stock_qty,
+            reorder_threshold=reorder_threshold,
             image=image,
             created_by=created_by,
             modified_by=modified_by
@@ -38,14 +226,28 @@ class ProductService:
             created_by=created_by,
             reason="Initial stock on product creation"
         )
+        status = get_stock_status(stock_qty, reorder_threshold)
+        DashboardCounterService.adjust_for_stock_changes([(None, status)])
+        StockAlertService.record([(product, None, status)])
+        CategoryService.adjust({category.pk: (1, stock_value(cost_price, stock_qty))})
+        search.index_products([product])
+        product_autocomplete.on_commit(products=[product])
+        bump_namespaces(CACHE_NAMESPACE_PRODUCTS)
 
         return product
 
     @staticmethod
-    @transaction.atomic
+    @writer_lane()
     def update_product(instance: Product, validated_data: dict, user) -> Product:
-        old_stock_qty = instance.stock_qty
-        new_stock_qty = validated_data.get('stock_qty', old_stock_qty)
+        old_stock_qty, old_threshold = instance.stock_qty, instance.reorder_threshold
+        # Stock goes through update_stock so the change is logged and counted.
+        validated_data = dict(validated_data)
+        new_stock_qty = validated_data.pop('stock_qty', old_stock_qty)
+        old_category_id, old_cost_price = instance.category_ref_id, instance.cost_price
+
+        if 'category' in validated_data:
+            instance.category_ref = CategoryService.get_or_create(validated_data['category'])
+            validated_data['category'] = instance.category_ref.name
 
         # Update fields
         instance.modified_by = user
@@ -54,6 +256,23 @@ class ProductService:
 
         instance.save()
 
+        if instance.category_ref_id != old_category_id or instance.cost_price != old_cost_price:
+            moved = int(instance.category_ref_id != old_category_id)
+            deltas = defaultdict(lambda: [0, Decimal(0)])
+            deltas[old_category_id][0] -= moved
+            deltas[old_category_id][1] -= stock_value(old_cost_price, old_stock_qty)
+            deltas[instance.category_ref_id][0] += moved
+            deltas[instance.category_ref_id][1] += stock_value(instance.cost_price, old_stock_qty)
+            CategoryService.adjust(deltas)
+
+        if instance.reorder_threshold != old_threshold:
+            transition = (
+                get_stock_status(old_stock_qty, old_threshold),
+                get_stock_status(old_stock_qty, instance.reorder_threshold),
+            )
+            DashboardCounterService.adjust_for_stock_changes([transition])
+            StockAlertService.record([(instance, *transition)])
+
         # Handle stock change if stock quantity changed
         if old_stock_qty != new_stock_qty:
             ProductService.update_stock(
@@ -62,11 +281,20 @@ class ProductService:
                 user=user,
                 reason=f"Stock updated by {user.get_full_name()}"
             )
+            instance.stock_qty = new_stock_qty
+
+        if validated_data.keys() & {'sku', 'name', 'category'}:
+            search.index_products([instance])
+        if validated_data.keys() & {'sku', 'name', 'selling_price'}:
+            product_autocomplete.on_commit(products=[instance])
 
+        # Generated columns are computed by the database on save.
+        instance.refresh_from_db(fields=['stock_status', 'profit_margin'])
+        bump_namespaces(CACHE_NAMESPACE_PRODUCTS)
         return instance
 
     @staticmethod
-    @transaction.atomic
+    @writer_lane()
     def delete_product(instance: Product, user) -> None:
         if instance.stock_qty > 0:
             ProductService._log_stock_change(
@@ -77,10 +305,17 @@ class ProductService:
                 reason=f"Product deleted by {user.get_full_name()}"
             )
 
+        status = get_stock_status(instance.stock_qty, instance.reorder_threshold)
+        DashboardCounterService.adjust_for_stock_changes([(status, None)])
+        StockAlertService.record([(instance, status, None)])
+        CategoryService.adjust({instance.category_ref_id: (-1, -stock_value(instance.cost_price, instance.stock_qty))})
+        search.remove_products([instance.pk])
+        product_autocomplete.on_commit(removed_ids=[instance.pk])
         instance.delete()
+        bump_namespaces(CACHE_NAMESPACE_PRODUCTS)
 
     @staticmethod
-    @transaction.atomic
+    @writer_lane()
     def update_stock(
         product: Product,
         new_qty: int,
@@ -98,6 +333,15 @@ class ProductService:
         product.stock_qty = new_qty
         product.save(update_fields=['stock_qty', 'modified_at'])
 
+        transition = (
+            get_stock_status(previous_qty, product.reorder_threshold),
+            get_stock_status(new_qty, product.reorder_threshold),
+        )
+        DashboardCounterService.adjust_for_stock_changes([transition])
+        StockAlertService.record([(product, *transition)])
+        CategoryService.adjust({product.category_ref_id: (0, stock_value(product.cost_price, new_qty - previous_qty))})
+        bump_namespaces(CACHE_NAMESPACE_PRODUCTS)
+
         # Log stock change
         return ProductService._log_stock_change(
             product=product,
@@ -108,6 +352,173 @@ class ProductService:
             reason=reason
         )
 
+    @staticmethod
+    def lock_products(product_ids) -> dict:
+        """
+        Lock the given products in ascending id order, so that concurrent
+        callers touching overlapping products always queue in the same order
+        instead of deadlocking.
+        """
+        products = (Product.objects
+                    .select_for_update()
+                    .filter(pk__in=product_ids)
+                    .only('id', 'sku', 'name', 'category', 'category_ref', 'cost_price', 'stock_qty', 'reorder_threshold')
+                    .order_by('pk'))
+        return {product.pk: product for product in products}
+
+    @staticmethod
+    @writer_lane()
+    def apply_stock_movements(movements, user, locked_products=None) -> list[StockChangeLog]:
+        """
+        Apply many relative stock changes with a fixed number of queries: one
+        locking read, one conditional UPDATE for all products and one bulk
+        insert for the stock logs, however many movements there are.
+
+        Decrements only apply where ``stock_qty >= n``; if fewer rows than
+        expected are updated, some product would have been oversold and the
+        whole transaction is rolled back.
+        """
+        if not movements:
+            return []
+
+        deltas = defaultdict(int)
+        for movement in movements:
+            deltas[movement.product_id] += movement.delta
+
+        if locked_products is None:
+            locked_products = ProductService.lock_products(deltas.keys())
+
+        missing_ids = set(deltas) - set(locked_products)
+        if missing_ids:
+            raise ValidationError(
+                {"stock": f"Products with IDs {sorted(missing_ids)} not found."},
+                code="product_not_found"
+            )
+
+        changed = {product_id: delta for product_id, delta in sorted(deltas.items()) if delta}
+        if changed:
+            condition = Q()
+            for product_id, delta in changed.items():
+                if delta < 0:
+                    condition |= Q(pk=product_id, stock_qty__gte=-delta)
+                else:
+                    condition |= Q(pk=product_id)
+
+            updated = Product.objects.filter(condition).update(
+                stock_qty=Case(
+                    *[When(pk=product_id, then=F('stock_qty') + delta) for product_id, delta in changed.items()],
+                    default=F('stock_qty'),
+                    output_field=IntegerField(),
+                ),
+                modified_at=timezone.now(),
+            )
+
+            if updated != len(changed):
+                # The UPDATE already took stock from the products that had
+                # enough, so judge by the quantities read under the lock.
+                oversold = [
+                    locked_products[product_id]
+                    for product_id, delta in changed.items()
+                    if locked_products[product_id].stock_qty + delta < 0
+                ]
+                raise ValidationError(
+                    {"stock": "Insufficient stock for " + "; ".join(
+                        f"{product.name} sku: {product.sku}" for product in oversold
+                    )},
+                    code="insufficient_stock"
+                )
+
+        running_qty = {product_id: product.stock_qty for product_id, product in locked_products.items()}
+        logs = []
+        for movement in movements:
+            product = locked_products[movement.product_id]
+            previous_qty = running_qty[movement.product_id]
+            new_qty = previous_qty + movement.delta
+            running_qty[movement.product_id] = new_qty
+
+            logs.append(StockChangeLog(
+                product_id=product.pk,
+                product_name=product.name,
+                product_category=product.category,
+                product_sku=product.sku,
+                customer_id=movement.customer_id,
+                customer_name=movement.customer_name,
+                previous_qty=previous_qty,
+                new_qty=new_qty,
+                change_reason=movement.reason,
+                created_by_id=user.pk,
+                created_by_name=user.get_full_name()
+            ))
+
+        transitions = {
+            product_id: (
+                get_stock_status(locked_products[product_id].stock_qty, locked_products[product_id].reorder_threshold),
+                get_stock_status(running_qty[product_id], locked_products[product_id].reorder_threshold),
+            )
+            for product_id in changed
+        }
+        DashboardCounterService.adjust_for_stock_changes(transitions.values())
+
+        category_deltas = defaultdict(lambda: [0, Decimal(0)])
+        for product_id, delta in changed.items():
+            product = locked_products[product_id]
+            category_deltas[product.category_ref_id][1] += stock_value(product.cost_price, delta)
+        CategoryService.adjust(category_deltas)
+
+        for product_id, qty in running_qty.items():
+            locked_products[product_id].stock_qty = qty
+        StockAlertService.record(
+            (locked_products[product_id], *transition) for product_id, transition in transitions.items()
+        )
+
+        bump_namespaces(CACHE_NAMESPACE_PRODUCTS)
+
+        return save_stock_logs(logs)
+
+    @staticmethod
+    def facet_counts(queryset) -> dict:
+        """
+        Count ``queryset`` per category, stock status and price band in a
+        single pass: one GROUP BY category with a conditional count for
+        every status and band, summed across categories afterwards.
+        """
+        statuses = {status: Q(stock_status=status) for status in (OUT_OF_STOCK, LOW_STOCK, IN_STOCK)}
+        bands = {}
+        for label, lower, upper in PRICE_BANDS:
+            condition = Q()
+            if lower is not None:
+                condition &= Q(selling_price__gte=lower)
+            if upper is not None:
+                condition &= Q(selling_price__lt=upper)
+            bands[label] = condition
+
+        aggregates = {'total': Count('id')}
+        aggregates.update({f'status_{index}': Count('id', filter=condition)
+                           for index, condition in enumerate(statuses.values())})
+        aggregates.update({f'band_{index}': Count('id', filter=condition)
+                           for index, condition in enumerate(bands.values())})
+
+        rows = list(queryset
+                    .values('category_ref', 'category_ref__name')
+                    .annotate(**aggregates)
+                    .order_by('category_ref__name'))
+
+        return {
+            'total': sum(row['total'] for row in rows),
+            'categories': [
+                {'id': row['category_ref'], 'name': row['category_ref__name'], 'count': row['total']}
+                for row in rows
+            ],
+            'stock_status': [
+                {'value': status, 'count': sum(row[f'status_{index}'] for row in rows)}
+                for index, status in enumerate(statuses)
+            ],
+            'price_bands': [
+                {'label': label, 'min': lower, 'max': upper, 'count': sum(row[f'band_{index}'] for row in rows)}
+                for index, (label, lower, upper) in enumerate(PRICE_BANDS)
+            ],
+        }
+
     @staticmethod
     def _log_stock_change(
         product: Product,
@@ -118,16 +529,19 @@ class ProductService:
         reason: str = "Stock change"
     ) -> StockChangeLog:
 
-        return StockChangeLog.objects.create(
-            product=product,
+        log, = save_stock_logs([StockChangeLog(
+            product_id=product.pk,
             product_name=product.name,
             product_category=product.category,
             product_sku=product.sku,
-            customer=customer,
+            customer_id=customer.pk if customer else None,
+            customer_name=customer.get_full_name() if customer else '',
             previous_qty=previous_qty,
             new_qty=new_qty,
             change_reason=reason,
-            created_by=created_by
-        )
+            created_by_id=created_by.pk,
+            created_by_name=created_by.get_full_name()
+        )])
+        return log
 
 
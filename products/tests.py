@@ -1,3 +1,376 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from common.cache import increment_namespace
+from common.constants import CACHE_NAMESPACE_CATALOG
+from common.services import DashboardCounterService
+from products.audit import relay_outbox
+from products.autocomplete import ProductAutocompleteIndex, product_autocomplete
+from products.models import Category, Product, StockAlert, StockChangeLog, StockChangeLogOutbox
+from products.services import CategoryService, ProductService, StockAlertService, StockMovement
+from users.constants import ROLE_ADMIN, ROLE_CUSTOMER
+from users.models import User
+
+
+def create_product(user, sku, name, category, stock_qty=50):
+    return ProductService.create_new_product(
+        sku=sku,
+        name=name,
+        category=category,
+        cost_price=Decimal('5.00'),
+        selling_price=Decimal('10.00'),
+        stock_qty=stock_qty,
+        image=None,
+        created_by=user,
+        modified_by=user,
+    )
+
+
+class ProductSearchTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(email='admin@example.com', role=ROLE_ADMIN, first_name='Test', last_name='Admin')
+        cls.laptop = create_product(cls.admin, 'LAP-001', 'Gaming Laptop', 'Electronics')
+        cls.bag = create_product(cls.admin, 'BAG-001', 'Laptop Bag', 'Accessories', stock_qty=5)
+        cls.mouse = create_product(cls.admin, 'MOU-001', 'Wireless Mouse', 'Electronics')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.admin)
+
+    def _search(self, **params):
+        response = self.client.get(reverse('list-create-products'), params)
+        self.assertEqual(response.status_code, 200)
+        return [product['sku'] for product in response.data['results']]
+
+    def test_prefix_terms_are_ranked_and_combine_with_filters(self):
+        # The SKU hit outranks the name-only hit.
+        self.assertEqual(self._search(search='lap'), ['LAP-001', 'BAG-001'])
+        self.assertEqual(self._search(search='lap gam'), ['LAP-001'])
+        self.assertEqual(self._search(search='LAP-00'), ['LAP-001'])
+        self.assertEqual(self._search(search='lap', stock_status='LOW_STOCK'), ['BAG-001'])
+        self.assertEqual(self._search(search='electronics', ordering='sku'), ['LAP-001', 'MOU-001'])
+        self.assertEqual(self._search(search='"mouse'), ['MOU-001'])
+
+    def test_service_writes_keep_the_index_in_sync(self):
+        ProductService.update_product(self.mouse, {'name': 'Ergonomic Trackball'}, self.admin)
+        ProductService.delete_product(self.bag, self.admin)
+
+        self.assertEqual(self._search(search='wireless'), [])
+        self.assertEqual(self._search(search='trackball'), ['MOU-001'])
+        self.assertEqual(self._search(search='laptop'), ['LAP-001'])
+        self.assertFalse(Product.objects.filter(sku='BAG-001').exists())
+
+
+class ProductAutocompleteTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(email='admin@example.com', role=ROLE_ADMIN, first_name='Test', last_name='Admin')
+        cls.laptop = create_product(cls.admin, 'LAP-001', 'Gaming Laptop', 'Electronics')
+        cls.bag = create_product(cls.admin, 'BAG-001', 'Laptop Bag', 'Accessories')
+
+    def setUp(self):
+        cache.clear()
+        product_autocomplete.invalidate()
+
+    def _skus(self, index, prefix, limit=10):
+        return [match['sku'] for match in index.lookup(prefix, limit)]
+
+    def test_sku_matches_come_before_name_matches(self):
+        index = ProductAutocompleteIndex(max_products=100)
+
+        self.assertEqual(self._skus(index, 'la'), ['LAP-001', 'BAG-001'])
+        self.assertEqual(self._skus(index, 'lap', limit=1), ['LAP-001'])
+        self.assertEqual(self._skus(index, 'BAG'), ['BAG-001'])
+        self.assertEqual(self._skus(index, 'bag'), ['BAG-001'])
+        self.assertEqual(self._skus(index, 'x'), [])
+
+    def test_service_changes_apply_incrementally_after_commit(self):
+        self._skus(product_autocomplete, 'lap')
+        version = product_autocomplete.version
+
+        with self.captureOnCommitCallbacks(execute=True):
+            mouse = create_product(self.admin, 'MOU-001', 'Wireless Laptop Mouse', 'Electronics')
+            ProductService.update_product(self.laptop, {'name': 'Gaming Notebook'}, self.admin)
+            ProductService.delete_product(self.bag, self.admin)
+
+        self.assertEqual(self._skus(product_autocomplete, 'laptop'), ['MOU-001'])
+        self.assertEqual(self._skus(product_autocomplete, 'note'), ['LAP-001'])
+        # Applied in place, not rebuilt from the database.
+        self.assertEqual(product_autocomplete.version, version + 3)
+        self.assertIn(mouse.pk, product_autocomplete._products)
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(reverse('product-autocomplete'), {'q': 'mou'})
+        self.assertEqual(response.data['results'], [
+            {'id': mouse.pk, 'sku': 'MOU-001', 'name': 'Wireless Laptop Mouse', 'selling_price': '10.00'},
+        ])
+
+    def test_bounded(self):
+        index = ProductAutocompleteIndex(max_products=2)
+        self._skus(index, 'a')
+
+        index.apply([(999, 'NEW-999', 'New Product', Decimal('1.00'))], [])
+        # The oldest product is evicted to stay within the bound.
+        self.assertEqual(len(index), 2)
+        self.assertEqual(self._skus(index, 'lap'), ['BAG-001'])
+
+
+# The rebuild thread reads through its own connection, so the catalog change
+# must be committed.
+class ProductAutocompleteRebuildTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_rebuilt_in_the_background_after_changes_elsewhere(self):
+        index = ProductAutocompleteIndex(max_products=100)
+        Product.objects.create(sku='LAP-001', name='Gaming Laptop', category='Electronics',
+                               cost_price=1, selling_price=2, stock_qty=1)
+        self.assertEqual([match['sku'] for match in index.lookup('lap', 10)], ['LAP-001'])
+
+        Product.objects.create(sku='LAP-002', name='Raw Laptop', category='Hardware',
+                               cost_price=1, selling_price=2, stock_qty=1)
+        increment_namespace(CACHE_NAMESPACE_CATALOG)
+        # Holding the index lock keeps the new index from being swapped in.
+        with index._lock, mock.patch('products.autocomplete.AUTOCOMPLETE_VERSION_CHECK_SECONDS', 0):
+            # Answered from the old index while the new one is built.
+            self.assertEqual([match['sku'] for match in index.lookup('lap', 10)], ['LAP-001'])
+        index._rebuild_thread.join()
+        self.assertEqual([match['sku'] for match in index.lookup('lap', 10)], ['LAP-001', 'LAP-002'])
+
+
+class CategoryTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(email='admin@example.com', role=ROLE_ADMIN, first_name='Test', last_name='Admin')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.admin)
+
+    def _totals(self):
+        return {
+            category.name: (category.product_count, category.stock_value)
+            for category in Category.objects.all()
+        }
+
+    def test_totals_follow_product_writes(self):
+        laptop = create_product(self.admin, 'LAP-001', 'Gaming Laptop', 'Electronics', stock_qty=10)
+        mouse = create_product(self.admin, 'MOU-001', 'Wireless Mouse', '  electronics ', stock_qty=4)
+        self.assertEqual(mouse.category, 'Electronics')
+        self.assertEqual(self._totals(), {'Electronics': (2, Decimal('70.00'))})
+
+        ProductService.update_product(mouse, {'category': 'Accessories', 'cost_price': Decimal('2.50')}, self.admin)
+        ProductService.update_stock(laptop, 6, self.admin)
+        ProductService.apply_stock_movements([StockMovement(mouse.pk, -3, "Sold")], self.admin)
+        self.assertEqual(self._totals(), {
+            'Accessories': (1, Decimal('2.50')),
+            'Electronics': (1, Decimal('30.00')),
+        })
+
+        laptop.refresh_from_db()
+        ProductService.delete_product(laptop, self.admin)
+        self.assertEqual(self._totals()['Electronics'], (0, Decimal('0.00')))
+
+    def test_category_filter_and_list(self):
+        create_product(self.admin, 'LAP-001', 'Gaming Laptop', 'Electronics')
+        create_product(self.admin, 'BAG-001', 'Laptop Bag', 'Accessories')
+
+        response = self.client.get(reverse('list-create-products'), {'category': 'ELECTRONICS'})
+        self.assertEqual([product['sku'] for product in response.data['results']], ['LAP-001'])
+        response = self.client.get(reverse('list-create-products'), {'category': 'Furniture'})
+        self.assertEqual(response.data['results'], [])
+
+        response = self.client.get(reverse('list-categories'))
+        self.assertEqual(
+            [(category['name'], category['product_count'], category['stock_value']) for category in response.data],
+            [('Accessories', 1, '250.00'), ('Electronics', 1, '250.00')],
+        )
+
+    def test_sync_links_products_created_outside_the_service(self):
+        Product.objects.create(sku='RAW-1', name='Raw', category='Office ', cost_price=2, selling_price=3, stock_qty=5)
+
+        self.assertEqual(CategoryService.sync(), 1)
+        self.assertEqual(self._totals(), {'Office': (1, Decimal('10.00'))})
+        self.assertEqual(Product.objects.get(sku='RAW-1').category, 'Office')
+
+
+class ProductFacetsTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(email='admin@example.com', role=ROLE_ADMIN, first_name='Test', last_name='Admin')
+        cls.laptop = create_product(cls.admin, 'LAP-001', 'Gaming Laptop', 'Electronics', stock_qty=50)
+        create_product(cls.admin, 'MOU-001', 'Wireless Mouse', 'Electronics', stock_qty=0)
+        create_product(cls.admin, 'BAG-001', 'Laptop Bag', 'Accessories', stock_qty=5)
+        ProductService.update_product(cls.laptop, {'selling_price': Decimal('750.00')}, cls.admin)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.admin)
+
+    def _facets(self, queries=1, **params):
+        with self.assertNumQueries(queries):
+            response = self.client.get(reverse('product-facets'), params)
+        self.assertEqual(response.status_code, 200)
+        data = response.data
+        return (
+            data['total'],
+            {category['name']: category['count'] for category in data['categories']},
+            {status['value']: status['count'] for status in data['stock_status']},
+            {band['label']: band['count'] for band in data['price_bands'] if band['count']},
+        )
+
+    def test_counts_every_facet_in_one_query(self):
+        self.assertEqual(self._facets(), (
+            3,
+            {'Accessories': 1, 'Electronics': 2},
+            {'OUT_OF_STOCK': 1, 'LOW_STOCK': 1, 'IN_STOCK': 1},
+            {'0-50': 2, '500-1000': 1},
+        ))
+
+    def test_counts_follow_product_filters_and_search(self):
+        # Plus one lookup resolving the category name to its id.
+        self.assertEqual(self._facets(queries=2, category='electronics', max_price=100), (
+            1,
+            {'Electronics': 1},
+            {'OUT_OF_STOCK': 1, 'LOW_STOCK': 0, 'IN_STOCK': 0},
+            {'0-50': 1},
+        ))
+        self.assertEqual(self._facets(search='lap')[0], 2)
+
+
+class ProductStockColumnsTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(email='admin@example.com', role=ROLE_ADMIN, first_name='Test', last_name='Admin')
+        cls.laptop = create_product(cls.admin, 'LAP-001', 'Gaming Laptop', 'Electronics', stock_qty=30)
+        cls.bag = create_product(cls.admin, 'BAG-001', 'Laptop Bag', 'Accessories', stock_qty=5)
+        ProductService.update_product(cls.bag, {'selling_price': Decimal('6.00')}, cls.admin)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.admin)
+
+    def _skus(self, **params):
+        response = self.client.get(reverse('list-create-products'), params)
+        self.assertEqual(response.status_code, 200)
+        return [product['sku'] for product in response.data['results']]
+
+    def test_reorder_threshold_drives_stock_status_and_counters(self):
+        self.assertEqual(self._skus(stock_status='LOW_STOCK'), ['BAG-001'])
+
+        product = ProductService.update_product(self.laptop, {'reorder_threshold': 40}, self.admin)
+        self.assertEqual(product.stock_status, 'LOW_STOCK')
+        self.assertEqual(DashboardCounterService.get().low_stock_count, 2)
+        self.assertEqual(DashboardCounterService.drift(), {})
+
+        cache.clear()
+        self.assertEqual(self._skus(stock_status='LOW_STOCK', ordering='stock_qty'), ['BAG-001', 'LAP-001'])
+
+    def test_profit_margin_is_sortable(self):
+        self.assertEqual(Product.objects.get(pk=self.laptop.pk).profit_margin, Decimal('100.00'))
+        self.assertEqual(self._skus(ordering='profit_margin'), ['BAG-001', 'LAP-001'])
+        self.assertEqual(self._skus(ordering='-profit_margin'), ['LAP-001', 'BAG-001'])
+
+
+class StockAlertTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(email='admin@example.com', role=ROLE_ADMIN, first_name='Test', last_name='Admin')
+        cls.laptop = create_product(cls.admin, 'LAP-001', 'Gaming Laptop', 'Electronics', stock_qty=50)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.admin)
+
+    def _alerts(self):
+        return [(alert.status, alert.stock_qty, alert.resolved_at is None)
+                for alert in StockAlert.objects.order_by('id')]
+
+    def test_each_threshold_crossing_is_recorded(self):
+        for qty in (40, 5, 0, 3, 4, 50):
+            ProductService.update_stock(self.laptop, qty, self.admin)
+
+        self.assertEqual(self._alerts(), [
+            ('LOW_STOCK', 5, False),
+            ('OUT_OF_STOCK', 0, False),
+            ('LOW_STOCK', 4, False),
+        ])
+
+        ProductService.apply_stock_movements([StockMovement(self.laptop.pk, -45, 'Order')], self.admin)
+        self.assertEqual(self._alerts()[3:], [('LOW_STOCK', 5, True)])
+        self.laptop.refresh_from_db()
+        ProductService.update_product(self.laptop, {'reorder_threshold': 2}, self.admin)
+        self.assertEqual(self._alerts()[3:], [('LOW_STOCK', 5, False)])
+        ProductService.update_product(self.laptop, {'reorder_threshold': 20}, self.admin)
+        self.assertEqual(self._alerts()[3:], [('LOW_STOCK', 5, False), ('LOW_STOCK', 5, True)])
+
+    def test_dashboard_and_consumers_read_open_alerts(self):
+        ProductService.update_stock(self.laptop, 3, self.admin)
+
+        response = self.client.get(reverse('common:dashboard-insights'))
+        self.assertEqual(response.data['low_stock_products'],
+                         [{'id': self.laptop.pk, 'sku': 'LAP-001', 'name': 'Gaming Laptop', 'stock_qty': 3}])
+
+        response = self.client.get(reverse('list-stock-alerts'), {'pending': 'true', 'is_open': 'true'})
+        alert_ids = [alert['id'] for alert in response.data['results']]
+        self.assertEqual(len(alert_ids), 1)
+
+        response = self.client.post(reverse('acknowledge-stock-alerts'), {'ids': alert_ids}, format='json')
+        self.assertEqual(response.data, {'acknowledged': 1})
+        response = self.client.get(reverse('list-stock-alerts'), {'pending': 'true'})
+        self.assertEqual(response.data['results'], [])
+
+    def test_sync_rebuilds_open_alerts(self):
+        Product.objects.filter(pk=self.laptop.pk).update(stock_qty=0)
+        self.assertEqual(StockAlertService.sync(), 1)
+        self.assertEqual(self._alerts(), [('OUT_OF_STOCK', 0, True)])
+
+
+@override_settings(STOCK_LOG_RELAY=False)
+@mock.patch('products.audit.uses_outbox', return_value=True)
+class StockChangeLogOutboxTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(email='admin@example.com', role=ROLE_ADMIN, first_name='Test', last_name='Admin')
+        cls.customer = User.objects.create(email='customer@example.com', role=ROLE_CUSTOMER,
+                                           first_name='Ada', last_name='Lovelace')
+        cls.laptop = create_product(cls.admin, 'LAP-001', 'Gaming Laptop', 'Electronics', stock_qty=50)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.admin)
+
+    def test_logs_wait_in_the_outbox_until_relayed(self, uses_outbox):
+        ProductService.update_stock(self.laptop, 40, self.admin, customer=self.customer, reason="Sold")
+        self.assertFalse(StockChangeLog.objects.filter(change_reason="Sold").exists())
+        entry = StockChangeLogOutbox.objects.get()
+
+        self.assertEqual(relay_outbox(), 1)
+        self.assertFalse(StockChangeLogOutbox.objects.exists())
+
+        response = self.client.get(reverse('product-stock-history'), {'customer_id': self.customer.pk})
+        self.assertEqual(
+            [(log['product_id'], log['quantity_change'], log['customer'], log['created_by'])
+             for log in response.data['results']],
+            [(self.laptop.pk, -10, 'Ada Lovelace', 'Test Admin')],
+        )
+
+        # A relay interrupted before deleting its entries relays them again.
+        StockChangeLogOutbox.objects.create(pk=entry.pk, payload=entry.payload)
+        self.assertEqual(relay_outbox(), 1)
+        self.assertEqual(StockChangeLog.objects.filter(outbox_id=entry.pk).count(), 1)
+        self.assertFalse(StockChangeLogOutbox.objects.exists())
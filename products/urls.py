@@ -2,11 +2,21 @@ from django.urls import path
 from products.views import (
     ListCreateProductsApiView,
     RetrieveUpdateDestroyProductApiView,
-    ProductStockHistoryApiView
+    ProductStockHistoryApiView,
+    ProductAutocompleteApiView,
+    CategoryListApiView,
+    ProductFacetsApiView,
+    StockAlertListApiView,
+    StockAlertAcknowledgeApiView,
 )
 
 urlpatterns = [
     path('', ListCreateProductsApiView.as_view(), name='list-create-products'),
     path('<int:pk>/', RetrieveUpdateDestroyProductApiView.as_view(), name='retrieve-update-destroy-product'),
     path('stock-history/', ProductStockHistoryApiView.as_view(), name='product-stock-history'),
+    path('categories/', CategoryListApiView.as_view(), name='list-categories'),
+    path('facets/', ProductFacetsApiView.as_view(), name='product-facets'),
+    path('autocomplete/', ProductAutocompleteApiView.as_view(), name='product-autocomplete'),
+    path('stock-alerts/', StockAlertListApiView.as_view(), name='list-stock-alerts'),
+    path('stock-alerts/acknowledge/', StockAlertAcknowledgeApiView.as_view(), name='acknowledge-stock-alerts'),
 ]
\ No newline at end of file
@@ -1,27 +1,50 @@
-from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView, ListAPIView
-from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.generics import GenericAPIView, ListCreateAPIView, RetrieveUpdateDestroyAPIView, ListAPIView
+from rest_framework.response import Response
+from rest_framework.filters import OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
 
-from products.models import Product, StockChangeLog
+from common.cache import CachedResponseMixin
+from common.constants import CACHE_NAMESPACE_PRODUCTS, THROTTLE_EXPENSIVE_RATE, THROTTLE_PRIORITY_LOW
+from common.replicas import ReplicaReadMixin
+from products.autocomplete import product_autocomplete
+from products.models import Category, Product, StockAlert, StockChangeLog
 from products.serializers import (
+    CategoryListSerializer,
+    ProductAutocompleteQuerySerializer,
+    ProductAutocompleteSerializer,
     ProductListSerializer,
     ProductCreateSerializer,
     ProductRetrieveSerializer,
     ProductUpdateSerializer,
+    StockAlertAcknowledgeSerializer,
+    StockAlertListSerializer,
     StockChangeLogListSerializer
 )
-from products.filters import ProductFilter, StockChangeLogFilter
+from products.filters import (
+    ProductFilter,
+    ProductOrderingFilter,
+    ProductSearchFilter,
+    StockAlertFilter,
+    StockChangeLogFilter,
+)
 from products.services import ProductService
 from users.permissions import IsSales, IsAdmin
 
 
-class ListCreateProductsApiView(ListCreateAPIView):
+class ListCreateProductsApiView(ReplicaReadMixin, CachedResponseMixin, ListCreateAPIView):
 
-    queryset = Product.objects.all()
+    cache_name = 'product-list'
+    cache_namespaces = (CACHE_NAMESPACE_PRODUCTS,)
+    # Searches scan the catalog.
+    throttle_rate = THROTTLE_EXPENSIVE_RATE
+    queryset = Product.objects.select_related('created_by', 'modified_by')
     filterset_class = ProductFilter
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter, ProductOrderingFilter]
     search_fields = ['sku', 'name', 'category']
-    ordering_fields = ['id', 'sku', 'name', 'category', 'stock_qty', 'selling_price', 'created_at']
+    ordering_fields = [
+        'id', 'sku', 'name', 'category', 'stock_qty', 'stock_status', 'reorder_threshold',
+        'selling_price', 'profit_margin', 'created_at',
+    ]
     ordering = ['-id']
 
     def get_serializer_class(self):
@@ -38,7 +61,7 @@ class ListCreateProductsApiView(ListCreateAPIView):
 
 class RetrieveUpdateDestroyProductApiView(RetrieveUpdateDestroyAPIView):
 
-    queryset = Product.objects.all()
+    queryset = Product.objects.select_related('created_by', 'modified_by')
 
     def get_serializer_class(self):
         if self.request.method in ['PUT', 'PATCH']:
@@ -55,19 +78,83 @@ class RetrieveUpdateDestroyProductApiView(RetrieveUpdateDestroyAPIView):
     def perform_destroy(self, instance):
         ProductService.delete_product(instance, self.request.user)
 
-class ProductStockHistoryApiView(ListAPIView):
+class ProductStockHistoryApiView(ReplicaReadMixin, CachedResponseMixin, ListAPIView):
 
+    cache_name = 'product-stock-history'
+    cache_namespaces = (CACHE_NAMESPACE_PRODUCTS,)
     serializer_class = StockChangeLogListSerializer
     permission_classes = [IsSales | IsAdmin]
+    throttle_rate = THROTTLE_EXPENSIVE_RATE
+    throttle_priority = THROTTLE_PRIORITY_LOW
     filterset_class = StockChangeLogFilter
     filter_backends = [DjangoFilterBackend, OrderingFilter]
     ordering_fields = ['id', 'created_at']
     ordering = ['-id']
 
     def get_queryset(self):
-        return StockChangeLog.objects.select_related(
-            'customer', 'created_by'
-        ).all()
+        # Routed to STOCK_LOG_DATABASE; names are snapshots, so no joins.
+        return StockChangeLog.objects.all()
+
+
+class ProductAutocompleteApiView(GenericAPIView):
+
+    serializer_class = ProductAutocompleteQuerySerializer
+    permission_classes = [IsSales | IsAdmin]
+
+    def get(self, request):
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        matches = product_autocomplete.lookup(params['q'], params['limit'])
+
+        return Response({'results': ProductAutocompleteSerializer(matches, many=True).data})
+
+
+class CategoryListApiView(CachedResponseMixin, ListAPIView):
+
+    queryset = Category.objects.all()
+    serializer_class = CategoryListSerializer
+    permission_classes = [IsSales | IsAdmin]
+    # Categories are few; the catalog UI needs them all at once.
+    pagination_class = None
+    cache_name = 'category-list'
+    cache_namespaces = (CACHE_NAMESPACE_PRODUCTS,)
+
+
+class ProductFacetsApiView(CachedResponseMixin, GenericAPIView):
+
+    queryset = Product.objects.all()
+    permission_classes = [IsSales | IsAdmin]
+    filterset_class = ProductFilter
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter]
+    search_fields = ['sku', 'name', 'category']
+    throttle_priority = THROTTLE_PRIORITY_LOW
+    cache_name = 'product-facets'
+    cache_namespaces = (CACHE_NAMESPACE_PRODUCTS,)
+
+    def build_response(self, request):
+        return Response(ProductService.facet_counts(self.filter_queryset(self.get_queryset())))
+
+
+class StockAlertListApiView(ListAPIView):
+    """Stock alerts, newest first; notification consumers poll ``?pending=true``."""
+
+    queryset = StockAlert.objects.all()
+    serializer_class = StockAlertListSerializer
+    permission_classes = [IsSales | IsAdmin]
+    filterset_class = StockAlertFilter
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    ordering_fields = ['id', 'stock_qty', 'created_at']
+    ordering = ['-id']
+
 
+class StockAlertAcknowledgeApiView(GenericAPIView):
 
+    serializer_class = StockAlertAcknowledgeSerializer
+    permission_classes = [IsAdmin]
 
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.save())
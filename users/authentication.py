@@ -0,0 +1,24 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from users.constants import TOKEN_VERSION_CLAIM
+from users.tokens import claims_user, current_token_version
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    ``JWTAuthentication`` that builds the user from the token's claims and
+    only checks, through a cache, that the token has not been revoked.
+    See users.tokens.
+    """
+
+    def get_user(self, validated_token):
+        if TOKEN_VERSION_CLAIM not in validated_token:
+            # Issued before tokens carried the user.
+            return super().get_user(validated_token)
+
+        user = claims_user(validated_token)
+        if not user.is_active or current_token_version(user.pk) != user.token_version:
+            raise AuthenticationFailed(_("Token has been revoked."), code='token_revoked')
+        return user
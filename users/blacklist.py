@@ -0,0 +1,177 @@
+"""
+Refresh token blacklist checks without a query per refresh.
+
+Each process keeps the ids (``jti``) of blacklisted, unexpired refresh tokens
+in a Bloom filter. A token the filter has never seen is certainly not
+blacklisted, which is nearly every refresh, so it passes without a query.
+Tokens the filter may have seen are checked in the database, and those found
+blacklisted are remembered in a small LRU, so a client retrying a revoked
+token does not query again.
+
+When a logout commits, its process adds the token to its own filter and
+bumps the ``token-blacklist`` namespace. Other processes pull new blacklist
+rows by id when they see the namespace change, which is immediate with a
+shared cache, and at least every ``TOKEN_BLACKLIST_SYNC_SECONDS`` anyway.
+
+Rows are pulled by ascending id, which relies on blacklist entries
+committing in id order, as SQLite's single writer guarantees.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from common.cache import increment_namespace, namespace_versions
+from common.constants import CACHE_NAMESPACE_TOKEN_BLACKLIST
+from common.db import writer_lane
+from users.constants import (
+    TOKEN_BLACKLIST_FALSE_POSITIVE_RATE,
+    TOKEN_BLACKLIST_FILTER_CAPACITY,
+    TOKEN_BLACKLIST_LRU_SIZE,
+)
+
+
+class BloomFilter:
+    """A set that can answer "maybe" but never misses an item it was given."""
+
+    def __init__(self, capacity, false_positive_rate):
+        self.capacity = max(capacity, 1)
+        self.size = math.ceil(-self.capacity * math.log(false_positive_rate) / math.log(2) ** 2)
+        self.hashes = max(round(self.size / self.capacity * math.log(2)), 1)
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # The filter never leaves its process, so Python's per-process string
+        # hash will do; its halves seed the double hashing.
+        value = hash(item)
+        first, second = value & 0xFFFFFFFF, ((value >> 32) & 0xFFFFFFFF) | 1
+        size = self.size
+        return [(first + index * second) % size for index in range(self.hashes)]
+
+    def add(self, item):
+        bits = self._bits
+        for position in self._positions(item):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        bits = self._bits
+        for position in self._positions(item):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class TokenBlacklistFilter:
+
+    def __init__(self, lru_size):
+        self.lru_size = lru_size
+        self._lock = threading.RLock()
+        self._bloom = None
+        self._last_id = 0
+        self._version = None
+        self._synced_at = 0.0
+        self._blacklisted = OrderedDict()
+
+    def is_blacklisted(self, jti) -> bool:
+        self._ensure_fresh()
+        with self._lock:
+            if jti in self._blacklisted:
+                self._blacklisted.move_to_end(jti)
+                return True
+            if jti not in self._bloom:
+                return False
+
+        if not BlacklistedToken.objects.filter(token__jti=jti).exists():
+            return False
+        self._remember(jti)
+        return True
+
+    def add(self, jti) -> None:
+        """Blacklist ``jti`` in every process once the current transaction commits."""
+        def publish():
+            self._remember(jti)
+            version = increment_namespace(CACHE_NAMESPACE_TOKEN_BLACKLIST)
+            with self._lock:
+                if self._bloom is not None:
+                    self._bloom.add(jti)
+                    # Nothing to pull unless another process blacklisted in between.
+                    if self._version == version - 1:
+                        self._version = version
+
+        transaction.on_commit(publish)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._bloom = None
+
+    def _remember(self, jti):
+        with self._lock:
+            self._blacklisted[jti] = True
+            self._blacklisted.move_to_end(jti)
+            while len(self._blacklisted) > self.lru_size:
+                self._blacklisted.popitem(last=False)
+
+    def _ensure_fresh(self):
+        version = namespace_versions([CACHE_NAMESPACE_TOKEN_BLACKLIST])[0]
+        if (
+            self._bloom is not None
+            and version == self._version
+            and time.monotonic() - self._synced_at < settings.TOKEN_BLACKLIST_SYNC_SECONDS
+        ):
+            return
+
+        with self._lock:
+            if self._bloom is None or self._bloom.count >= self._bloom.capacity:
+                self._rebuild()
+            else:
+                self._pull(BlacklistedToken.objects.filter(pk__gt=self._last_id))
+            self._version = version
+            self._synced_at = time.monotonic()
+
+    def _rebuild(self):
+        last_id = BlacklistedToken.objects.aggregate(last_id=Max('pk'))['last_id'] or 0
+        jtis = list(BlacklistedToken.objects
+                    .filter(pk__lte=last_id, token__expires_at__gt=timezone.now())
+                    .values_list('token__jti', flat=True))
+        # Room to grow before the false positive rate degrades.
+        self._bloom = BloomFilter(max(len(jtis) * 2, TOKEN_BLACKLIST_FILTER_CAPACITY),
+                                  TOKEN_BLACKLIST_FALSE_POSITIVE_RATE)
+        for jti in jtis:
+            self._bloom.add(jti)
+        self._last_id = last_id
+
+    def _pull(self, queryset):
+        for pk, jti in queryset.order_by('pk').values_list('pk', 'token__jti'):
+            self._bloom.add(jti)
+            self._last_id = pk
+
+
+token_blacklist_filter = TokenBlacklistFilter(TOKEN_BLACKLIST_LRU_SIZE)
+
+
+def prune_expired_tokens(batch_size) -> int:
+    """Delete up to ``batch_size`` expired outstanding tokens and their blacklist entries."""
+    # Tokens share one lifetime, so the expired ones are the oldest and the
+    # scan in id order stops after the first batch.
+    ids = list(OutstandingToken.objects
+               .filter(expires_at__lte=timezone.now())
+               .order_by('pk')
+               .values_list('pk', flat=True)[:batch_size])
+    if not ids:
+        return 0
+    with writer_lane(), connection.cursor() as cursor:
+        BlacklistedToken.objects.filter(token_id__in=ids).delete()
+        # A plain DELETE: with the blacklist entries gone, Django's cascade
+        # collector would only load every row to find nothing to cascade to.
+        cursor.execute(
+            f'DELETE FROM {OutstandingToken._meta.db_table} WHERE id IN ({", ".join(["%s"] * len(ids))})', ids
+        )
+    return len(ids)
@@ -8,3 +8,20 @@ USER_ROLE_CHOICES = [
     (ROLE_ADMIN, ROLE_ADMIN),
 ]
 
+
+# Access tokens carry these user fields as claims, so authenticating a request
+# needs no user lookup, plus the user's token version under TOKEN_VERSION_CLAIM.
+USER_CLAIM_FIELDS = ('email', 'first_name', 'last_name', 'role', 'is_active')
+TOKEN_VERSION_CLAIM = 'ver'
+# Stands in for the token version of an inactive or deleted user; no token carries it.
+REVOKED_TOKEN_VERSION = -1
+
+# Per-process filter in front of the refresh token blacklist, see users.blacklist.
+# The Bloom filter holds at least this many tokens before it is rebuilt larger;
+# about 1.2 MB at a 1% false positive rate.
+TOKEN_BLACKLIST_FILTER_CAPACITY = 1_000_000
+TOKEN_BLACKLIST_FALSE_POSITIVE_RATE = 0.01
+# Tokens known to be blacklisted, kept to answer repeated attempts without a query.
+TOKEN_BLACKLIST_LRU_SIZE = 10_000
+# Expired outstanding tokens deleted per batch by `prune_tokens`.
+TOKEN_PRUNE_BATCH_SIZE = 1000
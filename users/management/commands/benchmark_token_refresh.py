@@ -0,0 +1,149 @@
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+from common.metrics import percentile
+from users.blacklist import prune_expired_tokens, token_blacklist_filter
+from users.constants import TOKEN_PRUNE_BATCH_SIZE
+from users.models import User
+from users.tokens import UserClaimsRefreshToken
+
+# Synthetic tokens are recognizable by their jti.
+SYNTHETIC_JTI_PREFIX = 'bench-'
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the token tables with synthetic outstanding and blacklisted refresh tokens, "
+        "then time token refreshes with the blacklist checked in the database and through "
+        "the in-memory filter. With --prune, also time pruning the expired ones. Creates "
+        "real rows; run it against a benchmark database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tokens', type=int, default=10_000_000, help="Synthetic outstanding tokens to reach.")
+        parser.add_argument('--blacklisted-every', type=int, default=20,
+                            help="Blacklist one synthetic token in this many.")
+        parser.add_argument('--expired-share', type=float, default=0.5,
+                            help="Share of synthetic tokens that are already expired.")
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--warmup', type=int, default=20)
+        parser.add_argument('--prune', action='store_true', help="Prune the expired tokens and time it.")
+        parser.add_argument('--output', help="Write the results as JSON to this path.")
+
+    def handle(self, *args, tokens, blacklisted_every, expired_share, requests, warmup, prune, output, **options):
+        admin = User.objects.admins().active().order_by('id').first()
+        if admin is None:
+            raise CommandError("Create an admin user first.")
+
+        try:
+            # Lets the test client's host through ALLOWED_HOSTS.
+            setup_test_environment(debug=settings.DEBUG)
+        except RuntimeError:
+            pass  # Already set up, e.g. under the test runner.
+
+        self._seed(tokens, blacklisted_every, expired_share)
+        report = {
+            'outstanding_tokens': OutstandingToken.objects.count(),
+            'refresh': {},
+        }
+
+        refresh = str(UserClaimsRefreshToken.for_user(admin))
+        for mode, use_filter in (('database', False), ('filter', True)):
+            with override_settings(TOKEN_BLACKLIST_FILTER=use_filter, THROTTLE_ENABLED=False):
+                token_blacklist_filter.invalidate()
+                started = time.perf_counter()
+                self._refresh(refresh)
+                first_ms = (time.perf_counter() - started) * 1000
+                result = self._measure(refresh, requests, warmup)
+            result['first_ms'] = round(first_ms, 3)
+            report['refresh'][mode] = result
+            self.stdout.write(
+                f"refresh ({mode:<8}) first={result['first_ms']:>9}ms p50={result['p50_ms']:>7}ms "
+                f"p95={result['p95_ms']:>7}ms p99={result['p99_ms']:>7}ms queries={result['queries']}"
+            )
+
+        if prune:
+            started = time.perf_counter()
+            pruned = 0
+            while count := prune_expired_tokens(TOKEN_PRUNE_BATCH_SIZE):
+                pruned += count
+            elapsed = time.perf_counter() - started
+            report['prune'] = {
+                'pruned': pruned,
+                'seconds': round(elapsed, 1),
+                'tokens_per_second': round(pruned / elapsed) if elapsed else None,
+            }
+            self.stdout.write(f"Pruned {pruned} expired tokens in {elapsed:.1f}s.")
+
+        if output:
+            with open(output, 'w') as output_file:
+                json.dump(report, output_file, indent=2)
+
+    def _seed(self, count, blacklisted_every, expired_share):
+        table = OutstandingToken._meta.db_table
+        existing = OutstandingToken.objects.filter(jti__startswith=SYNTHETIC_JTI_PREFIX).count()
+        if existing >= count:
+            return
+
+        now = timezone.now()
+        adapt = connection.ops.adapt_datetimefield_value
+        expired_at = adapt(now - timedelta(days=1))
+        expires_at = adapt(now + settings.SIMPLE_JWT['REFRESH_TOKEN_LIFETIME'])
+        # Expired tokens come first, as they would in a real table.
+        expired_until = existing + int((count - existing) * expired_share)
+        batch_size = 100_000
+
+        for start in range(existing, count, batch_size):
+            rows = [
+                ('', expired_at if number < expired_until else expires_at,
+                 expired_at if number < expired_until else expires_at, f'{SYNTHETIC_JTI_PREFIX}{number:010d}')
+                for number in range(start, min(start + batch_size, count))
+            ]
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(
+                    f'INSERT INTO {table} (token, created_at, expires_at, jti) VALUES (%s, %s, %s, %s)', rows
+                )
+            self.stdout.write(f"Tokens: {start + len(rows)}/{count}")
+
+        blacklist_table = 'token_blacklist_blacklistedtoken'
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {blacklist_table} (token_id, blacklisted_at) '
+                f'SELECT id, created_at FROM {table} '
+                f'WHERE jti >= %s AND jti < %s AND id %% %s = 0',
+                [f'{SYNTHETIC_JTI_PREFIX}{existing:010d}', f'{SYNTHETIC_JTI_PREFIX}{count:010d}', blacklisted_every],
+            )
+
+    def _refresh(self, refresh):
+        response = Client().post(reverse('refresh'), {'refresh': refresh})
+        if response.status_code != 200:
+            raise CommandError(f"Refresh returned {response.status_code}.")
+
+    def _measure(self, refresh, requests, warmup):
+        timings, queries = [], []
+        for number in range(warmup + requests):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                self._refresh(refresh)
+                elapsed = time.perf_counter() - started
+            if number >= warmup:
+                timings.append(elapsed * 1000)
+                queries.append(len(captured))
+
+        timings.sort()
+        return {
+            'p50_ms': round(percentile(timings, 0.50), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+            'queries': max(queries),
+        }
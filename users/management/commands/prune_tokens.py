@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.blacklist import prune_expired_tokens
+from users.constants import TOKEN_PRUNE_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired outstanding refresh tokens, and their blacklist entries, in "
+        "short batches so logins and orders can write in between. Runs every "
+        "--interval seconds until stopped, or once with --once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=TOKEN_PRUNE_BATCH_SIZE)
+        parser.add_argument('--pause', type=float, default=0.05, help="Seconds to wait between batches.")
+        parser.add_argument('--interval', type=float, default=3600.0, help="Seconds between pruning runs.")
+        parser.add_argument('--once', action='store_true', help="Prune once and exit.")
+
+    def handle(self, *args, batch_size, pause, interval, once, **options):
+        while True:
+            started = time.monotonic()
+            pruned = 0
+            while count := prune_expired_tokens(batch_size):
+                pruned += count
+                time.sleep(pause)
+            self.stdout.write(f"Pruned {pruned} expired token(s) in {time.monotonic() - started:.1f}s.")
+            if once:
+                return
+            time.sleep(interval)
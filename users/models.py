@@ -1,8 +1,10 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.core.cache import cache
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 from phonenumber_field.modelfields import PhoneNumberField
 
+from common.constants import TOKEN_VERSION_KEY_PREFIX
 from common.models import BaseModel
 from users.constants import USER_ROLE_CHOICES, ROLE_ADMIN
 from users.querysets import UserManager
@@ -28,6 +30,9 @@ class User(AbstractUser, BaseModel):
 
     # others
     username = models.CharField(max_length=50, blank=True, null=True)
+    # Bumped when the user is deactivated or changes role, which revokes
+    # every token issued before. See users.tokens.
+    token_version = models.PositiveIntegerField(default=0, editable=False)
 
     objects = UserManager()
 
@@ -36,4 +41,25 @@ class User(AbstractUser, BaseModel):
 
 
     def __str__(self):
-        return f"{self.first_name} {self.last_name} <{self.email}> ({self.role}) [ID: {self.pk}]"
\ No newline at end of file
+        return f"{self.first_name} {self.last_name} <{self.email}> ({self.role}) [ID: {self.pk}]"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'role' in field_names and 'is_active' in field_names:
+            instance._loaded_access = (instance.role, instance.is_active)
+        return instance
+
+    def save(self, *args, **kwargs):
+        loaded_access = getattr(self, '_loaded_access', None)
+        if loaded_access is not None and loaded_access != (self.role, self.is_active):
+            self.token_version += 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'token_version'}
+            transaction.on_commit(lambda key=token_version_cache_key(self.pk): cache.delete(key))
+        super().save(*args, **kwargs)
+        self._loaded_access = (self.role, self.is_active)
+
+
+def token_version_cache_key(user_id) -> str:
+    return f'{TOKEN_VERSION_KEY_PREFIX}:{user_id}'
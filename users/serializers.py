@@ -1,8 +1,10 @@
 from rest_framework import serializers
-from rest_framework_simplejwt.tokens import RefreshToken, TokenError
+from rest_framework_simplejwt.tokens import TokenError
 
 from users.constants import ROLE_CUSTOMER
 from users.models import User
+from users.services import CustomerService
+from users.tokens import UserClaimsRefreshToken
 
 
 class LogoutSerializer(serializers.Serializer):
@@ -10,7 +12,7 @@ class LogoutSerializer(serializers.Serializer):
 
     def validate(self, attrs):
         try:
-            RefreshToken(attrs["refresh"]).blacklist()
+            UserClaimsRefreshToken(attrs["refresh"]).blacklist()
         except TokenError:
             raise serializers.ValidationError(
                 {"refresh": "Invalid or expired refresh token."}
@@ -44,6 +46,9 @@ class CreateCustomerSerializer(serializers.ModelSerializer):
             'address': {'required': True},
         }
 
+    def create(self, validated_data):
+        return CustomerService.create_customer(validated_data)
+
 
 class UpdateCustomerSerializer(serializers.ModelSerializer):
 
@@ -0,0 +1,31 @@
+from django.db import transaction
+
+from common.cache import bump_namespaces
+from common.constants import CACHE_NAMESPACE_CUSTOMERS
+from common.services import DashboardCounterService
+from users.constants import ROLE_CUSTOMER
+from users.models import User
+
+
+class CustomerService:
+
+    @staticmethod
+    @transaction.atomic
+    def create_customer(validated_data: dict) -> User:
+        customer = User.objects.create(**validated_data)
+
+        if customer.role == ROLE_CUSTOMER:
+            DashboardCounterService.adjust(total_customers=1)
+        bump_namespaces(CACHE_NAMESPACE_CUSTOMERS)
+
+        return customer
+
+    @staticmethod
+    @transaction.atomic
+    def delete_customer(instance: User) -> None:
+        is_customer = instance.role == ROLE_CUSTOMER
+        instance.delete()
+
+        if is_customer:
+            DashboardCounterService.adjust(total_customers=-1)
+        bump_namespaces(CACHE_NAMESPACE_CUSTOMERS)
@@ -1,3 +1,113 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from users.blacklist import TokenBlacklistFilter, prune_expired_tokens, token_blacklist_filter
+from users.constants import ROLE_ADMIN, ROLE_SALES_USER
+from users.models import User
+from users.tokens import UserClaimsRefreshToken
+
+
+class StatelessTokenTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(email='admin@example.com', role=ROLE_ADMIN, first_name='Test', last_name='Admin')
+        cls.admin.set_password('secret-password')
+        cls.admin.save()
+
+    def setUp(self):
+        cache.clear()
+        response = self.client.post(reverse('login'), {'email': 'admin@example.com', 'password': 'secret-password'})
+        self.access, self.refresh = response.data['access'], response.data['refresh']
+
+    def _get(self, access):
+        return self.client.get(reverse('common:response-cache-stats'), HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def _refreshed(self):
+        response = self.client.post(reverse('refresh'), {'refresh': self.refresh})
+        return response.status_code, response.data.get('access')
+
+    def _update(self, **fields):
+        user = User.objects.get(pk=self.admin.pk)
+        for field, value in fields.items():
+            setattr(user, field, value)
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+
+    def test_requests_authenticate_without_loading_the_user(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self._get(self.access).status_code, 200)
+        # The token version is cached now.
+        with self.assertNumQueries(0):
+            self.assertEqual(self._get(self.access).status_code, 200)
+
+    def test_role_change_revokes_tokens_until_refreshed(self):
+        self._update(role=ROLE_SALES_USER)
+        self.assertEqual(self._get(self.access).status_code, 401)
+
+        status, access = self._refreshed()
+        self.assertEqual(status, 200)
+        self.assertEqual(self._get(access).status_code, 403)
+
+        # Unrelated changes keep tokens valid.
+        self._update(first_name='Renamed')
+        self.assertEqual(self._get(access).status_code, 403)
+
+    def test_deactivation_revokes_tokens(self):
+        self._update(is_active=False)
+        self.assertEqual(self._get(self.access).status_code, 401)
+        self.assertEqual(self._refreshed()[0], 401)
+
+
+class TokenBlacklistFilterTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(email='admin@example.com', role=ROLE_ADMIN, first_name='Test', last_name='Admin')
+
+    def setUp(self):
+        cache.clear()
+        token_blacklist_filter.invalidate()
+
+    def _refresh(self, token):
+        return self.client.post(reverse('refresh'), {'refresh': str(token)}).status_code
+
+    def test_refresh_skips_the_blacklist_query_and_logout_still_revokes(self):
+        token = UserClaimsRefreshToken.for_user(self.admin)
+        self.assertEqual(self._refresh(token), 200)
+        # Only the user is loaded once the filter is built.
+        with self.assertNumQueries(1):
+            self.assertEqual(self._refresh(token), 200)
+
+        self.client.force_authenticate(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post(reverse('logout'), {'refresh': str(token)}).status_code, 201)
+        with self.assertNumQueries(0):
+            self.assertEqual(self._refresh(token), 401)
+
+    def test_other_processes_pick_up_logouts(self):
+        token = UserClaimsRefreshToken.for_user(self.admin)
+        other_process = TokenBlacklistFilter(lru_size=10)
+        self.assertFalse(other_process.is_blacklisted(token['jti']))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            token.blacklist()
+        self.assertTrue(other_process.is_blacklisted(token['jti']))
+
+    def test_prune_deletes_expired_tokens_in_batches(self):
+        tokens = [UserClaimsRefreshToken.for_user(self.admin) for _ in range(5)]
+        tokens[0].blacklist()
+        OutstandingToken.objects.filter(jti__in=[token['jti'] for token in tokens[:3]]).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+        self.assertEqual(prune_expired_tokens(batch_size=2), 2)
+        self.assertEqual(prune_expired_tokens(batch_size=2), 1)
+        self.assertEqual(prune_expired_tokens(batch_size=2), 0)
+        self.assertEqual(OutstandingToken.objects.count(), 2)
+        self.assertFalse(BlacklistedToken.objects.exists())
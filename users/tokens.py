@@ -0,0 +1,114 @@
+"""
+JWTs that carry the user.
+
+Tokens issued at login carry the user's email, name, role and active status
+as claims, plus the user's ``token_version``. ``StatelessJWTAuthentication``
+builds ``request.user`` from those claims instead of loading the user row on
+every request; fields not in the claims load on first access, like deferred
+fields.
+
+Deactivating a user or changing their role bumps ``User.token_version``,
+which revokes every token issued before. Each request compares its token's
+version with the current one, which is cached for
+``TOKEN_VERSION_CACHE_SECONDS``. The process that changes the user drops the
+cached version on commit, and so does every other process when the cache is
+shared. With a per-process cache, other processes accept a revoked token
+until their cached version expires.
+
+A token refresh reloads the user, so a role change takes effect in the next
+access token without logging in again.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from users.blacklist import token_blacklist_filter
+from users.constants import REVOKED_TOKEN_VERSION, TOKEN_VERSION_CLAIM, USER_CLAIM_FIELDS
+from users.models import User, token_version_cache_key
+
+# The fields a claims user is built from, in model order as ``from_db`` expects.
+_CLAIMS_USER_FIELDS = [
+    field.attname for field in User._meta.concrete_fields
+    if field.attname in {'id', 'token_version', *USER_CLAIM_FIELDS}
+]
+
+
+def user_claims(user: User) -> dict:
+    claims = {field: getattr(user, field) for field in USER_CLAIM_FIELDS}
+    claims[TOKEN_VERSION_CLAIM] = user.token_version
+    return claims
+
+
+def current_token_version(user_id) -> int:
+    key = token_version_cache_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = (User.objects
+                   .active()
+                   .filter(pk=user_id)
+                   .values_list('token_version', flat=True)
+                   .first())
+        if version is None:
+            version = REVOKED_TOKEN_VERSION
+        cache.set(key, version, settings.TOKEN_VERSION_CACHE_SECONDS)
+    return version
+
+
+def claims_user(token) -> User:
+    """A ``User`` built from ``token``'s claims, without a query."""
+    values = {
+        'id': token[api_settings.USER_ID_CLAIM],
+        'token_version': token[TOKEN_VERSION_CLAIM],
+        **{field: token[field] for field in USER_CLAIM_FIELDS},
+    }
+    return User.from_db(DEFAULT_DB_ALIAS, _CLAIMS_USER_FIELDS, [values[name] for name in _CLAIMS_USER_FIELDS])
+
+
+class UserClaimsRefreshToken(RefreshToken):
+    """
+    A refresh token, and access tokens derived from it, carrying
+    ``user_claims``. Its blacklist check goes through the process's filter,
+    see users.blacklist.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token.payload.update(user_claims(user))
+        return token
+
+    def check_blacklist(self):
+        if not settings.TOKEN_BLACKLIST_FILTER:
+            return super().check_blacklist()
+        if token_blacklist_filter.is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        blacklisted = super().blacklist()
+        token_blacklist_filter.add(self.payload[api_settings.JTI_CLAIM])
+        return blacklisted
+
+
+class UserClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = UserClaimsRefreshToken
+
+
+class UserClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = UserClaimsRefreshToken
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+
+        access = AccessToken(data['access'], verify=False)
+        user = User.objects.active().filter(pk=access[api_settings.USER_ID_CLAIM]).first()
+        if user is None:
+            raise AuthenticationFailed(_("User not found or inactive."), code='user_inactive')
+        access.payload.update(user_claims(user))
+        data['access'] = str(access)
+        return data
@@ -5,6 +5,7 @@ from users.models import User
 from users.permissions import IsSales, IsAdmin
 from users.serializers import LogoutSerializer, CreateCustomerSerializer, ReadCustomerSerializer, \
     UpdateCustomerSerializer
+from users.services import CustomerService
 
 
 class LogoutView(CreateAPIView):
@@ -41,3 +42,6 @@ class RetrieveUpdateDestroyCustomerApiView(RetrieveUpdateDestroyAPIView):
 
     def perform_update(self, serializer):
         serializer.save(modified_by=self.request.user)
+
+    def perform_destroy(self, instance):
+        CustomerService.delete_customer(instance)